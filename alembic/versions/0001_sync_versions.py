@@ -0,0 +1,33 @@
+"""Per-user sync versions on users, clients, cases and events
+
+Revision ID: 0001_sync_versions
+Revises:
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import add_columns, create_index
+
+# revision identifiers, used by Alembic.
+revision = '0001_sync_versions'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ("User", "Client", "Case", "Event"):
+        add_columns(table, sa.Column("syncVersion", sa.BigInteger(), nullable=False, server_default="0"))
+    create_index("ix_Client_userId_syncVersion", "Client", ["userId", "syncVersion"])
+    create_index("ix_Case_userId_syncVersion", "Case", ["userId", "syncVersion"])
+    create_index("ix_Event_syncVersion", "Event", ["syncVersion"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_Event_syncVersion", table_name="Event")
+    op.drop_index("ix_Case_userId_syncVersion", table_name="Case")
+    op.drop_index("ix_Client_userId_syncVersion", table_name="Client")
+    for table in ("Event", "Case", "Client", "User"):
+        op.drop_column(table, "syncVersion")
@@ -0,0 +1,27 @@
+"""Row versions on clients, cases and events for conditional updates
+
+Revision ID: 0002_row_versions
+Revises: 0001_sync_versions
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import add_columns
+
+# revision identifiers, used by Alembic.
+revision = '0002_row_versions'
+down_revision = '0001_sync_versions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ("Client", "Case", "Event"):
+        add_columns(table, sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    for table in ("Event", "Case", "Client"):
+        op.drop_column(table, "version")
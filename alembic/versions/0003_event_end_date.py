@@ -0,0 +1,30 @@
+"""Event end dates and the overlap index for conflict detection
+
+Revision ID: 0003_event_end_date
+Revises: 0002_row_versions
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import add_columns, create_index
+from app.models import EVENT_PERIOD
+
+# revision identifiers, used by Alembic.
+revision = '0003_event_end_date'
+down_revision = '0002_row_versions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    add_columns("Event", sa.Column("endDate", sa.DateTime(), nullable=True))
+    if op.get_bind().dialect.name == "postgresql":
+        create_index("ix_Event_period", "Event", [sa.text(EVENT_PERIOD)], postgresql_using="gist")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_Event_period", table_name="Event")
+    op.drop_column("Event", "endDate")
@@ -0,0 +1,36 @@
+"""Blind index columns for encrypted client email and phone lookups
+
+Revision ID: 0004_client_blind_indexes
+Revises: 0003_event_end_date
+Create Date: 2026-10-19
+
+Existing values stay readable as plaintext; ``python -m app.crypto rewrap``
+encrypts them and fills in the blind indexes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import add_columns, create_index
+
+# revision identifiers, used by Alembic.
+revision = '0004_client_blind_indexes'
+down_revision = '0003_event_end_date'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    add_columns(
+        "Client",
+        sa.Column("emailIndex", sa.String(32), nullable=True),
+        sa.Column("phoneIndex", sa.String(32), nullable=True),
+    )
+    create_index("ix_Client_userId_emailIndex", "Client", ["userId", "emailIndex"])
+    create_index("ix_Client_userId_phoneIndex", "Client", ["userId", "phoneIndex"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_Client_userId_phoneIndex", table_name="Client")
+    op.drop_index("ix_Client_userId_emailIndex", table_name="Client")
+    op.drop_column("Client", "phoneIndex")
+    op.drop_column("Client", "emailIndex")
@@ -0,0 +1,25 @@
+"""Index on (userId, caseNumber) for matching imported cases
+
+Revision ID: 0005_case_number_index
+Revises: 0004_client_blind_indexes
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import create_index
+
+# revision identifiers, used by Alembic.
+revision = '0005_case_number_index'
+down_revision = '0004_client_blind_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    create_index("ix_Case_userId_caseNumber", "Case", ["userId", "caseNumber"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_Case_userId_caseNumber", table_name="Case")
@@ -0,0 +1,37 @@
+"""Money columns as NUMERIC(12, 2) instead of floating point
+
+Revision ID: 0006_money_numeric
+Revises: 0005_case_number_index
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import alter_type
+
+# revision identifiers, used by Alembic.
+revision = '0006_money_numeric'
+down_revision = '0005_case_number_index'
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    "TimeEntry": {"hourlyRate": sa.Numeric(12, 2), "amount": sa.Numeric(12, 2)},
+    "Invoice": {
+        "amount": sa.Numeric(12, 2), "taxRate": sa.Numeric(5, 2), "tax": sa.Numeric(12, 2), "total": sa.Numeric(12, 2),
+    },
+    "BillingRollup": {"unbilledAmount": sa.Numeric(12, 2), "billedAmount": sa.Numeric(12, 2)},
+}
+
+
+def upgrade() -> None:
+    for table, columns in COLUMNS.items():
+        for column, type_ in columns.items():
+            alter_type(table, column, type_, postgresql_using=f'round("{column}"::numeric, 2)')
+
+
+def downgrade() -> None:
+    for table, columns in COLUMNS.items():
+        for column in columns:
+            alter_type(table, column, sa.Float())
@@ -0,0 +1,45 @@
+"""Import uploads stored in parts instead of one ImportFile.content value
+
+Revision ID: 0007_import_file_parts
+Revises: 0006_money_numeric
+Create Date: 2026-10-19
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_import_file_parts'
+down_revision = '0006_money_numeric'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        inspector = sa.inspect(op.get_bind())
+        if not inspector.has_table("ImportFile"):
+            return
+        if "content" not in {column["name"] for column in inspector.get_columns("ImportFile")}:
+            return
+        create_parts = not inspector.has_table("ImportFilePart")
+    else:
+        create_parts = True
+    if create_parts:
+        op.create_table(
+            "ImportFilePart",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("importId", sa.Integer(), sa.ForeignKey("ImportFile.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("start", sa.BigInteger(), nullable=False),
+            sa.Column("data", sa.LargeBinary(), nullable=False),
+        )
+        op.create_index("ix_ImportFilePart_id", "ImportFilePart", ["id"])
+        op.create_index("ix_ImportFilePart_importId_start", "ImportFilePart", ["importId", "start"], unique=True)
+    # Uploads still waiting for their job become a single part
+    op.execute('INSERT INTO "ImportFilePart" ("importId", start, data) SELECT id, 0, content FROM "ImportFile"')
+    op.drop_column("ImportFile", "content")
+
+
+def downgrade() -> None:
+    op.add_column("ImportFile", sa.Column("content", sa.LargeBinary(), nullable=True))
+    op.drop_table("ImportFilePart")
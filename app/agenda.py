@@ -0,0 +1,185 @@
+"""
+Precomputed daily agenda
+
+Every user's agenda for a day, the events from that day to AGENDA_DAYS
+days later with their case and client names, is stored as one Agenda row
+keyed by ``(userId, day)``. Days are Turkish calendar days; event times
+are stored as naive UTC, so a day runs from 21:00 UTC the evening before. A nightly job (``python -m app.agenda``)
+writes tomorrow's rows for everyone with one query over all users'
+events, so the morning dashboards are single key lookups.
+
+A row records the user's sync version (app.sync) it was computed at.
+Every write to a user's data raises that version, so a row whose version
+is behind is patched rather than recomputed: the events, cases and
+clients changed since then are re-read and deleted events are dropped by
+their tombstones.
+"""
+import logging
+import sys
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.jobs import JobContext
+from app.models import Agenda, Case, Client, Event, Tombstone, User
+
+logger = logging.getLogger(__name__)
+
+# Today and the six days after it
+AGENDA_DAYS = 7
+TIMEZONE = ZoneInfo("Europe/Istanbul")
+
+ENTRY_COLUMNS = (
+    Event.id, Event.caseId, Event.title, Event.eventType, Event.eventDate, Event.endDate,
+    Case.title.label("caseTitle"), Case.caseNumber, Case.clientId, Client.name.label("clientName"),
+)
+
+
+def local_today() -> date:
+    return datetime.now(TIMEZONE).date()
+
+
+def day_start(day: date) -> datetime:
+    """The naive UTC time ``day`` starts at in Turkey"""
+    return datetime.combine(day, time(), TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def window(day: date):
+    return day_start(day), day_start(day + timedelta(days=AGENDA_DAYS))
+
+
+def entries_query(day: date):
+    start, end = window(day)
+    return (
+        select(Case.userId, *ENTRY_COLUMNS)
+        .join(Case, Case.id == Event.caseId)
+        .outerjoin(Client, Client.id == Case.clientId)
+        .where(Event.eventDate >= start, Event.eventDate < end)
+    )
+
+
+def entry(row) -> dict:
+    values = dict(row._mapping)
+    values.pop("userId", None)
+    for key in ("eventDate", "endDate"):
+        if values[key] is not None:
+            values[key] = values[key].isoformat()
+    return values
+
+
+def ordered(entries: List[dict]) -> List[dict]:
+    return sorted(entries, key=lambda e: (e["eventDate"], e["id"]))
+
+
+def store(db: Session, rows: List[dict]):
+    if not rows:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    upsert = dialect.insert(Agenda).values(rows)
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=[Agenda.userId, Agenda.day],
+        set_={"syncVersion": upsert.excluded.syncVersion, "events": upsert.excluded.events,
+              "computedAt": upsert.excluded.computedAt},
+    ))
+
+
+def compute(db: Session, user_id: int, day: date, version: int) -> dict:
+    events = ordered([entry(row) for row in db.execute(entries_query(day).where(Case.userId == user_id))])
+    row = {"userId": user_id, "day": day, "syncVersion": version, "events": events, "computedAt": datetime.utcnow()}
+    store(db, [row])
+    return row
+
+
+def refresh(db: Session, agenda: Agenda, version: int) -> dict:
+    """Patch ``agenda`` with what changed since its sync version"""
+    since, user_id = agenda.syncVersion, agenda.userId
+    changed = set(db.execute(
+        select(Event.id).join(Case, Case.id == Event.caseId)
+        .where(Case.userId == user_id, Event.syncVersion > since)
+    ).scalars())
+    changed.update(db.execute(
+        select(Tombstone.entityId)
+        .where(Tombstone.userId == user_id, Tombstone.entityType == "event", Tombstone.syncVersion > since)
+    ).scalars())
+    # Events in the window that are new, edited, or whose case or client was renamed
+    fresh = [
+        entry(row) for row in db.execute(
+            entries_query(agenda.day).where(
+                Case.userId == user_id,
+                or_(Event.syncVersion > since, Case.syncVersion > since, Client.syncVersion > since),
+            )
+        )
+    ]
+    replaced = changed | {e["id"] for e in fresh}
+    events = ordered([e for e in agenda.events if e["id"] not in replaced] + fresh)
+    row = {"userId": user_id, "day": agenda.day, "syncVersion": version, "events": events, "computedAt": datetime.utcnow()}
+    store(db, [row])
+    return row
+
+
+def get_agenda(db: Session, user_id: int, day: date) -> dict:
+    """The user's agenda for ``day``; a key lookup unless something changed since it was stored"""
+    found = db.execute(
+        select(Agenda, User.syncVersion).join(User, User.id == Agenda.userId)
+        .where(Agenda.userId == user_id, Agenda.day == day)
+    ).first()
+    if found is not None:
+        agenda, version = found
+        if agenda.syncVersion == version:
+            return {"events": agenda.events, "syncVersion": version, "computedAt": agenda.computedAt}
+        row = refresh(db, agenda, version)
+    else:
+        version = db.execute(select(User.syncVersion).where(User.id == user_id)).scalar_one()
+        row = compute(db, user_id, day, version)
+    db.commit()
+    return row
+
+
+def precompute(db: Session, day: date) -> int:
+    """Write every user's agenda for ``day``; returns how many users have events"""
+    # Read before the events, so a write in between leaves a row behind and it gets patched
+    versions = dict(db.execute(select(User.id, User.syncVersion)).tuples().all())
+    events: Dict[int, List[dict]] = defaultdict(list)
+    for row in db.execute(entries_query(day).order_by(Event.eventDate, Event.id)):
+        events[row.userId].append(entry(row))
+    computed = datetime.utcnow()
+    rows = [
+        {"userId": user_id, "day": day, "syncVersion": version, "events": events.get(user_id, []), "computedAt": computed}
+        for user_id, version in versions.items()
+    ]
+    for start in range(0, len(rows), 500):
+        store(db, rows[start:start + 500])
+    db.execute(delete(Agenda).where(Agenda.day < day - timedelta(days=1)))
+    db.commit()
+    return len(events)
+
+
+def run_precompute(context: JobContext) -> dict:
+    """Job handler for ``agenda``"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        day = date.fromisoformat(context.payload["date"])
+        return {"date": day.isoformat(), "users": precompute(db, day)}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+    from app.jobs import enqueue
+
+    logging.basicConfig(level=logging.INFO)
+    day = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else local_today() + timedelta(days=1)
+    session = SessionLocal()
+    try:
+        job = enqueue(session, "agenda", {"date": day.isoformat()})
+        print(f"Queued job {job.id} for the agenda of {day}")
+    finally:
+        session.close()
@@ -0,0 +1,211 @@
+"""
+Event partitioning and archival of closed cases
+
+On Postgres, Event is range-partitioned by month of ``eventDate`` (see
+app.partitioning), so date-bounded queries such as the upcoming events in
+/api/stats only scan the months they ask for. Partitions are created
+EVENT_PARTITION_MONTHS_AHEAD months ahead at startup and daily after that.
+An Event table created before partitioning is converted once with
+``python -m app.archive partition``.
+
+Cases closed more than ARCHIVE_AFTER_YEARS years ago are moved, with their
+events and ids, to CaseArchive and EventArchive. Devices receive tombstones
+for them, and the hot tables and indexes only hold live work. Cases with
+time entries, documents or deadlines stay where they are, since those rows
+reference them. Archived cases are read through /api/archive and can be
+restored.
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import partitioning
+from app.business_days import add_months
+from app.models import Case, CaseArchive, Deadline, Document, Event, EventArchive, TimeEntry, Tombstone
+from app.sync import next_version, record_deletion
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_YEARS = int(os.getenv("ARCHIVE_AFTER_YEARS", "0"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+# Hearings are scheduled far ahead; later events go to the default partition
+EVENT_PARTITION_MONTHS_AHEAD = 24
+# Older events keep living in the default partition when a table is converted
+EVENT_PARTITION_HISTORY_YEARS = 10
+MAINTENANCE_INTERVAL = 24 * 3600
+
+EVENT_TABLE = Event.__tablename__
+
+
+def maintain_event_partitions(engine, today: Optional[date] = None):
+    if engine.dialect.name != "postgresql":
+        return
+    today = today or date.today()
+    with engine.begin() as conn:
+        if not partitioning.is_partitioned(conn, EVENT_TABLE):
+            logger.warning("Event is not partitioned yet, run: python -m app.archive partition")
+            return
+        partitioning.ensure_partitions(conn, EVENT_TABLE, "eventDate", today, EVENT_PARTITION_MONTHS_AHEAD)
+
+
+def partition_events(engine, today: Optional[date] = None) -> bool:
+    """
+    Rebuild an unpartitioned Postgres Event table as a partitioned one in a
+    single transaction, which holds an exclusive lock on Event until it
+    commits. Returns False when there is nothing to do.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    today = today or date.today()
+    legacy = f"{EVENT_TABLE}_unpartitioned"
+    with engine.begin() as conn:
+        if partitioning.is_partitioned(conn, EVENT_TABLE):
+            return False
+        for table, constraint in conn.execute(text(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = CAST(:table AS regclass)"
+        ), {"table": f'"{EVENT_TABLE}"'}).all():
+            conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+        sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('\"{EVENT_TABLE}\"', 'id')")).scalar()
+        # The sequence would be dropped with the old table otherwise
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+        conn.execute(text(f'ALTER TABLE "{EVENT_TABLE}" RENAME TO "{legacy}"'))
+        conn.execute(text(
+            f'CREATE TABLE "{EVENT_TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE ("eventDate")'
+        ))
+
+        first = conn.execute(text(f'SELECT min("eventDate") FROM "{legacy}"')).scalar()
+        start = add_months(today, -12 * EVENT_PARTITION_HISTORY_YEARS)
+        if first is not None and first.date() > start:
+            start = first.date()
+        months = (today.year - start.year) * 12 + today.month - start.month + EVENT_PARTITION_MONTHS_AHEAD
+        partitioning.ensure_partitions(conn, EVENT_TABLE, "eventDate", start, months)
+
+        copied = conn.execute(text(f'INSERT INTO "{EVENT_TABLE}" SELECT * FROM "{legacy}"')).rowcount
+        conn.execute(text(f'DROP TABLE "{legacy}"'))
+        conn.execute(text(f'ALTER TABLE "{EVENT_TABLE}" ADD FOREIGN KEY ("caseId") REFERENCES "{Case.__tablename__}" (id)'))
+        for index in Event.__table__.indexes:
+            index.create(conn)
+        conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{EVENT_TABLE}".id'))
+    logger.info("Partitioned %s: %d events in %d monthly partitions", EVENT_TABLE, copied, months)
+    return True
+
+
+def move(db: Session, source, target, condition, values: Optional[dict] = None) -> List[dict]:
+    """DELETE ... RETURNING rows of ``source`` and insert them into ``target``"""
+    columns = [source.__table__.c[c.name] for c in target.__table__.columns if c.name in source.__table__.c]
+    rows = [
+        {**row, **(values or {})}
+        for row in db.execute(
+            delete(source).where(condition).returning(*columns).execution_options(synchronize_session=False)
+        ).mappings()
+    ]
+    if rows:
+        db.execute(insert(target), rows)
+    return rows
+
+
+def archivable(before: datetime):
+    return and_(
+        Case.status == "closed",
+        func.coalesce(Case.endDate, Case.updatedAt, Case.createdAt) < before,
+        ~exists().where(TimeEntry.caseId == Case.id),
+        ~exists().where(Document.caseId == Case.id),
+        ~exists().where(Deadline.caseId == Case.id),
+        ~exists().where(Document.eventId == Event.id, Event.caseId == Case.id),
+    )
+
+
+def archive_cases(db: Session, before: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move closed cases last touched before ``before``, and their events, to the archive"""
+    archived = 0
+    while True:
+        # Locking the cases also holds off event inserts, which check the foreign key
+        cases = db.execute(
+            select(Case.id, Case.userId).where(archivable(before)).order_by(Case.id).limit(batch_size).with_for_update()
+        ).all()
+        if not cases:
+            return archived
+        owners = {case.id: case.userId for case in cases}
+        events = move(db, Event, EventArchive, Event.caseId.in_(list(owners)))
+        move(db, Case, CaseArchive, Case.id.in_(list(owners)))
+        versions = {user_id: next_version(db, user_id) for user_id in sorted(set(owners.values()))}
+        for case_id, user_id in owners.items():
+            record_deletion(db, user_id, "case", case_id, versions[user_id])
+        for event in events:
+            user_id = owners[event["caseId"]]
+            record_deletion(db, user_id, "event", event["id"], versions[user_id])
+        db.commit()
+        archived += len(cases)
+        logger.info("Archived %d cases with %d events", len(cases), len(events))
+
+
+def restore_case(db: Session, user_id: int, case_id: int) -> Case:
+    """Move an archived case and its events back; devices get them on their next sync"""
+    version = next_version(db, user_id)
+    restored = move(
+        db, CaseArchive, Case, (CaseArchive.id == case_id) & (CaseArchive.userId == user_id),
+        values={"syncVersion": version},
+    )
+    if not restored:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Archived case not found")
+    events = move(db, EventArchive, Event, EventArchive.caseId == case_id, values={"syncVersion": version})
+    # Otherwise a device catching up would get both the rows and their deletion
+    db.execute(delete(Tombstone).where(
+        Tombstone.userId == user_id,
+        or_(
+            (Tombstone.entityType == "case") & (Tombstone.entityId == case_id),
+            (Tombstone.entityType == "event") & Tombstone.entityId.in_([event["id"] for event in events]),
+        ),
+    ))
+    db.commit()
+    return db.get(Case, case_id)
+
+
+def maintain(engine):
+    maintain_event_partitions(engine)
+    if ARCHIVE_AFTER_YEARS:
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            archive_cases(db, datetime.utcnow() - timedelta(days=365 * ARCHIVE_AFTER_YEARS))
+        finally:
+            db.close()
+
+
+async def run(engine, interval: float = MAINTENANCE_INTERVAL):
+    """Background task creating partitions and archiving cases once a day"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(maintain, engine)
+        except Exception:
+            logger.exception("Event maintenance failed")
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "partition":
+        partition_events(engine)
+        maintain_event_partitions(engine)
+    elif command == "cases" and len(sys.argv) == 3:
+        session = SessionLocal()
+        try:
+            print(f"Archived {archive_cases(session, datetime.utcnow() - timedelta(days=365 * int(sys.argv[2])))} cases")
+        finally:
+            session.close()
+    else:
+        sys.exit("usage: python -m app.archive partition | cases <years>")
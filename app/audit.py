@@ -0,0 +1,237 @@
+"""
+Batched audit log
+
+AuditMiddleware turns every /api request into an audit record (who, what
+action, which entity, outcome) and puts it on a bounded in-memory queue
+without touching the database. POST routes have no id in the path, so
+the created entity's id is read from the ``id`` of the JSON response.
+A background task started
+in ``lifespan`` drains the queue in batches: ``COPY`` on Postgres, one
+multi-row INSERT elsewhere. Shutdown flushes whatever is still queued.
+
+When the queue is full AUDIT_OVERFLOW decides: ``block`` (default) makes
+the request wait for room, trading latency for a complete log; ``drop``
+discards the record and counts it in ``audit_dropped_total``.
+
+On Postgres the table is partitioned by month; the same task keeps future
+partitions created and drops those older than AUDIT_RETENTION_MONTHS.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+
+from app import partitioning
+from app.business_days import add_months
+from app.metrics import AUDIT_DROPPED, AUDIT_QUEUE_DEPTH, AUDIT_WRITTEN
+from app.models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "1000"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "block")
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "24"))
+PARTITION_MONTHS_AHEAD = 3
+MAINTENANCE_INTERVAL = 24 * 3600
+
+ACTIONS = {"GET": "read", "HEAD": "read", "POST": "create", "PUT": "update", "PATCH": "update", "DELETE": "delete"}
+AUDITED_PREFIX = "/api/"
+UNAUDITED_PREFIXES = ("/api/health", "/api/stream")
+
+# Larger create responses are not buffered just to find their id
+CREATED_BODY_LIMIT = 64 * 1024
+
+COLUMNS = ("id", "occurredAt", "userId", "action", "method", "route", "entityType", "entityId", "status", "ip")
+
+
+def write_batch(engine, rows: List[dict]):
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg":
+            columns = ", ".join(f'"{c}"' for c in COLUMNS)
+            cursor = conn.connection.driver_connection.cursor()
+            with cursor.copy(f'COPY "{AuditLog.__tablename__}" ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row([row[c] for c in COLUMNS])
+        else:
+            conn.execute(insert(AuditLog), rows)
+    AUDIT_WRITTEN.inc(len(rows))
+
+
+def maintain_partitions(engine, today: Optional[date] = None):
+    if engine.dialect.name != "postgresql":
+        return
+    today = today or date.today()
+    with engine.begin() as conn:
+        partitioning.ensure_partitions(
+            conn, AuditLog.__tablename__, "occurredAt", today, PARTITION_MONTHS_AHEAD
+        )
+        if AUDIT_RETENTION_MONTHS:
+            partitioning.drop_partitions_before(
+                conn, AuditLog.__tablename__, add_months(today, -AUDIT_RETENTION_MONTHS)
+            )
+
+
+class AuditLogger:
+    def __init__(self, maxsize: int = AUDIT_QUEUE_SIZE, overflow: str = AUDIT_OVERFLOW):
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.queue: Optional[asyncio.Queue] = None
+        # Records taken off the queue but not yet handed to a writer
+        self._batch: List[dict] = []
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+
+    async def record(self, entry: dict):
+        if self.queue is None:
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            if self.overflow == "drop":
+                AUDIT_DROPPED.inc()
+                return
+            await self.queue.put(entry)
+        AUDIT_QUEUE_DEPTH.inc()
+
+    def _take(self, limit: int):
+        while len(self._batch) < limit and not self.queue.empty():
+            self._batch.append(self.queue.get_nowait())
+
+    async def _write(self, engine):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        try:
+            await run_in_threadpool(write_batch, engine, batch)
+        except Exception:
+            # Losing a batch is logged loudly rather than retried forever
+            logger.exception("Failed to write %d audit records", len(batch))
+        finally:
+            AUDIT_QUEUE_DEPTH.dec(len(batch))
+
+    async def run(self, engine, batch_size: int = AUDIT_BATCH_SIZE, interval: float = AUDIT_FLUSH_INTERVAL):
+        """Background task writing queued records in batches"""
+        loop = asyncio.get_running_loop()
+        next_maintenance = loop.time()
+        while True:
+            if loop.time() >= next_maintenance:
+                try:
+                    await run_in_threadpool(maintain_partitions, engine)
+                except Exception:
+                    logger.exception("Audit partition maintenance failed")
+                next_maintenance = loop.time() + MAINTENANCE_INTERVAL
+
+            self._batch.append(await self.queue.get())
+            # Give a burst a moment to accumulate into one batch
+            deadline = loop.time() + interval
+            self._take(batch_size)
+            while len(self._batch) < batch_size and loop.time() < deadline:
+                try:
+                    self._batch.append(await asyncio.wait_for(self.queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                self._take(batch_size)
+            await self._write(engine)
+
+    async def flush(self, engine, batch_size: int = AUDIT_BATCH_SIZE):
+        """Write everything still queued; called on shutdown after the task is cancelled"""
+        if self.queue is None:
+            return
+        self._take(batch_size)
+        while self._batch:
+            await self._write(engine)
+            self._take(batch_size)
+
+
+audit_log = AuditLogger()
+
+
+def audit_entry(scope, status_code: int, created_id: Optional[str] = None) -> Optional[dict]:
+    """The audit record of a handled request, or None for unrouted and unaudited ones"""
+    route = scope.get("route")
+    if route is None or route.path.startswith(UNAUDITED_PREFIXES):
+        return None
+    entity_type, entity_id = entity_of(scope)
+    if entity_id is None:
+        entity_id = created_id
+    client = scope.get("client")
+    return {
+        "id": secrets.randbits(63),
+        "occurredAt": datetime.now(timezone.utc),
+        "userId": scope.get("state", {}).get("user_id"),
+        "action": ACTIONS.get(scope["method"], scope["method"].lower()),
+        "method": scope["method"],
+        "route": route.path,
+        "entityType": entity_type,
+        "entityId": entity_id,
+        "status": status_code,
+        "ip": client[0] if client else None,
+    }
+
+
+def entity_of(scope) -> tuple:
+    """("clients", "42") for /api/clients/{client_id}"""
+    parts = scope["route"].path.split("/")
+    entity_type = parts[2] if len(parts) > 2 else None
+    entity_id = next(
+        (str(value) for name, value in scope.get("path_params", {}).items() if name.endswith("_id")),
+        None,
+    )
+    return entity_type, entity_id
+
+
+def created_id(body: bytes) -> Optional[str]:
+    """``id`` of a JSON object response body"""
+    try:
+        document = json.loads(body)
+    except ValueError:
+        return None
+    if isinstance(document, dict) and document.get("id") is not None:
+        return str(document["id"])
+    return None
+
+
+class AuditMiddleware:
+    """Pure ASGI middleware queueing one audit record per /api request"""
+
+    def __init__(self, app, audit_logger: AuditLogger = audit_log):
+        self.app = app
+        self.audit_log = audit_logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(AUDITED_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        capture = scope["method"] == "POST"
+        body = bytearray()
+
+        async def send_wrapper(message):
+            nonlocal status_code, capture
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = dict(message.get("headers", []))
+                capture = capture and status_code in (200, 201) and headers.get(
+                    b"content-type", b""
+                ).startswith(b"application/json")
+            elif message["type"] == "http.response.body" and capture:
+                body.extend(message.get("body", b""))
+                capture = len(body) <= CREATED_BODY_LIMIT
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            entry = audit_entry(scope, status_code, created_id(bytes(body)) if capture and body else None)
+            if entry is not None:
+                await self.audit_log.record(entry)
@@ -1,27 +1,56 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from functools import lru_cache
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import delete, or_, update
 from sqlalchemy.orm import Session
+import asyncio
+import logging
 import os
+import hashlib
+import secrets
+import uuid
 
 from app.database import get_db
-from app.models import User
+from app.models import User, RevokedToken, UserSession
+from app import tokens
+from app.metrics import BCRYPT_QUEUE_DEPTH
 
 SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-change-this")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Rotated and revoked sessions are kept this long to recognise a replayed token
+SESSION_REUSE_WINDOW_DAYS = int(os.getenv("SESSION_REUSE_WINDOW_DAYS", "7"))
+SESSION_PRUNE_INTERVAL = 3600
+
+logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# passlib/bcrypt and jose/cryptography are imported on first use rather than
+# at startup; they are the slowest imports on a cold start (see app.tokens
+# for the JWT side).
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+async def run_password_hash(func, *args):
+    """Run a bcrypt call in the threadpool so it doesn't block the event loop"""
+    BCRYPT_QUEUE_DEPTH.inc()
+    try:
+        return await run_in_threadpool(func, *args)
+    finally:
+        BCRYPT_QUEUE_DEPTH.dec()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -29,25 +58,133 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    encoded_jwt = tokens.encode(to_encode, SECRET_KEY, ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def revoke_token(db: Session, token: str):
+    """
+    Deny a token in this worker now and in the others on their next sync,
+    and end the refresh session it was issued from.
+    """
+    claims = tokens.verify(token, SECRET_KEY, ALGORITHM)
+    if claims.get("sid") is not None:
+        revoke_session_family(db, claims["sid"])
+    jti = claims.get("jti")
+    if jti is not None:
+        expires = datetime.utcfromtimestamp(claims["exp"])
+        db.add(RevokedToken(jti=jti, expiresAt=expires))
+    db.commit()
+    if jti is not None:
+        tokens.denylist.add(jti, claims["exp"])
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_session(db: Session, user_id: int, family_id: Optional[str] = None):
+    """Add a session row and return it with the plaintext refresh token"""
+    refresh_token = secrets.token_urlsafe(32)
+    session = UserSession(
+        userId=user_id,
+        tokenHash=hash_refresh_token(refresh_token),
+        familyId=family_id or uuid.uuid4().hex,
+        expiresAt=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    db.add(session)
+    return session, refresh_token
+
+def rotate_session(db: Session, refresh_token: str):
+    """
+    Exchange a refresh token for a new one in the same family.
+
+    One indexed read by token hash (joined to the user) replaces the bcrypt
+    verify a fresh login would cost. Presenting an already-rotated token
+    means it leaked, so the whole family is revoked. The token is retired
+    with a conditional UPDATE, so of two concurrent refreshes with the same
+    token only one wins and the other counts as reuse.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token"
+    )
+    row = db.query(UserSession, User).join(User, UserSession.userId == User.id).filter(
+        UserSession.tokenHash == hash_refresh_token(refresh_token)
+    ).first()
+    if row is None:
+        raise invalid
+    session, user = row
+    now = datetime.utcnow()
+    if session.revokedAt is None and session.expiresAt <= now:
+        raise invalid
+
+    retired = db.execute(
+        update(UserSession)
+        .where(UserSession.id == session.id, UserSession.revokedAt.is_(None))
+        .values(revokedAt=now)
+        .returning(UserSession.id),
+        execution_options={"synchronize_session": False},
+    ).scalar()
+    if retired is None:
+        db.query(UserSession).filter(
+            UserSession.familyId == session.familyId,
+            UserSession.revokedAt.is_(None)
+        ).update({UserSession.revokedAt: now}, synchronize_session=False)
+        db.commit()
+        raise invalid
+
+    new_session, new_token = create_session(db, user.id, session.familyId)
+    db.commit()
+    return user, new_session, new_token
+
+def revoke_session_family(db: Session, session_id: int):
+    family = db.query(UserSession.familyId).filter(UserSession.id == session_id).scalar_subquery()
+    db.query(UserSession).filter(
+        UserSession.familyId == family,
+        UserSession.revokedAt.is_(None)
+    ).update({UserSession.revokedAt: datetime.utcnow()}, synchronize_session=False)
+
+def prune_sessions(engine, now: Optional[datetime] = None) -> int:
+    """Delete expired sessions and those rotated or revoked before the reuse window"""
+    now = now or datetime.utcnow()
+    with engine.begin() as conn:
+        return conn.execute(
+            delete(UserSession).where(or_(
+                UserSession.expiresAt <= now,
+                UserSession.revokedAt < now - timedelta(days=SESSION_REUSE_WINDOW_DAYS),
+            ))
+        ).rowcount
+
+async def run_session_pruning(engine, interval: float = SESSION_PRUNE_INTERVAL):
+    """Background task pruning the Session table every hour; each refresh adds a row"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(prune_sessions, engine)
+        except Exception:
+            logger.exception("Pruning sessions failed")
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    request: Request = None
+):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = tokens.verify(token, SECRET_KEY, ALGORITHM)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-    except JWTError:
+    except tokens.TokenError:
         raise credentials_exception
     
     user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
+    if request is not None:
+        # Picked up by the audit middleware once the response is sent
+        request.state.user_id = user.id
     return user
@@ -0,0 +1,191 @@
+"""
+Batched read requests
+
+POST /api/batch runs several GET requests against the app's own routes in
+one round-trip. The caller is authenticated once. Every sub-request gets
+that user and the batch's database session through FastAPI's dependency
+cache, so neither ``get_current_user`` nor ``get_db`` runs again per
+sub-request. Only routes answering JSON can be batched; any other route
+(the SSE stream, file downloads, PDF reports) is refused before its
+endpoint runs.
+
+Sub-requests run one after another on the shared session. With
+``concurrent`` they run in threads instead, at most BATCH_CONCURRENCY at
+a time, each with a session of its own, since a session can't be used
+from two threads. Every sub-request is audited like a request of its own.
+
+This drives FastAPI's own dependency solving (``solve_dependencies`` and
+the helpers around it in fastapi.routing), which isn't public API, so
+every requirements file pins the same FastAPI release.
+"""
+import asyncio
+import json
+import logging
+import os
+from contextlib import AsyncExitStack
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException, Request
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.dependencies.utils import solve_dependencies
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute, run_endpoint_function, serialize_response
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Match
+
+from app.audit import audit_entry, audit_log
+from app.auth import get_current_user
+from app.database import get_db
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+Outcome = Tuple[int, object]
+
+
+async def no_body():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def sub_scope(parent: dict, path: str, user_id: int) -> dict:
+    url = urlsplit(path)
+    scope = {
+        key: value for key, value in parent.items()
+        if key not in ("route", "endpoint", "path_params", "state")
+    }
+    scope.update(
+        method="GET",
+        path=url.path,
+        raw_path=url.path.encode(),
+        query_string=url.query.encode(),
+        state={"user_id": user_id},
+    )
+    return scope
+
+
+def find_route(app, scope: dict) -> Optional[APIRoute]:
+    allowed = None
+    for route in app.router.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            scope.update(child_scope)
+            return route
+        if match == Match.PARTIAL and allowed is None:
+            allowed = route
+    if allowed is not None:
+        raise HTTPException(status_code=405, detail="Only GET requests can be batched")
+    raise HTTPException(status_code=404, detail="Not Found")
+
+
+def returns_json(route: APIRoute) -> bool:
+    response_class = route.response_class
+    if isinstance(response_class, DefaultPlaceholder):
+        response_class = response_class.value
+    return issubclass(response_class, JSONResponse)
+
+
+def resolved_cache(app, dependant, values: dict) -> dict:
+    """
+    Dependency cache entries answering every use of the callables in
+    ``values`` within ``dependant``'s tree. FastAPI keys the cache by the
+    (overridden) callable and the security scopes in effect, so a
+    ``Security(get_current_user, scopes=[...])`` needs an entry of its own.
+    """
+    cache = {}
+    pending = [dependant]
+    while pending:
+        for sub in pending.pop().dependencies:
+            if sub.call in values:
+                cache[(app.dependency_overrides.get(sub.call, sub.call), sub.cache_key[1])] = values[sub.call]
+            else:
+                pending.append(sub)
+    return cache
+
+
+async def call_route(app, scope: dict, user, db: Session) -> Outcome:
+    route = find_route(app, scope)
+    # Refused before the endpoint runs: a stream would subscribe to the
+    # broker and close the shared session, a report would enqueue a render
+    if not returns_json(route):
+        return 400, {"detail": "Only JSON responses can be batched"}
+    request = Request(scope, no_body)
+    # Pre-resolved, so the route's own get_current_user and get_db aren't run
+    cache = resolved_cache(app, route.dependant, {get_db: db, get_current_user: user})
+    is_coroutine = asyncio.iscoroutinefunction(route.dependant.call)
+    async with AsyncExitStack() as stack:
+        solved = await solve_dependencies(
+            request=request,
+            dependant=route.dependant,
+            dependency_overrides_provider=app,
+            dependency_cache=cache,
+            async_exit_stack=stack,
+            embed_body_fields=False,
+        )
+        if solved.errors:
+            return 422, {"detail": jsonable_encoder(solved.errors)}
+        raw = await run_endpoint_function(dependant=route.dependant, values=solved.values, is_coroutine=is_coroutine)
+        if isinstance(raw, Response):
+            if isinstance(raw, StreamingResponse) or "json" not in (raw.media_type or ""):
+                return 400, {"detail": "Only JSON responses can be batched"}
+            return raw.status_code, json.loads(raw.body) if raw.body else None
+        content = await serialize_response(
+            field=route.response_field,
+            response_content=raw,
+            include=route.response_model_include,
+            exclude=route.response_model_exclude,
+            by_alias=route.response_model_by_alias,
+            exclude_unset=route.response_model_exclude_unset,
+            exclude_defaults=route.response_model_exclude_defaults,
+            exclude_none=route.response_model_exclude_none,
+            is_coroutine=is_coroutine,
+        )
+        return solved.response.status_code or route.status_code or 200, content
+
+
+async def run_one(app, parent: dict, path: str, user, db: Session) -> Tuple[Outcome, Optional[dict]]:
+    """A sub-request's status and body, and its audit record"""
+    scope = sub_scope(parent, path, user.id)
+    try:
+        outcome = await call_route(app, scope, user, db)
+    except HTTPException as exc:
+        outcome = exc.status_code, {"detail": exc.detail}
+    except Exception:
+        logger.exception("Batched request %s failed", path)
+        db.rollback()
+        outcome = 500, {"detail": "Internal Server Error"}
+    return outcome, audit_entry(scope, outcome[0])
+
+
+def run_isolated(app, parent: dict, path: str, user, bind) -> Tuple[Outcome, Optional[dict]]:
+    db = Session(bind=bind, autoflush=False)
+    try:
+        return asyncio.run(run_one(app, parent, path, user, db))
+    finally:
+        db.close()
+
+
+async def run_batch(request: Request, paths: List[str], user, db: Session, concurrent: bool = False) -> List[Outcome]:
+    app, parent = request.app, request.scope
+    # Detached, a sub-request's commit doesn't expire it into another lookup
+    db.expunge(user)
+    if concurrent and len(paths) > 1:
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def isolated(path: str):
+            async with semaphore:
+                return await run_in_threadpool(run_isolated, app, parent, path, user, db.get_bind())
+
+        results = await asyncio.gather(*(isolated(path) for path in paths))
+    else:
+        results = [await run_one(app, parent, path, user, db) for path in paths]
+    # Recorded here, the audit queue belongs to this event loop
+    for _, entry in results:
+        if entry is not None:
+            await audit_log.record(entry)
+    return [outcome for outcome, _ in results]
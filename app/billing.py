@@ -0,0 +1,184 @@
+"""
+Time tracking rollups and invoice generation
+
+Every time entry write adjusts its case's BillingRollup row by the delta
+in the same transaction (an upsert adding to the running totals), so
+unbilled hours and per-case/per-client totals are read from one row per
+case instead of summing time entries.
+
+Monthly invoicing bills every client's unbilled entries of a month in a
+single transaction with a fixed number of statements: one SELECT of the
+entries, one multi-row INSERT of the invoices and executemany UPDATEs of
+the entries and rollups.
+
+Amounts are Decimal, rounded half up to kuruş, and stored as NUMERIC(12, 2).
+Invoice numbers run per user and year (2026-00001, 2026-00002, ...) from
+an InvoiceCounter row. Taking numbers locks that row until the invoices
+are committed, so concurrent runs number one after the other.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List
+
+from sqlalchemy import Integer, bindparam, cast, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.business_days import add_months
+from app.models import BillingRollup, Case, Invoice, InvoiceCounter, TimeEntry
+
+DEFAULT_TAX_RATE = Decimal(20)
+CENT = Decimal("0.01")
+
+
+def to_cents(value: Decimal) -> Decimal:
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def entry_amount(minutes: int, hourly_rate: Decimal) -> Decimal:
+    return to_cents(minutes * Decimal(hourly_rate) / 60)
+
+
+def adjust_rollup(db: Session, user_id: int, case_id: int, minutes: int = 0, amount: Decimal = Decimal(0)):
+    """Add to a case's unbilled totals, creating its rollup row on first use"""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = BillingRollup.__table__
+    stmt = dialect.insert(table).values(
+        userId=user_id, caseId=case_id, unbilledMinutes=minutes, unbilledAmount=amount,
+        billedMinutes=0, billedAmount=0,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.userId, table.c.caseId],
+        set_={
+            "unbilledMinutes": table.c.unbilledMinutes + stmt.excluded.unbilledMinutes,
+            "unbilledAmount": table.c.unbilledAmount + stmt.excluded.unbilledAmount,
+        },
+    ))
+
+
+def summary(db: Session, user_id: int) -> dict:
+    rows = db.execute(
+        select(
+            BillingRollup.caseId, Case.clientId,
+            BillingRollup.unbilledMinutes, BillingRollup.unbilledAmount,
+            BillingRollup.billedMinutes, BillingRollup.billedAmount,
+        )
+        .join(Case, BillingRollup.caseId == Case.id)
+        .where(BillingRollup.userId == user_id)
+        .order_by(BillingRollup.caseId)
+    ).all()
+
+    fields = ("unbilledMinutes", "unbilledAmount", "billedMinutes", "billedAmount")
+    cases = [dict(row._mapping) for row in rows]
+    clients: Dict[int, dict] = {}
+    totals = dict.fromkeys(fields, 0)
+    for row in cases:
+        client = clients.setdefault(row["clientId"], {"clientId": row["clientId"], **dict.fromkeys(fields, 0)})
+        for field in fields:
+            client[field] += row[field]
+            totals[field] += row[field]
+    return {"cases": cases, "clients": list(clients.values()), "totals": totals}
+
+
+def take_numbers(db: Session, user_id: int, year: int, count: int) -> int:
+    """
+    Reserve ``count`` invoice numbers of ``year``; returns the first. A
+    user's first counter of a year starts after the numbers that year's
+    invoices already have.
+    """
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = InvoiceCounter.__table__
+    prefix = f"{year}-"
+    issued = (
+        select(func.coalesce(func.max(cast(func.substr(Invoice.number, len(prefix) + 1), Integer)), 0))
+        .where(Invoice.userId == user_id, Invoice.number.startswith(prefix, autoescape=True))
+        .scalar_subquery()
+    )
+    stmt = dialect.insert(table).values(userId=user_id, year=year, lastNumber=issued + count)
+    last = db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.userId, table.c.year],
+            set_={"lastNumber": table.c.lastNumber + count},
+        ).returning(table.c.lastNumber)
+    ).scalar_one()
+    return last - count + 1
+
+
+def generate_month(db: Session, user_id: int, year: int, month: int, tax_rate: Decimal = DEFAULT_TAX_RATE) -> List[Invoice]:
+    """One draft invoice per client for its unbilled entries of the month"""
+    period_start = date(year, month, 1)
+    period_end = add_months(period_start, 1)
+
+    query = (
+        select(TimeEntry.id, TimeEntry.caseId, TimeEntry.minutes, TimeEntry.amount, Case.clientId)
+        .join(Case, TimeEntry.caseId == Case.id)
+        .where(
+            TimeEntry.userId == user_id,
+            TimeEntry.invoiceId.is_(None),
+            TimeEntry.workDate >= period_start,
+            TimeEntry.workDate < period_end,
+        )
+        .order_by(Case.clientId, TimeEntry.id)
+        # Concurrent runs for the same month must not bill an entry twice
+        .with_for_update(of=TimeEntry)
+    )
+    entries = db.execute(query).all()
+    if not entries:
+        return []
+
+    by_client = defaultdict(list)
+    for entry in entries:
+        by_client[entry.clientId].append(entry)
+
+    first = take_numbers(db, user_id, year, len(by_client))
+    rows = []
+    for seq, (client_id, client_entries) in enumerate(sorted(by_client.items()), start=first):
+        amount = sum(e.amount for e in client_entries)
+        tax = to_cents(amount * Decimal(tax_rate) / 100)
+        rows.append({
+            "userId": user_id,
+            "clientId": client_id,
+            "number": f"{year}-{seq:05d}",
+            "periodStart": period_start,
+            "periodEnd": date.fromordinal(period_end.toordinal() - 1),
+            "minutes": sum(e.minutes for e in client_entries),
+            "amount": amount,
+            "taxRate": tax_rate,
+            "tax": tax,
+            "total": amount + tax,
+            "status": "draft",
+        })
+    invoices = db.scalars(
+        insert(Invoice).returning(Invoice, sort_by_parameter_order=True), rows
+    ).all()
+    invoice_by_client = {invoice.clientId: invoice.id for invoice in invoices}
+
+    entry_table = TimeEntry.__table__
+    db.execute(
+        update(entry_table).where(entry_table.c.id == bindparam("entry_id"))
+        .values(invoiceId=bindparam("invoice_id")),
+        [{"entry_id": e.id, "invoice_id": invoice_by_client[e.clientId]} for e in entries],
+    )
+
+    moved = defaultdict(lambda: [0, Decimal(0)])
+    for entry in entries:
+        moved[entry.caseId][0] += entry.minutes
+        moved[entry.caseId][1] += entry.amount
+    rollup = BillingRollup.__table__
+    db.execute(
+        update(rollup)
+        .where(rollup.c.userId == user_id, rollup.c.caseId == bindparam("case_id"))
+        .values(
+            unbilledMinutes=rollup.c.unbilledMinutes - bindparam("minutes"),
+            unbilledAmount=rollup.c.unbilledAmount - bindparam("amount"),
+            billedMinutes=rollup.c.billedMinutes + bindparam("minutes"),
+            billedAmount=rollup.c.billedAmount + bindparam("amount"),
+        ),
+        [{"case_id": case_id, "minutes": m, "amount": a} for case_id, (m, a) in moved.items()],
+    )
+
+    for invoice in invoices:
+        db.expunge(invoice)
+    db.commit()
+    return invoices
@@ -0,0 +1,204 @@
+"""
+Turkish business-day calendar and procedural deadline arithmetic
+
+The calendar is precomputed once into flat arrays, so every date
+operation is a couple of index lookups:
+
+- ``business[i]``: day ``i`` is a working day
+- ``before[i]``: working days strictly before day ``i``
+- ``ordinals[k]``: day index of the ``k``-th working day
+
+"N working days after d" is then ``ordinals[before[d + 1] + n - 1]``, and
+rolling a date forward to the next working day is ``ordinals[before[d]]``.
+
+Religious holidays can't be computed, so the calendar only covers the run
+of years whose Ramazan and Kurban Bayramı are known: the built-in ones
+plus years where the Holiday table has both under those names. Dates
+outside it raise ValueError rather than silently counting a bayram as
+working days.
+"""
+import threading
+import time
+from array import array
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# Years the fixed holidays are listed for
+FIXED_YEARS = (2000, 2100)
+CALENDAR_TTL_SECONDS = 300
+
+UNITS = ("days", "weeks", "months", "business_days")
+
+# Holidays with the same date every year (2491 sayılı Kanun and later amendments)
+FIXED_HOLIDAYS = {
+    (1, 1): "Yılbaşı",
+    (4, 23): "Ulusal Egemenlik ve Çocuk Bayramı",
+    (5, 1): "Emek ve Dayanışma Günü",
+    (5, 19): "Atatürk'ü Anma, Gençlik ve Spor Bayramı",
+    (7, 15): "Demokrasi ve Milli Birlik Günü",
+    (8, 30): "Zafer Bayramı",
+    (10, 29): "Cumhuriyet Bayramı",
+}
+FIXED_SINCE = {(7, 15): 2017}
+
+# Religious holidays follow the lunar calendar; later years are added to
+# the Holiday table as the Diyanet calendar is published
+RELIGIOUS_HOLIDAYS = {
+    "Ramazan Bayramı": [
+        (date(2024, 4, 10), 3), (date(2025, 3, 30), 3), (date(2026, 3, 20), 3), (date(2027, 3, 9), 3),
+    ],
+    "Kurban Bayramı": [
+        (date(2024, 6, 16), 4), (date(2025, 6, 6), 4), (date(2026, 5, 27), 4), (date(2027, 5, 16), 4),
+    ],
+}
+
+# Adli tatil: deadlines ending inside it run until one week after (HMK m.104)
+JUDICIAL_RECESS = ((7, 20), (8, 31))
+JUDICIAL_RECESS_EXTENSION = timedelta(days=7)
+
+
+def builtin_holidays() -> List[Tuple[date, str]]:
+    holidays = []
+    for year in range(FIXED_YEARS[0], FIXED_YEARS[1] + 1):
+        for (month, day), name in FIXED_HOLIDAYS.items():
+            if year >= FIXED_SINCE.get((month, day), 0):
+                holidays.append((date(year, month, day), name))
+    for name, periods in RELIGIOUS_HOLIDAYS.items():
+        for first_day, length in periods:
+            holidays.extend((first_day + timedelta(days=i), name) for i in range(length))
+    return holidays
+
+
+def holiday_years(holidays: Iterable[Tuple[date, str]]) -> Tuple[int, int]:
+    """
+    First and last year of the run around the built-in religious holidays
+    in which every year has each of them among ``holidays``
+    """
+    named = {(day.year, name) for day, name in holidays}
+    known = {year for year, _ in named if all((year, name) in named for name in RELIGIOUS_HOLIDAYS)}
+    builtin = [first.year for periods in RELIGIOUS_HOLIDAYS.values() for first, _ in periods]
+    first, last = min(builtin), max(builtin)
+    while first - 1 in known:
+        first -= 1
+    while last + 1 in known:
+        last += 1
+    return first, last
+
+
+def add_months(start: date, months: int) -> date:
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(start.day, monthrange(year, month)[1]))
+
+
+class BusinessCalendar:
+    def __init__(self, holidays: Iterable[Tuple[date, str]]):
+        """``holidays`` are ``(date, name)`` pairs; they also decide the years covered"""
+        holidays = list(holidays)
+        first_year, last_year = holiday_years(holidays)
+        self.start, self.end = date(first_year, 1, 1), date(last_year, 12, 31)
+        days = (self.end - self.start).days + 1
+        off = {(d - self.start).days for d, _ in holidays if self.start <= d <= self.end}
+        # weekday() of day i is (first_weekday + i) % 7
+        first_weekday = self.start.weekday()
+
+        self.business = bytearray(days)
+        self.before = array("l", bytes(8 * (days + 1)))
+        self.ordinals = array("l")
+        count = 0
+        for i in range(days):
+            self.before[i] = count
+            if (first_weekday + i) % 7 < 5 and i not in off:
+                self.business[i] = 1
+                self.ordinals.append(i)
+                count += 1
+        self.before[days] = count
+
+    def _index(self, day: date) -> int:
+        i = (day - self.start).days
+        if not 0 <= i < len(self.business):
+            raise ValueError(f"{day} is outside the calendar ({self.start.year}-{self.end.year})")
+        return i
+
+    def _date(self, i: int) -> date:
+        return self.start + timedelta(days=i)
+
+    def is_business_day(self, day: date) -> bool:
+        return bool(self.business[self._index(day)])
+
+    def next_business_day(self, day: date) -> date:
+        """``day`` itself if it is a working day, else the next one"""
+        return self._date(self.ordinals[self.before[self._index(day)]])
+
+    def add_business_days(self, day: date, n: int) -> date:
+        """The ``n``-th working day after ``day`` (``day`` itself not counted)"""
+        return self._date(self.ordinals[self.before[self._index(day) + 1] + n - 1])
+
+    def due_date(self, start: date, amount: int, unit: str, judicial_recess: bool = False) -> date:
+        """
+        Procedural due date for a period starting on ``start`` (e.g. the
+        notification date). The start day is not counted and a period ending
+        on a weekend or holiday runs to the next working day.
+        """
+        if unit == "business_days":
+            due = self.add_business_days(start, amount)
+        elif unit in ("days", "weeks"):
+            due = self.next_business_day(start + timedelta(days=amount * (7 if unit == "weeks" else 1)))
+        elif unit == "months":
+            due = self.next_business_day(add_months(start, amount))
+        else:
+            raise ValueError(f"unknown unit {unit!r}")
+
+        if judicial_recess:
+            (start_month, start_day), (end_month, end_day) = JUDICIAL_RECESS
+            recess_start, recess_end = date(due.year, start_month, start_day), date(due.year, end_month, end_day)
+            if recess_start <= due <= recess_end:
+                due = self.next_business_day(recess_end + JUDICIAL_RECESS_EXTENSION)
+        return due
+
+    def due_dates(self, periods: Sequence[Tuple[date, int, str, bool]]) -> List[Optional[date]]:
+        """
+        Batch form of ``due_date`` for recomputing many deadlines at once;
+        None for a period that ends outside the calendar
+        """
+        due = []
+        for start, amount, unit, recess in periods:
+            try:
+                due.append(self.due_date(start, amount, unit, recess))
+            except (ValueError, IndexError):
+                due.append(None)
+        return due
+
+
+class CalendarCache:
+    """
+    One calendar per worker, rebuilt when the Holiday table changes here or
+    at most CALENDAR_TTL_SECONDS after another worker changed it.
+    """
+
+    def __init__(self):
+        self._calendar: Optional[BusinessCalendar] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db) -> BusinessCalendar:
+        with self._lock:
+            if self._calendar is None or time.monotonic() - self._built_at > CALENDAR_TTL_SECONDS:
+                self._calendar = self._build(db)
+                self._built_at = time.monotonic()
+            return self._calendar
+
+    def invalidate(self):
+        with self._lock:
+            self._calendar = None
+
+    def _build(self, db) -> BusinessCalendar:
+        from app.models import Holiday
+
+        holidays = builtin_holidays()
+        holidays.extend(db.query(Holiday.date, Holiday.name).all())
+        return BusinessCalendar(holidays)
+
+
+calendar_cache = CalendarCache()
@@ -0,0 +1,143 @@
+"""
+Single-statement insert/update/delete helpers for owned rows
+
+Ownership, the optimistic version check and the write happen in one
+``UPDATE/DELETE ... WHERE id = :id AND <owned> [AND version = :v] RETURNING``
+round-trip. Only when nothing matched is a second query spent on telling a
+missing row (404) from a stale version (409).
+"""
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert, literal, select, union_all, update
+from sqlalchemy.orm import Session
+
+from app.models import Case, Event
+from app.sync import next_version, record_deletion
+
+
+def raise_miss(db: Session, model, entity_id: int, owned, expected_version: Optional[int], label: str):
+    current = db.execute(select(model.version).where(model.id == entity_id, owned)).scalar()
+    db.rollback()
+    if current is None:
+        raise HTTPException(status_code=404, detail=f"{label} not found")
+    if expected_version is not None and current != expected_version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": f"{label} was modified by someone else", "version": current}
+        )
+    return current
+
+
+def update_owned(
+    db: Session,
+    model,
+    entity_id: int,
+    owned,
+    values: dict,
+    user_id: int,
+    expected_version: Optional[int] = None,
+    label: str = "Item",
+    extra_conditions=(),
+):
+    conditions = [model.id == entity_id, owned, *extra_conditions]
+    if expected_version is not None:
+        conditions.append(model.version == expected_version)
+
+    stmt = (
+        update(model)
+        .where(*conditions)
+        .values(**values, version=model.version + 1, syncVersion=next_version(db, user_id))
+        .returning(model)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    row = db.execute(stmt).scalars().first()
+    if row is None:
+        raise_miss(db, model, entity_id, owned, expected_version, label)
+        # Row exists at the expected version, so an extra condition failed
+        raise HTTPException(status_code=404, detail="Referenced item not found")
+    # Detach so the commit doesn't expire it and serializing needs no reload
+    db.expunge(row)
+    db.commit()
+    return row
+
+
+def delete_owned(
+    db: Session,
+    model,
+    entity_id: int,
+    owned,
+    user_id: int,
+    entity_type: str,
+    expected_version: Optional[int] = None,
+    label: str = "Item",
+    extra_conditions=(),
+    blocked_detail: str = "Item cannot be deleted",
+    version: Optional[int] = None,
+):
+    """
+    Delete in one statement, leave a tombstone for /api/sync and commit.
+    Pass ``version`` to reuse a change version already taken in this
+    transaction (e.g. for dependent rows deleted first).
+    """
+    conditions = [model.id == entity_id, owned, *extra_conditions]
+    if expected_version is not None:
+        conditions.append(model.version == expected_version)
+
+    if version is None:
+        version = next_version(db, user_id)
+    deleted_id = db.execute(
+        delete(model).where(*conditions).returning(model.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if deleted_id is None:
+        raise_miss(db, model, entity_id, owned, expected_version, label)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=blocked_detail)
+    record_deletion(db, user_id, entity_type, deleted_id, version)
+    db.commit()
+    return deleted_id
+
+
+EVENT_INSERT_COLUMNS = ("title", "description", "eventDate", "endDate", "eventType")
+
+
+def insert_events(db: Session, user_id: int, items: List[dict], commit: bool = True) -> List[Event]:
+    """
+    Insert events only under cases the user owns, in one statement:
+
+        INSERT INTO "Event" (...) SELECT :title, ..., "Case".id FROM "Case"
+        WHERE "Case".id = :caseId AND "Case"."userId" = :uid
+        [UNION ALL SELECT ...] RETURNING *
+
+    Items pointing at someone else's (or a missing) case produce no row;
+    if any are missing nothing is kept and a 404 lists their case ids.
+    Pass ``commit=False`` to add more writes to the same transaction.
+    """
+    columns = Event.__table__.c
+    version = next_version(db, user_id)
+    selects = [
+        select(
+            *(literal(item.get(name), columns[name].type) for name in EVENT_INSERT_COLUMNS),
+            Case.id,
+            literal(version, columns["syncVersion"].type),
+            literal(1, columns["version"].type),
+        ).where(Case.id == item["caseId"], Case.userId == user_id)
+        for item in items
+    ]
+    source = selects[0] if len(selects) == 1 else union_all(*selects)
+    stmt = (
+        insert(Event)
+        .from_select([*EVENT_INSERT_COLUMNS, "caseId", "syncVersion", "version"], source)
+        .returning(Event)
+    )
+    events = db.execute(stmt).scalars().all()
+
+    missing = sorted({item["caseId"] for item in items} - {event.caseId for event in events})
+    if missing:
+        db.rollback()
+        raise HTTPException(status_code=404, detail={"message": "Case not found", "caseIds": missing})
+    for event in events:
+        db.expunge(event)
+    if commit:
+        db.commit()
+    return events
@@ -0,0 +1,209 @@
+"""
+Field-level encryption of client personal data
+
+``EncryptedString`` columns are encrypted with Fernet (AES-128-CBC plus
+HMAC-SHA256) on the way into the database and decrypted on the way out,
+for ORM and Core statements alike. FIELD_ENCRYPTION_KEYS is a
+comma-separated list of Fernet keys: the first one encrypts, all of them
+decrypt. To rotate, put a new key first, deploy, run
+``python -m app.crypto rewrap`` and then drop the old key. Stored
+idempotent responses (app.idempotency) aren't rewrapped, so keep the old
+key for IDEMPOTENCY_TTL_HOURS after the rewrap. Cached case reports
+(``EncryptedBytes``, they show the client's contact details) are deleted
+by the rewrap instead and rendered again when next requested.
+
+Ciphertext is randomized, so equality lookups go through blind indexes:
+an HMAC-SHA256 of the normalized value under BLIND_INDEX_KEY, stored in
+its own indexed column. A lookup is then an index seek on
+``HMAC(normalize(query))``. Changing BLIND_INDEX_KEY also needs a rewrap,
+which recomputes the indexes; lookups miss until it has finished.
+
+Values written before encryption was enabled are read back as they are
+and encrypted by the first rewrap.
+
+Both keys must be set: the server and the job worker refuse to start
+without them. A deployment that ran on the old fallback of keys derived
+from JWT_SECRET gets its Fernet key from ``python -m app.crypto
+legacy-key``. List it after a new key, set a new BLIND_INDEX_KEY and
+rewrap.
+
+cryptography is imported on first use, like the auth libraries (app.auth),
+so importing the models doesn't load it.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import LargeBinary, String, delete, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.types import TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+FIELD_ENCRYPTION_KEYS = os.getenv("FIELD_ENCRYPTION_KEYS", "")
+BLIND_INDEX_KEY = os.getenv("BLIND_INDEX_KEY", "")
+
+# Every Fernet token starts with the base64 of its 0x80 version byte
+TOKEN_PREFIX = "gAAAAA"
+BLIND_INDEX_LENGTH = 32
+REWRAP_BATCH_SIZE = 500
+
+
+class KeysMissing(RuntimeError):
+    pass
+
+
+def check_keys():
+    """Raise KeysMissing unless both keys are configured; run at startup"""
+    missing = [
+        name for name, value in (("FIELD_ENCRYPTION_KEYS", FIELD_ENCRYPTION_KEYS), ("BLIND_INDEX_KEY", BLIND_INDEX_KEY))
+        if not value.strip(" ,")
+    ]
+    if missing:
+        raise KeysMissing(f"{' and '.join(missing)} must be set to encrypt client data (see .env.example)")
+
+
+def legacy_key(jwt_secret: str) -> str:
+    """The Fernet key that used to be derived from JWT_SECRET when none was set"""
+    return base64.urlsafe_b64encode(hashlib.sha256(f"field-encryption:{jwt_secret}".encode()).digest()).decode()
+
+
+@lru_cache(maxsize=None)
+def fernet():
+    from cryptography.fernet import Fernet, MultiFernet
+
+    check_keys()
+    return MultiFernet([Fernet(key.strip()) for key in FIELD_ENCRYPTION_KEYS.split(",") if key.strip()])
+
+
+def encrypt(value: str) -> str:
+    return fernet().encrypt(value.encode()).decode()
+
+
+def decrypt(value: str) -> str:
+    if not value.startswith(TOKEN_PREFIX):
+        return value
+    return fernet().decrypt(value.encode()).decode()
+
+
+class EncryptedString(TypeDecorator):
+    """Text column holding a Fernet token of its value"""
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else encrypt(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else decrypt(value)
+
+
+class EncryptedBytes(TypeDecorator):
+    """Binary column holding a Fernet token of its value"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else fernet().encrypt(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or not value.startswith(TOKEN_PREFIX.encode()):
+            return value
+        return fernet().decrypt(value)
+
+
+def normalize_email(value: str) -> str:
+    return value.strip().lower()
+
+
+def normalize_phone(value: str) -> str:
+    """Digits of the national number: 0532 123 45 67 and +90 532 123 4567 agree"""
+    digits = re.sub(r"\D", "", value)
+    if len(digits) == 12 and digits.startswith("90"):
+        return digits[2:]
+    if len(digits) == 11 and digits.startswith("0"):
+        return digits[1:]
+    return digits
+
+
+@lru_cache(maxsize=None)
+def blind_index_key() -> bytes:
+    check_keys()
+    return BLIND_INDEX_KEY.encode()
+
+
+def blind_index(kind: str, value: Optional[str]) -> Optional[str]:
+    normalized = BLIND_INDEXES[kind][1](value) if value is not None else ""
+    if not normalized:
+        return None
+    digest = hmac.new(blind_index_key(), f"{kind}:{normalized}".encode(), hashlib.sha256)
+    return digest.hexdigest()[:BLIND_INDEX_LENGTH]
+
+
+# Encrypted field -> (blind index column, normalization)
+BLIND_INDEXES = {
+    "email": ("emailIndex", normalize_email),
+    "phone": ("phoneIndex", normalize_phone),
+}
+
+
+def with_blind_indexes(values: dict) -> dict:
+    """``values`` plus the blind index of every indexed field it sets"""
+    indexes = {
+        column: blind_index(field, values[field])
+        for field, (column, _) in BLIND_INDEXES.items()
+        if field in values
+    }
+    return {**values, **indexes}
+
+
+def rewrap(db: Session, batch_size: int = REWRAP_BATCH_SIZE) -> int:
+    """
+    Re-encrypt every client's fields under the current first key and
+    recompute their blind indexes, after dropping the cached case reports.
+    Safe to interrupt and run again.
+    """
+    from app.models import CaseReport, Client
+
+    dropped = db.execute(delete(CaseReport)).rowcount
+    db.commit()
+    logger.info("Dropped %d cached case reports", dropped)
+    fields = ["email", "phone", "address"]
+    last_id = rewrapped = 0
+    while True:
+        rows = db.execute(
+            select(Client.id, *(getattr(Client, name) for name in fields))
+            .where(Client.id > last_id)
+            .order_by(Client.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return rewrapped
+        # ORM bulk UPDATE by primary key, one executemany per batch
+        db.execute(update(Client), [with_blind_indexes(row._asdict()) for row in rows])
+        db.commit()
+        last_id = rows[-1].id
+        rewrapped += len(rows)
+        logger.info("Rewrapped %d clients up to id %d", rewrapped, last_id)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    if sys.argv[1:] == ["legacy-key"]:
+        print(legacy_key(os.getenv("JWT_SECRET", "your-secret-key-change-this")))
+        sys.exit()
+    if sys.argv[1:] != ["rewrap"]:
+        sys.exit("usage: python -m app.crypto rewrap | legacy-key")
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        print(f"Rewrapped {rewrap(session)} clients")
+    finally:
+        session.close()
@@ -0,0 +1,156 @@
+"""
+Procedural deadlines
+
+A deadline runs ``amount`` ``unit``s from a milestone (an event such as a
+notification, or the case start) and owns a calendar event on its due date.
+When the holiday table changes every open case's deadlines are recomputed
+against the rebuilt calendar in one pass and only the changed due dates are
+written back, as two executemany UPDATEs.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.orm import Session
+
+from app.business_days import calendar_cache
+from app.crud import insert_events
+from app.models import Case, Deadline, Event
+from app.sync import next_version, record_deletion
+
+DEADLINE_EVENT_TYPE = "deadline"
+# Filings are accepted until the end of court office hours
+DEADLINE_TIME = time(17, 0)
+
+CLOSED_STATUSES = ("closed",)
+
+
+def deadline_event_date(due: date) -> datetime:
+    return datetime.combine(due, DEADLINE_TIME)
+
+
+def resolve_milestone(db: Session, user_id: int, case_id: Optional[int], source_event_id: Optional[int]):
+    """The (case id, base date) a new deadline runs from"""
+    if source_event_id is not None:
+        row = db.execute(
+            select(Event.caseId, Event.eventDate).join(Case, Event.caseId == Case.id)
+            .where(Event.id == source_event_id, Case.userId == user_id)
+        ).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        if row.eventDate is None:
+            raise HTTPException(status_code=400, detail="Event has no date")
+        return row.caseId, row.eventDate.date()
+
+    row = db.execute(
+        select(Case.id, Case.startDate).where(Case.id == case_id, Case.userId == user_id)
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return row.id, row.startDate.date() if row.startDate else None
+
+
+def create_deadline(db: Session, user_id: int, data) -> Deadline:
+    if data.caseId is None and data.sourceEventId is None:
+        raise HTTPException(status_code=400, detail="caseId or sourceEventId is required")
+    case_id, base_date = resolve_milestone(db, user_id, data.caseId, data.sourceEventId)
+    base_date = data.baseDate or base_date
+    if base_date is None:
+        raise HTTPException(status_code=400, detail="baseDate is required when the case has no start date")
+
+    try:
+        due = calendar_cache.get(db).due_date(base_date, data.amount, data.unit, data.judicialRecess)
+    except (ValueError, IndexError):
+        raise HTTPException(status_code=400, detail="Due date is outside the supported calendar")
+
+    event = insert_events(db, user_id, [{
+        "title": data.title,
+        "description": data.description,
+        "eventDate": deadline_event_date(due),
+        "endDate": None,
+        "eventType": DEADLINE_EVENT_TYPE,
+        "caseId": case_id,
+    }], commit=False)[0]
+    deadline = Deadline(
+        userId=user_id,
+        caseId=case_id,
+        sourceEventId=data.sourceEventId,
+        eventId=event.id,
+        title=data.title,
+        baseDate=base_date,
+        amount=data.amount,
+        unit=data.unit,
+        judicialRecess=data.judicialRecess,
+        dueDate=due,
+    )
+    db.add(deadline)
+    db.commit()
+    db.refresh(deadline)
+    return deadline
+
+
+def delete_deadline(db: Session, user_id: int, deadline_id: int):
+    """Delete a deadline together with its calendar event"""
+    event_id = db.execute(
+        delete(Deadline).where(Deadline.id == deadline_id, Deadline.userId == user_id)
+        .returning(Deadline.eventId)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if event_id is None:
+        raise HTTPException(status_code=404, detail="Deadline not found")
+    if event_id[0] is not None:
+        db.execute(delete(Event).where(Event.id == event_id[0]).execution_options(synchronize_session=False))
+        record_deletion(db, user_id, "event", event_id[0], next_version(db, user_id))
+    db.commit()
+
+
+def recompute_deadlines(db: Session) -> int:
+    """
+    Recompute the due dates of every open case's deadlines against the
+    current calendar. Runs in the caller's transaction; returns how many
+    deadlines moved.
+    """
+    calendar_cache.invalidate()
+    calendar = calendar_cache.get(db)
+    rows = db.execute(
+        select(
+            Deadline.id, Deadline.userId, Deadline.eventId, Deadline.baseDate,
+            Deadline.amount, Deadline.unit, Deadline.judicialRecess, Deadline.dueDate,
+        )
+        .join(Case, Deadline.caseId == Case.id)
+        .where(Case.status.notin_(CLOSED_STATUSES))
+    ).all()
+    due_dates = calendar.due_dates([(r.baseDate, r.amount, r.unit, r.judicialRecess) for r in rows])
+    # Deadlines outside the calendar keep the due date they have
+    moved = [(row, due) for row, due in zip(rows, due_dates) if due is not None and due != row.dueDate]
+    if not moved:
+        return 0
+
+    db.execute(
+        update(Deadline.__table__).where(Deadline.__table__.c.id == bindparam("deadline_id"))
+        .values(dueDate=bindparam("due")),
+        [{"deadline_id": row.id, "due": due} for row, due in moved],
+    )
+
+    events_by_user = defaultdict(list)
+    for row, due in moved:
+        if row.eventId is not None:
+            events_by_user[row.userId].append((row.eventId, due))
+    event_table = Event.__table__
+    stmt = (
+        update(event_table).where(event_table.c.id == bindparam("event_id"))
+        .values(
+            eventDate=bindparam("event_date"),
+            syncVersion=bindparam("sync_version"),
+            version=event_table.c.version + 1,
+        )
+    )
+    for user_id, events in events_by_user.items():
+        version = next_version(db, user_id)
+        db.execute(stmt, [
+            {"event_id": event_id, "event_date": deadline_event_date(due), "sync_version": version}
+            for event_id, due in events
+        ])
+    return len(moved)
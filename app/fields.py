@@ -0,0 +1,45 @@
+"""
+Sparse fieldsets for list endpoints
+
+``?fields=id,title,status`` narrows the SELECT to those columns, and the
+rows are serialized as they come back, against a TypedDict of just those
+fields. Long text columns and encrypted ones (app.crypto) are then
+neither fetched, decrypted nor serialized unless a client asks for them.
+``id`` is always included.
+"""
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.orm import Session
+# pydantic needs this TypedDict before Python 3.12
+from typing_extensions import TypedDict
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return, e.g. id,title,status; all fields when omitted"
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """The requested fields of ``schema`` in schema order, or None for all of them"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - set(schema.model_fields))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": f"Unknown fields: {', '.join(unknown)}", "fields": list(schema.model_fields)},
+        )
+    return ("id",) + tuple(name for name in schema.model_fields if name in requested and name != "id")
+
+
+@lru_cache(maxsize=256)
+def list_adapter(schema: Type[BaseModel], fields: Tuple[str, ...]) -> TypeAdapter:
+    row = TypedDict(f"{schema.__name__}Fields", {name: schema.model_fields[name].annotation for name in fields})
+    return TypeAdapter(List[row])
+
+
+def sparse_response(db: Session, schema: Type[BaseModel], model, fields: Tuple[str, ...], query) -> Response:
+    """Run ``query`` (a ``select`` of ``model``) for ``fields`` only and serialize the rows"""
+    rows = db.execute(query.with_only_columns(*(getattr(model, name) for name in fields))).mappings()
+    return Response(list_adapter(schema, fields).dump_json([dict(row) for row in rows]), media_type="application/json")
@@ -0,0 +1,90 @@
+"""
+Health probing
+
+A background task checks the database every few seconds and caches the
+result, so liveness/readiness probes never open a session themselves.
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.migrations import current_version
+
+PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+
+
+def pool_status(engine) -> dict:
+    """Connection pool counters plus how close the pool is to exhaustion"""
+    pool = engine.pool
+    status = {}
+    for state in ("size", "checkedin", "checkedout", "overflow"):
+        reader = getattr(pool, state, None)
+        if reader is not None:
+            status[state] = reader()
+
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    if "size" in status and max_overflow >= 0:
+        capacity = status["size"] + max_overflow
+        status["saturation"] = round(status["checkedout"] / capacity, 3) if capacity else None
+    return status
+
+
+class DatabaseProbe:
+    def __init__(self, engine, interval: float = PROBE_INTERVAL, timeout: float = PROBE_TIMEOUT):
+        self.engine = engine
+        self.interval = interval
+        self.timeout = timeout
+        self.migration_version: Optional[str] = None
+        self._version_loaded = False
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _check(self) -> dict:
+        start = time.perf_counter()
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            if not self._version_loaded:
+                # Only changes on deploy, which restarts the process
+                self.migration_version = current_version(conn)
+                self._version_loaded = True
+        return {"db": "connected", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    async def refresh(self) -> dict:
+        async with self._lock:
+            try:
+                result = await asyncio.wait_for(run_in_threadpool(self._check), self.timeout)
+            except asyncio.TimeoutError:
+                result = {"db": "timeout", "error": f"no response within {self.timeout}s"}
+            except Exception as e:
+                result = {"db": "disconnected", "error": str(e)}
+            self._result = result
+            self._checked_at = time.monotonic()
+            return result
+
+    async def run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    async def snapshot(self) -> dict:
+        """Cached probe result, refreshed inline only if missing or stale"""
+        age = time.monotonic() - self._checked_at
+        if self._result is None or age > self.interval * 3:
+            await self.refresh()
+            age = 0.0
+        return {
+            **self._result,
+            "checked_seconds_ago": round(age, 2),
+            "migration_version": self.migration_version,
+            "pool": pool_status(self.engine),
+        }
+
+    @property
+    def healthy(self) -> bool:
+        return self._result is not None and self._result["db"] == "connected"
@@ -0,0 +1,323 @@
+"""
+Idempotency keys for create routes
+
+A POST sent with an ``Idempotency-Key`` header runs once per user and key.
+Its response is stored for IDEMPOTENCY_TTL_HOURS and a retry with the same
+key gets that response back, with ``Idempotent-Replayed: true``, instead
+of creating the case or event again. Reusing a key for a different request
+(method, path, query or body) is a 422. Uploads, which stream their body,
+are hashed as the route reads them, and a retry reads and hashes its body
+before it is compared. A retry arriving while the first request is still running is a
+409.
+
+The key is claimed with an upsert on the (userId, key) index, committed
+on its own before the route runs, so routes that roll back while they
+stream an upload keep holding it. Responses with an error status aren't
+stored, and the key is released so it can be used again. A claim that
+still has no response after IDEMPOTENCY_LEASE_SECONDS, because its
+process died or storing failed, can be claimed again. Stored responses
+are served from an in-process LRU cache of IDEMPOTENCY_CACHE_SIZE
+entries for up to IDEMPOTENCY_CACHE_SECONDS, and expired keys are purged
+by a background task. A KVKK erasure (app.retention) clears stored bodies;
+other processes stop replaying them once their cached copy ages out.
+
+Routers opt in with ``APIRouter(route_class=IdempotentRoute)``.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple, Union
+
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.routing import APIRoute
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from app.auth import get_current_user
+from app.database import get_db
+from app.metrics import record_cache
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1024"))
+# Retries come within seconds; a short stay bounds how long a cleared body is replayed
+IDEMPOTENCY_CACHE_SECONDS = int(os.getenv("IDEMPOTENCY_CACHE_SECONDS", "300"))
+# Longer than the slowest upload, which holds its claim throughout
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "600"))
+PURGE_INTERVAL = 3600
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status: int
+    contentType: Optional[str]
+    body: Optional[str]
+    expiresAt: datetime
+
+    def response(self) -> Response:
+        return Response(
+            self.body,
+            status_code=self.status,
+            media_type=self.contentType,
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+
+class Claim(NamedTuple):
+    bind: object
+    userId: int
+    key: str
+    fingerprint: str
+    claimedAt: datetime
+    expiresAt: datetime
+
+
+class Replay(Exception):
+    """Raised by ``claim_key`` to answer with a stored response"""
+
+    def __init__(self, stored: StoredResponse):
+        self.stored = stored
+
+
+class IdempotencyCache:
+    def __init__(self, maxsize: int = IDEMPOTENCY_CACHE_SIZE, seconds: int = IDEMPOTENCY_CACHE_SECONDS):
+        self.maxsize = maxsize
+        self.seconds = seconds
+        self._responses: "OrderedDict[Tuple[int, str], Tuple[StoredResponse, datetime]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            stored, until = self._responses.get((user_id, key), (None, None))
+            if stored is not None and until <= datetime.utcnow():
+                del self._responses[(user_id, key)]
+                stored = None
+            if stored is not None:
+                self._responses.move_to_end((user_id, key))
+        record_cache("idempotency", stored is not None)
+        return stored
+
+    def put(self, user_id: int, key: str, stored: StoredResponse):
+        until = min(stored.expiresAt, datetime.utcnow() + timedelta(seconds=self.seconds))
+        with self._lock:
+            self._responses[(user_id, key)] = (stored, until)
+            self._responses.move_to_end((user_id, key))
+            while len(self._responses) > self.maxsize:
+                self._responses.popitem(last=False)
+
+    def forget_user(self, user_id: int):
+        with self._lock:
+            for cached in [cached for cached in self._responses if cached[0] == user_id]:
+                del self._responses[cached]
+
+
+idempotency_cache = IdempotencyCache()
+
+
+def upsert(bind):
+    dialect = postgresql if bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(IdempotencyKey)
+
+
+def request_digest(request: Request):
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.url.path}?{request.url.query}\n".encode())
+    return digest
+
+
+def streams_body(route) -> bool:
+    """Routes reading ``request.stream()`` themselves (uploads, imports) have no body field"""
+    return getattr(route, "body_field", None) is None
+
+
+class HashedBody:
+    """
+    ASGI receive that hashes the body as the route streams it, so an
+    upload is fingerprinted without being held in memory
+    """
+
+    def __init__(self, request: Request):
+        self.digest = request_digest(request)
+        self.receive = request.receive
+        self.done = False
+
+    async def __call__(self):
+        message = await self.receive()
+        if message["type"] == "http.request":
+            self.digest.update(message.get("body", b""))
+            self.done = not message.get("more_body", False)
+        return message
+
+    async def finish(self) -> str:
+        """The fingerprint, reading whatever of the body the route left unread"""
+        while not self.done:
+            if (await self())["type"] != "http.request":
+                break
+        return self.digest.hexdigest()
+
+
+async def fingerprint(request: Request) -> str:
+    """SHA-256 of the method, path, query and body"""
+    hashed = getattr(request.state, "hashed_body", None)
+    if hashed is not None:
+        return await hashed.finish()
+    digest = request_digest(request)
+    # Already read and parsed by FastAPI, this is the cached copy
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+def claim(bind, user_id: int, key: str, request_fingerprint: str) -> Union[Claim, StoredResponse]:
+    """Claim ``key`` in a transaction of its own, or return the response stored for it"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    row = upsert(bind).values(
+        userId=user_id, key=key, fingerprint=request_fingerprint, createdAt=now, expiresAt=expires_at,
+    )
+    with bind.begin() as conn:
+        claimed = conn.execute(row.on_conflict_do_update(
+            index_elements=[IdempotencyKey.userId, IdempotencyKey.key],
+            set_={"fingerprint": row.excluded.fingerprint, "status": None, "contentType": None,
+                  "body": None, "createdAt": row.excluded.createdAt, "expiresAt": row.excluded.expiresAt},
+            # Expired keys, and claims whose request died before storing a response
+            where=or_(
+                IdempotencyKey.expiresAt <= now,
+                and_(
+                    IdempotencyKey.status.is_(None),
+                    IdempotencyKey.createdAt <= now - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS),
+                ),
+            ),
+        )).rowcount
+        if claimed:
+            return Claim(bind, user_id, key, request_fingerprint, now, expires_at)
+        existing = conn.execute(
+            select(IdempotencyKey).where(IdempotencyKey.userId == user_id, IdempotencyKey.key == key)
+        ).one()
+    if existing.status is None:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+    return StoredResponse(existing.fingerprint, existing.status, existing.contentType, existing.body, existing.expiresAt)
+
+
+async def claim_key(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Claim the request's key, or raise Replay with the response stored for it"""
+    if idempotency_key is None:
+        return
+    streamed = getattr(request.state, "hashed_body", None) is not None
+    # A streamed body is hashed while the route reads it; until then the
+    # claim holds a placeholder, and a retry reads its body to compare
+    request_fingerprint = request_digest(request).hexdigest() if streamed else await fingerprint(request)
+    stored = idempotency_cache.get(current_user.id, idempotency_key)
+    if stored is None:
+        claimed = claim(db.get_bind(), current_user.id, idempotency_key, request_fingerprint)
+        if isinstance(claimed, Claim):
+            request.state.idempotency = claimed
+            return
+        stored = claimed
+        idempotency_cache.put(current_user.id, idempotency_key, stored)
+    if streamed:
+        request_fingerprint = await fingerprint(request)
+    if stored.fingerprint != request_fingerprint:
+        raise HTTPException(status_code=422, detail="This Idempotency-Key was used for a different request")
+    raise Replay(stored)
+
+
+def owned(claim: Claim):
+    """The claim's row, unless its lease ran out and another request took it"""
+    return and_(
+        IdempotencyKey.userId == claim.userId,
+        IdempotencyKey.key == claim.key,
+        IdempotencyKey.createdAt == claim.claimedAt,
+        IdempotencyKey.status.is_(None),
+    )
+
+
+def store(claim: Claim, response: Response, request_fingerprint: str):
+    stored = StoredResponse(
+        request_fingerprint, response.status_code, response.media_type, response.body.decode(), claim.expiresAt
+    )
+    with claim.bind.begin() as conn:
+        conn.execute(
+            update(IdempotencyKey).where(owned(claim))
+            .values(fingerprint=stored.fingerprint, status=stored.status, contentType=stored.contentType, body=stored.body)
+        )
+    idempotency_cache.put(claim.userId, claim.key, stored)
+
+
+def release(claim: Claim):
+    with claim.bind.begin() as conn:
+        conn.execute(delete(IdempotencyKey).where(owned(claim)))
+
+
+class IdempotentRoute(APIRoute):
+    """APIRoute honouring Idempotency-Key on its POST endpoints"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        dependencies = list(kwargs.get("dependencies") or [])
+        # include_router copies the dependencies of routes it re-creates
+        if "POST" in (kwargs.get("methods") or ()) and not any(d.dependency is claim_key for d in dependencies):
+            kwargs["dependencies"] = [Depends(claim_key), *dependencies]
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def idempotent_handler(request: Request) -> Response:
+            if request.method == "POST" and "idempotency-key" in request.headers and streams_body(self):
+                hashed = HashedBody(request)
+                request = Request(request.scope, hashed)
+                request.state.hashed_body = hashed
+            try:
+                response = await handler(request)
+            except Replay as replay:
+                return replay.stored.response()
+            except Exception:
+                claim = getattr(request.state, "idempotency", None)
+                if claim is not None:
+                    release(claim)
+                raise
+            claim = getattr(request.state, "idempotency", None)
+            if claim is not None:
+                if response.status_code < 400 and hasattr(response, "body"):
+                    store(claim, response, await fingerprint(request))
+                else:
+                    release(claim)
+            return response
+
+        return idempotent_handler
+
+
+def purge_expired(engine, now: Optional[datetime] = None) -> int:
+    with engine.begin() as conn:
+        return conn.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expiresAt <= (now or datetime.utcnow()))
+        ).rowcount
+
+
+async def run(engine, interval: float = PURGE_INTERVAL):
+    """Background task deleting expired keys every hour"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(purge_expired, engine)
+        except Exception:
+            logger.exception("Purging idempotency keys failed")
@@ -0,0 +1,528 @@
+"""
+Case list imports from UYAP exports and spreadsheets
+
+An upload is kept in ImportFile until a worker (app.jobs) has read it,
+its content split into ImportFilePart rows of IMPORT_PART_BYTES. The
+upload route spools the request body to a temporary file and writes it a
+part at a time, and the worker reads it through ``PartReader``, a
+seekable file over the parts that holds one part at a time. Neither side
+holds the whole file, however close it is to IMPORT_MAX_BYTES.
+
+CSV and XLSX files are read as row generators. CSV goes through
+``csv.reader`` after sniffing the encoding (UTF-8 or Windows-1254) and
+the delimiter. XLSX sheets are read with ``iterparse`` and each row is
+dropped once read. Memory therefore stays flat however long the sheet is.
+
+Headers are matched against Turkish and English column names after the
+same folding as client names (app.parties), so "Esas No", "ESAS NO" and
+"esas_no" are all the case number. Rows are written in chunks of
+IMPORT_CHUNK_SIZE with one multi-row INSERT per table:
+
+- a client is reused when one with the same normalized name exists,
+  found through the ``n:`` key in ClientNameKey;
+- a row whose case number already existed before the import is skipped
+  as a duplicate, found through the ``(userId, caseNumber)`` index;
+- repeated case numbers within the file add their hearings to the case
+  created for the first one.
+
+Each chunk commits together with the number of rows done and the counts
+so far, so a retried job continues after the last committed chunk.
+"""
+import codecs
+import csv
+import io
+import logging
+import os
+import zipfile
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.crypto import with_blind_indexes
+from app.jobs import JobContext, PermanentJobError
+from app.models import Case, Client, ClientNameKey, Event, ImportFile, ImportFilePart
+from app.parties import blocking_keys, normalize, tokens
+from app.sync import next_version
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+IMPORT_PART_BYTES = 1024 * 1024
+# Row errors kept in the job result; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+SNIFF_BYTES = 64 * 1024
+
+HEARING_TITLE = "Duruşma"
+HEARING_TYPE = "hearing"
+
+COLUMNS = {
+    "client.name": ("muvekkil", "muvekkil adi", "muvekkil adi soyadi", "muvekkil ad soyad", "ad soyad",
+                    "musteri", "client", "client name"),
+    "client.email": ("e posta", "eposta", "e mail", "email", "mail"),
+    "client.phone": ("telefon", "tel", "gsm", "cep telefonu", "phone"),
+    "client.address": ("adres", "address"),
+    "case.caseNumber": ("esas no", "esas numarasi", "dosya no", "dosya numarasi", "case number", "case no"),
+    "case.title": ("dava", "dava konusu", "konu", "baslik", "dosya turu", "dava turu", "title"),
+    "case.court": ("mahkeme", "birim", "court"),
+    "case.description": ("aciklama", "not", "notlar", "description"),
+    "case.status": ("durum", "dosya durumu", "status"),
+    "case.startDate": ("acilis tarihi", "dava tarihi", "baslangic tarihi", "start date"),
+    "event.eventDate": ("durusma tarihi", "durusma", "sonraki durusma", "hearing date", "event date"),
+    "event.title": ("islem", "etkinlik", "event"),
+}
+HEADER_FIELDS = {alias: field for field, aliases in COLUMNS.items() for alias in aliases}
+DATE_FIELDS = {"case.startDate", "event.eventDate"}
+CLOSED_STATUSES = {"kapali", "kapandi", "kapatildi", "karar", "karara cikti", "dusme", "arsiv", "closed"}
+
+DATE_FORMATS = ("%d.%m.%Y %H:%M", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+EXCEL_EPOCH = datetime(1899, 12, 30)
+# Day counts read as Excel dates: 1900-01-01 up to the end of 2199
+EXCEL_DAYS = (1, (datetime(2200, 1, 1) - EXCEL_EPOCH).days)
+
+XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+class RowError(ValueError):
+    pass
+
+
+def file_format(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in (".csv", ".txt"):
+        return "csv"
+    if extension == ".xlsx":
+        return "xlsx"
+    raise ValueError("Only .csv and .xlsx files can be imported")
+
+
+def sniff_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # Incremental, so a character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder("utf-8")().decode(sample)
+        return "utf-8"
+    except UnicodeDecodeError:
+        # Excel's "CSV" on Turkish Windows
+        return "cp1254"
+
+
+def store_parts(db: Session, import_id: int, source) -> int:
+    """Write the file ``source`` as the upload's parts; returns the size"""
+    start = 0
+    while True:
+        data = source.read(IMPORT_PART_BYTES)
+        if not data:
+            return start
+        db.execute(insert(ImportFilePart).values(importId=import_id, start=start, data=data))
+        start += len(data)
+
+
+def delete_upload(db: Session, import_id: int):
+    db.execute(delete(ImportFilePart).where(ImportFilePart.importId == import_id))
+    db.execute(delete(ImportFile).where(ImportFile.id == import_id))
+
+
+class PartReader(io.RawIOBase):
+    """Seekable read-only file over an upload's parts, loading one part at a time"""
+
+    def __init__(self, db: Session, upload: ImportFile):
+        self.db = db
+        self.import_id = upload.id
+        self.size = upload.size
+        self.position = 0
+        self.part_start = 0
+        self.part = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(base + offset, 0)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size:
+            return 0
+        if not self.part_start <= self.position < self.part_start + len(self.part):
+            part = self.db.execute(
+                select(ImportFilePart.start, ImportFilePart.data)
+                .where(ImportFilePart.importId == self.import_id, ImportFilePart.start <= self.position)
+                .order_by(ImportFilePart.start.desc())
+                .limit(1)
+            ).first()
+            if part is None or part.start + len(part.data) <= self.position:
+                raise PermanentJobError("Import file is incomplete")
+            self.part_start, self.part = part.start, part.data
+        offset = self.position - self.part_start
+        count = min(len(buffer), len(self.part) - offset)
+        buffer[:count] = self.part[offset:offset + count]
+        self.position += count
+        return count
+
+
+def csv_rows(stream) -> Iterator[List[str]]:
+    sample = stream.read(SNIFF_BYTES)
+    stream.seek(0)
+    encoding = sniff_encoding(sample)
+    text = sample.decode(encoding, errors="ignore")
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ";" if text.count(";") > text.count(",") else ","
+    text_stream = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline="")
+    try:
+        yield from csv.reader(text_stream, delimiter=delimiter)
+    except csv.Error as exc:
+        raise PermanentJobError(f"Not a readable CSV file: {exc}")
+    finally:
+        # Closing the wrapper would close the caller's stream
+        text_stream.detach()
+
+
+def column_index(reference: str) -> int:
+    """0 for A1, 27 for AB7"""
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def first_sheet(archive: zipfile.ZipFile) -> str:
+    with archive.open("xl/workbook.xml") as workbook:
+        sheet = next(elem for _, elem in iterparse(workbook) if elem.tag == f"{XLSX_NS}sheet")
+    relation = sheet.get(f"{REL_NS}id")
+    with archive.open("xl/_rels/workbook.xml.rels") as rels:
+        target = next(
+            elem.get("Target") for _, elem in iterparse(rels)
+            if elem.tag == f"{PACKAGE_REL_NS}Relationship" and elem.get("Id") == relation
+        )
+    return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+
+
+def shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as source:
+        for _, elem in iterparse(source):
+            if elem.tag == f"{XLSX_NS}si":
+                strings.append("".join(t.text or "" for t in elem.iter(f"{XLSX_NS}t")))
+                elem.clear()
+    return strings
+
+
+def xlsx_rows(stream) -> Iterator[List[Optional[str]]]:
+    try:
+        archive = zipfile.ZipFile(stream)
+        strings = shared_strings(archive)
+        sheet = first_sheet(archive)
+    except (zipfile.BadZipFile, KeyError, StopIteration) as exc:
+        raise PermanentJobError(f"Not a readable .xlsx file: {exc}")
+    with archive.open(sheet) as source:
+        parent = None
+        for event, elem in iterparse(source, events=("start", "end")):
+            if event == "start":
+                if elem.tag == f"{XLSX_NS}sheetData":
+                    parent = elem
+                continue
+            if elem.tag != f"{XLSX_NS}row":
+                continue
+            row: List[Optional[str]] = []
+            for cell in elem.iter(f"{XLSX_NS}c"):
+                kind = cell.get("t")
+                if kind == "inlineStr":
+                    value = "".join(t.text or "" for t in cell.iter(f"{XLSX_NS}t"))
+                else:
+                    value = cell.findtext(f"{XLSX_NS}v")
+                    if value is not None and kind == "s":
+                        value = strings[int(value)]
+                index = column_index(cell.get("r", "")) if cell.get("r") else len(row)
+                row.extend([None] * (index - len(row) + 1))
+                row[index] = value
+            # Read rows are dropped so memory doesn't grow with the sheet
+            parent.remove(elem)
+            yield row
+
+
+def parse_date(value: str) -> datetime:
+    try:
+        # Dates in XLSX cells are day counts since Excel's epoch
+        days = float(value)
+    except ValueError:
+        pass
+    else:
+        # Also rejects inf and nan, which timedelta can't take
+        if not EXCEL_DAYS[0] <= days < EXCEL_DAYS[1]:
+            raise RowError(f"Date out of range {value!r}")
+        return EXCEL_EPOCH + timedelta(days=days)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"Unrecognized date {value!r}")
+
+
+def header_fields(header: List[Optional[str]]) -> Dict[int, str]:
+    fields = {}
+    for index, name in enumerate(header):
+        field = HEADER_FIELDS.get(normalize(str(name or "")))
+        if field and field not in fields.values():
+            fields[index] = field
+    return fields
+
+
+def records(rows: Iterator[list]) -> Iterator[Tuple[int, dict]]:
+    """``(row number, {field: value})`` for each data row, numbered as in the spreadsheet"""
+    fields = None
+    for number, row in enumerate(rows, start=1):
+        values = [str(v).strip() if v is not None else "" for v in row]
+        if not any(values):
+            continue
+        if fields is None:
+            fields = header_fields(values)
+            if "client.name" not in fields.values():
+                raise PermanentJobError(
+                    "No client name column among: " + ", ".join(v for v in values if v)
+                )
+            continue
+        yield number, {field: values[i] for i, field in fields.items() if i < len(values) and values[i]}
+
+
+def case_values(record: dict) -> dict:
+    number = " ".join(record.get("case.caseNumber", "").split()) or None
+    court = record.get("case.court")
+    title = record.get("case.title") or " ".join(filter(None, (court, number)))
+    if not title:
+        raise RowError("No case title or case number")
+    description = record.get("case.description")
+    if court and record.get("case.title"):
+        description = "\n".join(filter(None, (court, description)))
+    status = "closed" if normalize(record.get("case.status", "")) in CLOSED_STATUSES else "active"
+    start = record.get("case.startDate")
+    return {
+        "caseNumber": number,
+        "title": title,
+        "description": description,
+        "status": status,
+        "startDate": parse_date(start) if start else None,
+    }
+
+
+class Importer:
+    """Writes parsed rows for one user, a chunk at a time"""
+
+    def __init__(self, db: Session, user_id: int, state: Optional[dict] = None):
+        self.db = db
+        self.user_id = user_id
+        self.clients: Dict[str, int] = {}
+        self.cases: Dict[str, int] = {}
+        state = state or {}
+        # Cases up to this id existed before the import; later ones with a
+        # repeated number were created by it, possibly in an earlier attempt
+        self.last_case_id = state.get("lastCaseId")
+        if self.last_case_id is None:
+            self.last_case_id = db.execute(select(func.max(Case.id))).scalar() or 0
+        self.counts = state.get("counts") or {
+            "rows": 0, "clients": 0, "cases": 0, "events": 0, "duplicates": 0, "errors": 0,
+        }
+        self.errors: List[dict] = state.get("errors") or []
+
+    def error(self, number: int, message: str):
+        self.counts["errors"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": number, "error": message})
+
+    def resolve_clients(self, names: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Name keys of ``names`` and the ones without a client yet. A key is
+        the ``n:`` blocking key, so names differing only in case, Turkish
+        letters, word order or "Ltd. Şti." share a client.
+        """
+        keys = {name: "n:" + " ".join(sorted(tokens(name))) for name in names}
+        unseen = set(keys.values()) - set(self.clients)
+        if unseen:
+            # Descending, so the oldest of clients sharing the key wins
+            for key, client_id in self.db.execute(
+                select(ClientNameKey.key, ClientNameKey.clientId)
+                .where(ClientNameKey.userId == self.user_id, ClientNameKey.key.in_(unseen))
+                .order_by(ClientNameKey.clientId.desc())
+            ):
+                self.clients[key] = client_id
+        new = {}
+        for name, key in keys.items():
+            if key not in self.clients:
+                new.setdefault(key, name)
+        return keys, new
+
+    def insert_clients(self, new: Dict[str, str], contacts: Dict[str, dict], version: int):
+        ids = self.db.execute(
+            insert(Client).returning(Client.id, sort_by_parameter_order=True),
+            [
+                with_blind_indexes({
+                    "userId": self.user_id,
+                    "name": name,
+                    "email": contacts[key].get("client.email"),
+                    "phone": contacts[key].get("client.phone"),
+                    "address": contacts[key].get("client.address"),
+                    "syncVersion": version,
+                })
+                for key, name in new.items()
+            ],
+        ).scalars().all()
+        name_keys = []
+        for (key, name), client_id in zip(new.items(), ids):
+            self.clients[key] = client_id
+            name_keys.extend({"userId": self.user_id, "clientId": client_id, "key": k} for k in blocking_keys(name))
+        if name_keys:
+            self.db.execute(insert(ClientNameKey), name_keys)
+        self.counts["clients"] += len(ids)
+
+    def write(self, chunk: List[Tuple[int, dict]]):
+        version = next_version(self.db, self.user_id)
+        rows = []
+        for number, record in chunk:
+            try:
+                if not tokens(record.get("client.name", "")):
+                    raise RowError("No client name")
+                values = case_values(record)
+                when = record.get("event.eventDate")
+                rows.append((record, values, parse_date(when) if when else None))
+            except RowError as exc:
+                self.error(number, str(exc))
+
+        numbers = {values["caseNumber"] for _, values, _ in rows if values["caseNumber"]} - set(self.cases)
+        existing = set()
+        for number, case_id in self.db.execute(
+            select(Case.caseNumber, Case.id).where(Case.userId == self.user_id, Case.caseNumber.in_(numbers))
+        ) if numbers else ():
+            if case_id <= self.last_case_id:
+                existing.add(number)
+            else:
+                self.cases.setdefault(number, case_id)
+        if existing:
+            kept = [row for row in rows if row[1]["caseNumber"] not in existing]
+            self.counts["duplicates"] += len(rows) - len(kept)
+            rows = kept
+
+        keys, new = self.resolve_clients([record["client.name"] for record, _, _ in rows])
+        if new:
+            contacts = {}
+            for record, _, _ in rows:
+                contacts.setdefault(keys[record["client.name"]], record)
+            self.insert_clients(new, contacts, version)
+
+        # Repeated case numbers add hearings to the case of the first row
+        cases, pending, hearings = [], {}, []
+        for record, values, when in rows:
+            number = values["caseNumber"]
+            if number is None or (number not in self.cases and number not in pending):
+                if number is not None:
+                    pending[number] = len(cases)
+                cases.append({
+                    **values,
+                    "userId": self.user_id,
+                    "clientId": self.clients[keys[record["client.name"]]],
+                    "syncVersion": version,
+                })
+            if when:
+                position = pending.get(number, len(cases) - 1) if number not in self.cases else None
+                hearings.append((number, position, when, record.get("event.title")))
+
+        case_ids = self.db.execute(
+            insert(Case).returning(Case.id, sort_by_parameter_order=True), cases
+        ).scalars().all() if cases else []
+        for values, case_id in zip(cases, case_ids):
+            if values["caseNumber"]:
+                self.cases[values["caseNumber"]] = case_id
+        events = [
+            {
+                "caseId": case_ids[position] if position is not None else self.cases[number],
+                "title": title or HEARING_TITLE,
+                "eventType": HEARING_TYPE,
+                "eventDate": when,
+                "syncVersion": version,
+            }
+            for number, position, when, title in hearings
+        ]
+        if events:
+            self.db.execute(insert(Event), events)
+        self.counts["cases"] += len(case_ids)
+        self.counts["events"] += len(events)
+        self.counts["rows"] += len(chunk)
+
+    def state(self) -> dict:
+        return {"lastCaseId": self.last_case_id, "counts": dict(self.counts), "errors": list(self.errors)}
+
+    def result(self) -> dict:
+        return {**self.counts, "errorDetails": self.errors}
+
+
+def import_rows(db: Session, upload: ImportFile, context: Optional[JobContext] = None,
+                chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    stream = io.BufferedReader(PartReader(db, upload), buffer_size=SNIFF_BYTES)
+    rows = xlsx_rows(stream) if upload.format == "xlsx" else csv_rows(stream)
+    importer = Importer(db, upload.userId, upload.state)
+    chunk: List[Tuple[int, dict]] = []
+
+    def flush(last_row: int):
+        importer.write(chunk)
+        db.execute(update(ImportFile).where(ImportFile.id == upload.id).values(rowsDone=last_row, state=importer.state()))
+        db.commit()
+        chunk.clear()
+        if context is not None:
+            context.progress(stream.tell() / max(upload.size, 1), f"{importer.counts['rows']} rows")
+
+    done = upload.rowsDone
+    for number, record in records(rows):
+        if number <= done:
+            continue
+        chunk.append((number, record))
+        if len(chunk) >= chunk_size:
+            flush(number)
+    if chunk:
+        flush(chunk[-1][0])
+    return importer.result()
+
+
+def run_import(context: JobContext) -> dict:
+    """Job handler for ``import``"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        upload = db.get(ImportFile, context.payload["importId"])
+        if upload is None:
+            raise PermanentJobError("Import file is gone")
+        try:
+            result = import_rows(db, upload, context)
+        except PermanentJobError:
+            db.rollback()
+            delete_upload(db, upload.id)
+            db.commit()
+            raise
+        # The upload is only needed until every row is in
+        delete_upload(db, upload.id)
+        db.commit()
+        return result
+    finally:
+        db.close()
@@ -0,0 +1,338 @@
+"""
+Database-backed job queue
+
+Request handlers enqueue a Job row and return at once; clients poll
+``GET /api/jobs/{id}``. ``run_worker.py`` claims queued jobs and runs them
+in a process pool, so CPU-heavy work (imports, exports, reports) neither
+holds the event loop nor counts against the proxy's request timeout.
+
+Claiming is one ``UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP
+LOCKED)``, so any number of workers share the queue without handing out a
+job twice. A failed job is retried with exponential backoff until it
+reaches ``maxAttempts``; a handler raises ``PermanentJobError`` for
+failures a retry can't fix. Workers heartbeat their running jobs, and jobs
+of a worker that died are requeued once their heartbeat is STALE_AFTER
+old.
+
+Handlers are registered in HANDLERS as ``"module:function"`` so pool
+processes resolve them without importing everything up front. A handler
+takes a ``JobContext`` and returns a JSON-serializable result.
+"""
+import importlib
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "30"))
+MAX_RETRY_DELAY = 3600
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = timedelta(minutes=5)
+# Progress writes from a handler are throttled to one per interval
+PROGRESS_INTERVAL = 1.0
+
+# Job kind -> "module:function"
+HANDLERS: Dict[str, str] = {
+    "import": "app.importer:run_import",
+    "case_report": "app.reports:run_case_report",
+    "hearing_reports": "app.reports:run_hearing_reports",
+    "agenda": "app.agenda:run_precompute",
+    "retention": "app.retention:run_erasure",
+}
+
+
+class PermanentJobError(Exception):
+    """A failure that retrying won't fix, e.g. an unreadable input file"""
+
+
+def resolve(target: str) -> Callable:
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def unknown_kind(kind: str) -> PermanentJobError:
+    # E.g. queued by a newer release than this worker runs
+    return PermanentJobError(f"No handler for job kind {kind!r}")
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    user_id: Optional[int] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    commit: bool = True,
+) -> Job:
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        userId=user_id,
+        maxAttempts=max_attempts,
+        runAt=datetime.utcnow(),
+    )
+    db.add(job)
+    if commit:
+        db.commit()
+        db.refresh(job)
+    else:
+        db.flush()
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt: 30s, 60s, 120s, ... with 10% jitter"""
+    delay = min(JOB_RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def requeue_stale(db: Session) -> int:
+    """Give jobs of dead workers back to the queue, or fail them if they are out of attempts"""
+    now = datetime.utcnow()
+    requeued = db.execute(
+        update(Job)
+        .where(Job.status == "running", Job.heartbeatAt < now - STALE_AFTER)
+        .values(
+            status=case((Job.attempts >= Job.maxAttempts, "failed"), else_="queued"),
+            error="Worker stopped responding",
+            workerId=None,
+            runAt=now,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if requeued:
+        logger.warning("Requeued %d stale jobs", requeued)
+    return requeued
+
+
+def claim(db: Session, worker_id: str, limit: int) -> List[Tuple[int, str]]:
+    """Mark up to ``limit`` due jobs as ours; returns their ``(id, kind)``"""
+    now = datetime.utcnow()
+    queued = (
+        select(Job.id)
+        .where(Job.status == "queued", Job.runAt <= now)
+        .order_by(Job.runAt, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id.in_(queued))
+        .values(
+            status="running",
+            workerId=worker_id,
+            attempts=Job.attempts + 1,
+            startedAt=now,
+            heartbeatAt=now,
+        )
+        .returning(Job.id, Job.kind)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted(tuple(row) for row in claimed)
+
+
+def finish(db: Session, job_id: int, worker_id: str, result: Any = None, error: Optional[BaseException] = None):
+    """Record a job's outcome, scheduling a retry for a failure with attempts left"""
+    job = db.get(Job, job_id)
+    if job is None or job.status != "running" or job.workerId != worker_id:
+        # Requeued as stale meanwhile; the newer run owns the row
+        db.rollback()
+        return
+    now = datetime.utcnow()
+    if error is None:
+        job.status, job.result, job.progress, job.error, job.finishedAt = "done", result, 1.0, None, now
+    else:
+        job.error = f"{type(error).__name__}: {error}"
+        if isinstance(error, PermanentJobError) or job.attempts >= job.maxAttempts:
+            job.status, job.finishedAt = "failed", now
+        else:
+            job.status, job.workerId = "queued", None
+            job.runAt = now + timedelta(seconds=retry_delay(job.attempts))
+        logger.warning("Job %s (%s) attempt %d failed: %s", job.id, job.kind, job.attempts, job.error)
+    db.commit()
+
+
+class JobContext:
+    """What a handler gets: the job's payload and a way to report progress"""
+
+    def __init__(self, job: Job):
+        self.id = job.id
+        self.kind = job.kind
+        self.user_id = job.userId
+        self.payload = job.payload
+        self.attempt = job.attempts
+        self._reported = 0.0
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        now = time.monotonic()
+        if fraction < 1 and now - self._reported < PROGRESS_INTERVAL:
+            return
+        self._reported = now
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Job).where(Job.id == self.id)
+                .values(progress=min(max(fraction, 0.0), 1.0), message=message, heartbeatAt=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+def execute(job_id: int, target: str) -> Any:
+    """Run one claimed job with the HANDLERS ``target`` the worker resolved; called in a pool process"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        context = JobContext(db.get(Job, job_id))
+    finally:
+        db.close()
+    return resolve(target)(context)
+
+
+def init_process():
+    # Ctrl-C reaches the whole process group; the parent shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app.pubsub import PUBSUB_BACKEND, PostgresBackend, broker
+
+    if PUBSUB_BACKEND == "postgres":
+        from app.database import engine
+
+        # Publish only: changes written by jobs reach the web processes' streams
+        broker.backend = PostgresBackend(engine)
+
+
+class Worker:
+    """
+    Claims jobs while it has free processes and records their outcome.
+    Pool processes are spawned, not forked, so they share no connections
+    with the worker. ``run_once`` runs due jobs inline instead, for tests
+    and single-process setups.
+    """
+
+    def __init__(self, session_factory, processes: int = JOB_WORKER_PROCESSES, poll_interval: float = JOB_POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.running: Dict[Future, int] = {}
+        self.stopping = False
+        self._heartbeat = 0.0
+
+    def start_pool(self):
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_process,
+        )
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run_once(self) -> int:
+        """Run queued jobs inline until none are due; returns how many ran"""
+        ran = 0
+        db = self.session_factory()
+        try:
+            while True:
+                claimed = claim(db, self.id, 1)
+                if not claimed:
+                    return ran
+                job_id, kind = claimed[0]
+                if kind not in HANDLERS:
+                    finish(db, job_id, self.id, error=unknown_kind(kind))
+                    continue
+                try:
+                    finish(db, job_id, self.id, result=execute(job_id, HANDLERS[kind]))
+                except Exception as exc:
+                    finish(db, job_id, self.id, error=exc)
+                ran += 1
+        finally:
+            db.close()
+
+    def reap(self, db: Session, done):
+        broken = False
+        for future in done:
+            job_id = self.running.pop(future)
+            try:
+                finish(db, job_id, self.id, result=future.result())
+            except BrokenProcessPool as exc:
+                # A pool process died (e.g. out of memory); counts as a failed attempt
+                broken = True
+                finish(db, job_id, self.id, error=exc)
+            except Exception as exc:
+                finish(db, job_id, self.id, error=exc)
+        if broken:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.start_pool()
+
+    def heartbeat(self, db: Session):
+        if time.monotonic() - self._heartbeat < HEARTBEAT_INTERVAL:
+            return
+        self._heartbeat = time.monotonic()
+        if self.running:
+            db.execute(
+                update(Job)
+                .where(Job.id.in_(list(self.running.values())), Job.workerId == self.id)
+                .values(heartbeatAt=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        requeue_stale(db)
+
+    def step(self, db: Session):
+        """Fill free processes with due jobs, then wait up to a poll interval for one to finish"""
+        self.heartbeat(db)
+        free = self.processes - len(self.running)
+        for job_id, kind in claim(db, self.id, free) if free else []:
+            if kind not in HANDLERS:
+                finish(db, job_id, self.id, error=unknown_kind(kind))
+                continue
+            self.running[self.pool.submit(execute, job_id, HANDLERS[kind])] = job_id
+        if self.running:
+            done, _ = wait(list(self.running), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+            self.reap(db, done)
+        else:
+            time.sleep(self.poll_interval)
+
+    def run(self):
+        """Work until SIGTERM or SIGINT, then let running jobs finish"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.start_pool()
+        logger.info("Worker %s running jobs in %d processes", self.id, self.processes)
+        db = self.session_factory()
+        try:
+            while not self.stopping:
+                self.step(db)
+            logger.info("Worker %s stopping, waiting for %d jobs", self.id, len(self.running))
+            done, _ = wait(list(self.running))
+            self.reap(db, done)
+        finally:
+            self.pool.shutdown()
+            db.close()
@@ -1,20 +1,53 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import os
 from dotenv import load_dotenv
 
 from app.database import engine, Base
-from app.routers import auth, clients, cases, events, stats
+from app.routers import auth, clients, cases, events, stats, health, sync, stream, deadlines, time_entries, invoices, documents, retention, archive, jobs, imports, reports, agenda, batch
+from app import crypto, idempotency, metrics, tokens
+from app import archive as event_archive
+from app.audit import AuditMiddleware, audit_log
+from app.auth import run_session_pruning
+from app.pubsub import broker
+from app.health import DatabaseProbe
+from app.migrations import check_schema
 
 load_dotenv()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
+    crypto.check_keys()
+    check_schema(engine, Base.metadata)
+    # Event inserts fail on Postgres until the current month's partition exists
+    event_archive.maintain_event_partitions(engine)
+    broker.start(engine)
+    app.state.db_probe = DatabaseProbe(engine)
+    probe_task = asyncio.create_task(app.state.db_probe.run())
+    monitor_task = asyncio.create_task(metrics.monitor(engine))
+    denylist_task = asyncio.create_task(tokens.sync_denylist(engine))
+    audit_log.start()
+    audit_task = asyncio.create_task(audit_log.run(engine))
+    archive_task = asyncio.create_task(event_archive.run(engine))
+    idempotency_task = asyncio.create_task(idempotency.run(engine))
+    session_task = asyncio.create_task(run_session_pruning(engine))
     yield
     # Shutdown
+    probe_task.cancel()
+    monitor_task.cancel()
+    denylist_task.cancel()
+    audit_task.cancel()
+    archive_task.cancel()
+    idempotency_task.cancel()
+    session_task.cancel()
+    # Let a batch the writer was in the middle of finish before draining the rest
+    with suppress(asyncio.CancelledError):
+        await audit_task
+    await audit_log.flush(engine)
+    broker.stop()
 
 app = FastAPI(
     title="AvukatAjanda API",
@@ -31,33 +64,40 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(AuditMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Health checks
 @app.get("/ping")
 async def ping():
     return {"ok": True}
 
-@app.get("/health")
-async def health():
-    try:
-        # DB check with timeout
-        from app.database import SessionLocal
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
-        return {"status": "healthy", "db": "connected"}
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail={"status": "unhealthy", "db": "disconnected", "error": str(e)}
-        )
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render(engine)
+    return Response(content=body, media_type=content_type)
 
 # Routers
+app.include_router(health.router, prefix="/health", tags=["health"])
+app.include_router(health.router, prefix="/api/health", include_in_schema=False)
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(clients.router, prefix="/api/clients", tags=["clients"])
 app.include_router(cases.router, prefix="/api/cases", tags=["cases"])
 app.include_router(events.router, prefix="/api/events", tags=["events"])
+app.include_router(deadlines.router, prefix="/api/deadlines", tags=["deadlines"])
+app.include_router(time_entries.router, prefix="/api/time-entries", tags=["billing"])
+app.include_router(invoices.router, prefix="/api/invoices", tags=["billing"])
+app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
+app.include_router(retention.router, prefix="/api/retention-jobs", tags=["retention"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(imports.router, prefix="/api/imports", tags=["jobs"])
+app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
+app.include_router(archive.router, prefix="/api/archive", tags=["archive"])
+app.include_router(agenda.router, prefix="/api/agenda", tags=["stats"])
+app.include_router(batch.router, prefix="/api/batch", tags=["batch"])
 app.include_router(stats.router, prefix="/api", tags=["stats"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+app.include_router(stream.router, prefix="/api/stream", tags=["stream"])
 
 @app.get("/")
 async def root():
@@ -0,0 +1,143 @@
+"""
+Prometheus metrics
+
+Counters live in-process; when PROMETHEUS_MULTIPROC_DIR is set (one directory
+shared by all uvicorn workers) prometheus_client writes them to mmap files and
+/metrics aggregates every worker's values.
+"""
+import asyncio
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+MONITOR_INTERVAL = float(os.getenv("METRICS_MONITOR_INTERVAL", "1.0"))
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "HTTP requests by route template",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+DB_POOL = Gauge(
+    "db_pool_connections",
+    "Database pool connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+CACHE_HITS = Counter("cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "Cache misses", ["cache"])
+BCRYPT_QUEUE_DEPTH = Gauge(
+    "bcrypt_queue_depth",
+    "Password hash operations waiting for or running in the threadpool",
+    multiprocess_mode="livesum",
+)
+EVENT_LOOP_LAG = Gauge(
+    "event_loop_lag_seconds",
+    "Delay between a scheduled wakeup and the loop running it",
+    multiprocess_mode="max",
+)
+AUDIT_QUEUE_DEPTH = Gauge(
+    "audit_queue_depth",
+    "Audit records waiting to be written",
+    multiprocess_mode="livesum",
+)
+AUDIT_DROPPED = Counter("audit_dropped_total", "Audit records dropped because the queue was full")
+AUDIT_WRITTEN = Counter("audit_written_total", "Audit records written to the database")
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a lookup against a named cache"""
+    if hit:
+        CACHE_HITS.labels(cache).inc()
+    else:
+        CACHE_MISSES.labels(cache).inc()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request count and latency.
+
+    Routes are labelled by their template (``/api/cases/{case_id}``), which
+    FastAPI stores in the scope once a route matches, so label cardinality
+    stays bounded no matter which ids clients request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, template).observe(time.perf_counter() - start)
+            REQUEST_COUNT.labels(method, template, str(status_code)).inc()
+
+
+def update_pool_gauges(engine):
+    """Copy the engine's pool counters into gauges"""
+    pool = engine.pool
+    for state in ("size", "checkedin", "checkedout", "overflow"):
+        reader = getattr(pool, state, None)
+        if reader is not None:
+            DB_POOL.labels(state).set(reader())
+
+
+async def monitor(engine, interval: float = MONITOR_INTERVAL):
+    """
+    Background task sampling event-loop lag and pool usage.
+
+    Runs in every worker so multiprocess gauges stay fresh even for workers
+    that never serve the /metrics scrape.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.set(max(loop.time() - scheduled - interval, 0.0))
+        update_pool_gauges(engine)
+
+
+def render(engine):
+    """Return (body, content type) for the /metrics endpoint"""
+    update_pool_gauges(engine)
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,129 @@
+"""
+Schema checks run at startup
+
+Tables are created at startup, so a new table needs no migration. Changes
+to existing tables (new columns and indexes) ship as alembic revisions in
+alembic/versions, which deploys apply with ``alembic upgrade head`` before
+starting the server. Revisions only add what is missing and skip tables
+that don't exist yet, so they run cleanly against an old database, an
+empty one and one the app created at the current schema alike.
+
+The server refuses to start while a table lacks a mapped column, instead
+of failing every request that reads it.
+"""
+import logging
+from typing import List, Optional
+
+from sqlalchemy import Column, MetaData, String, Table, inspect, text
+
+logger = logging.getLogger(__name__)
+
+# The head of alembic/versions, checked by tests/test_migrations.py; kept
+# here so startup doesn't import alembic
+SCHEMA_REVISION = "0007_import_file_parts"
+
+alembic_version = Table("alembic_version", MetaData(), Column("version_num", String(32), primary_key=True))
+
+
+class SchemaError(RuntimeError):
+    pass
+
+
+def current_version(conn) -> Optional[str]:
+    """Revision stamped in alembic_version, or None for an unmanaged database"""
+    if not inspect(conn).has_table("alembic_version"):
+        return None
+    return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def missing_columns(conn, metadata) -> List[str]:
+    """``Table.column`` for each mapped column an existing table doesn't have"""
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    tables = [table for table in metadata.sorted_tables if table.name in existing]
+    if not tables:
+        return []
+    # One catalog query on Postgres
+    reflected = inspector.get_multi_columns(filter_names=[table.name for table in tables])
+    columns = {name: {column["name"] for column in found} for (_, name), found in reflected.items()}
+    return [
+        f"{table.name}.{column.name}"
+        for table in tables
+        for column in table.columns
+        if column.name not in columns.get(table.name, ())
+    ]
+
+
+def check_schema(engine, metadata) -> Optional[str]:
+    """
+    Replace the unconditional ``create_all`` on startup.
+
+    Missing tables are created from one table listing instead of one probe
+    per table, and an empty database is stamped with SCHEMA_REVISION.
+    Raises SchemaError when existing tables lack mapped columns.
+    """
+    with engine.connect() as conn:
+        existing = set(inspect(conn).get_table_names())
+        version = None
+        if "alembic_version" in existing:
+            version = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+            if version != SCHEMA_REVISION:
+                logger.warning("Database is at migration %s but code expects %s", version, SCHEMA_REVISION)
+        missing = missing_columns(conn, metadata)
+    if missing:
+        raise SchemaError(f"Database lacks columns {', '.join(missing)}; run `alembic upgrade head`")
+
+    tables = [table for table in metadata.sorted_tables if table.name not in existing]
+    if tables:
+        metadata.create_all(bind=engine, tables=tables, checkfirst=False)
+    if version is None and len(tables) == len(metadata.sorted_tables):
+        with engine.begin() as conn:
+            alembic_version.create(conn)
+            conn.execute(alembic_version.insert().values(version_num=SCHEMA_REVISION))
+        version = SCHEMA_REVISION
+    return version
+
+
+def add_columns(table: str, *columns: Column):
+    """Add those of ``columns`` that ``table`` lacks, in an alembic revision"""
+    from alembic import context, op
+
+    existing = set()
+    # Offline (--sql) there is no database to look at, so everything is emitted
+    if not context.is_offline_mode():
+        inspector = inspect(op.get_bind())
+        if not inspector.has_table(table):
+            return
+        existing = {column["name"] for column in inspector.get_columns(table)}
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table, column)
+
+
+def create_index(name: str, table: str, columns: List, **kw):
+    """Create the index unless ``table`` already has it, in an alembic revision"""
+    from alembic import context, op
+
+    if not context.is_offline_mode():
+        inspector = inspect(op.get_bind())
+        if not inspector.has_table(table) or name in {index["name"] for index in inspector.get_indexes(table)}:
+            return
+    op.create_index(name, table, columns, **kw)
+
+
+def alter_type(table: str, column: str, type_, **kw):
+    """Change the type of ``table.column`` unless it already has it, in an alembic revision"""
+    from alembic import context, op
+
+    dialect = context.get_context().dialect
+    # SQLite column types don't constrain what is stored
+    if dialect.name == "sqlite":
+        return
+    if not context.is_offline_mode():
+        inspector = inspect(op.get_bind())
+        if not inspector.has_table(table):
+            return
+        current = {found["name"]: found["type"] for found in inspector.get_columns(table)}
+        if column not in current or current[column].compile(dialect) == type_.compile(dialect):
+            return
+    op.alter_column(table, column, type_=type_, **kw)
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Text
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, ForeignKey, Boolean, Float, Numeric, Text, Index, JSON, LargeBinary
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func, text
 from app.database import Base
+from app.crypto import EncryptedBytes, EncryptedString
 
 class User(Base):
     __tablename__ = "User"
@@ -11,29 +12,58 @@ class User(Base):
     passwordHash = Column(String, nullable=False)
     name = Column(String)
     role = Column(String, default="client")
+    # Per-tenant change counter, bumped by every write to the user's data
+    syncVersion = Column(BigInteger, nullable=False, default=0, server_default="0")
     createdAt = Column(DateTime(timezone=True), server_default=func.now())
     updatedAt = Column(DateTime(timezone=True), onupdate=func.now())
     
     clients = relationship("Client", back_populates="user")
     cases = relationship("Case", back_populates="user")
+    sessions = relationship("UserSession", back_populates="user")
 
 class Client(Base):
     __tablename__ = "Client"
+    __table_args__ = (
+        Index("ix_Client_userId_syncVersion", "userId", "syncVersion"),
+        Index("ix_Client_userId_emailIndex", "userId", "emailIndex"),
+        Index("ix_Client_userId_phoneIndex", "userId", "phoneIndex"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(Integer, ForeignKey("User.id"))
     name = Column(String, nullable=False)
-    email = Column(String)
-    phone = Column(String)
-    address = Column(Text)
+    # Encrypted at rest, looked up through the blind indexes (app.crypto)
+    email = Column(EncryptedString)
+    phone = Column(EncryptedString)
+    address = Column(EncryptedString)
+    emailIndex = Column(String(32))
+    phoneIndex = Column(String(32))
+    # Optimistic concurrency token, incremented by every UPDATE
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    syncVersion = Column(BigInteger, nullable=False, default=0, server_default="0")
     createdAt = Column(DateTime(timezone=True), server_default=func.now())
     updatedAt = Column(DateTime(timezone=True), onupdate=func.now())
     
     user = relationship("User", back_populates="clients")
     cases = relationship("Case", back_populates="client")
 
+class ClientNameKey(Base):
+    """Blocking keys for conflict checks, see app.parties"""
+    __tablename__ = "ClientNameKey"
+    __table_args__ = (Index("ix_ClientNameKey_userId_key", "userId", "key"),)
+    
+    id = Column(Integer, primary_key=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False)
+    clientId = Column(Integer, ForeignKey("Client.id", ondelete="CASCADE"), nullable=False, index=True)
+    key = Column(String, nullable=False)
+
 class Case(Base):
     __tablename__ = "Case"
+    __table_args__ = (
+        Index("ix_Case_userId_syncVersion", "userId", "syncVersion"),
+        # Duplicate checks on import (app.importer)
+        Index("ix_Case_userId_caseNumber", "userId", "caseNumber"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     userId = Column(Integer, ForeignKey("User.id"))
@@ -44,6 +74,8 @@ class Case(Base):
     status = Column(String, default="active")
     startDate = Column(DateTime)
     endDate = Column(DateTime)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    syncVersion = Column(BigInteger, nullable=False, default=0, server_default="0")
     createdAt = Column(DateTime(timezone=True), server_default=func.now())
     updatedAt = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -51,16 +83,366 @@ class Case(Base):
     client = relationship("Client", back_populates="cases")
     events = relationship("Event", back_populates="case")
 
+# Length of an event without an end. It is part of the overlap index
+# expression, so changing it needs a revision that rebuilds ix_Event_period
+DEFAULT_EVENT_MINUTES = 60
+EVENT_PERIOD = f"tsrange(\"eventDate\", COALESCE(\"endDate\", \"eventDate\" + interval '{DEFAULT_EVENT_MINUTES} minutes'))"
+
 class Event(Base):
     __tablename__ = "Event"
+    __table_args__ = (
+        # Overlap searches for conflict detection (app.scheduling)
+        Index(
+            "ix_Event_period",
+            text(EVENT_PERIOD),
+            postgresql_using="gist",
+        ).ddl_if(dialect="postgresql"),
+        # Monthly partitions on Postgres (app.archive keeps them created)
+        {"postgresql_partition_by": 'RANGE ("eventDate")'},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     caseId = Column(Integer, ForeignKey("Case.id"))
     title = Column(String, nullable=False)
     description = Column(Text)
     eventDate = Column(DateTime)
+    endDate = Column(DateTime)
     eventType = Column(String)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    syncVersion = Column(BigInteger, nullable=False, default=0, server_default="0", index=True)
     createdAt = Column(DateTime(timezone=True), server_default=func.now())
     updatedAt = Column(DateTime(timezone=True), onupdate=func.now())
     
     case = relationship("Case", back_populates="events")
+
+class CaseArchive(Base):
+    """Closed cases moved out of Case by app.archive, ids unchanged"""
+    __tablename__ = "CaseArchive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    userId = Column(Integer, ForeignKey("User.id"), index=True)
+    clientId = Column(Integer, ForeignKey("Client.id"), index=True)
+    caseNumber = Column(String)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    status = Column(String)
+    startDate = Column(DateTime)
+    endDate = Column(DateTime)
+    version = Column(Integer, nullable=False)
+    syncVersion = Column(BigInteger, nullable=False)
+    createdAt = Column(DateTime(timezone=True))
+    updatedAt = Column(DateTime(timezone=True))
+    archivedAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class EventArchive(Base):
+    """Events of archived cases"""
+    __tablename__ = "EventArchive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    caseId = Column(Integer, nullable=False, index=True)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    eventDate = Column(DateTime)
+    endDate = Column(DateTime)
+    eventType = Column(String)
+    version = Column(Integer, nullable=False)
+    syncVersion = Column(BigInteger, nullable=False)
+    createdAt = Column(DateTime(timezone=True))
+    updatedAt = Column(DateTime(timezone=True))
+
+class Tombstone(Base):
+    __tablename__ = "Tombstone"
+    __table_args__ = (Index("ix_Tombstone_userId_syncVersion", "userId", "syncVersion"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False)
+    entityType = Column(String, nullable=False)
+    entityId = Column(Integer, nullable=False)
+    syncVersion = Column(BigInteger, nullable=False)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class RevokedToken(Base):
+    __tablename__ = "RevokedToken"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, unique=True, nullable=False)
+    expiresAt = Column(DateTime, nullable=False, index=True)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class UserSession(Base):
+    __tablename__ = "Session"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False, index=True)
+    # Refresh tokens are stored as SHA-256 hex digests, never in plaintext
+    tokenHash = Column(String(64), unique=True, nullable=False)
+    # Every rotation of one login shares a family; reuse of a rotated token revokes it
+    familyId = Column(String(32), nullable=False, index=True)
+    expiresAt = Column(DateTime, nullable=False)
+    revokedAt = Column(DateTime)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+    
+    user = relationship("User", back_populates="sessions")
+
+class Holiday(Base):
+    """Public holidays on top of the built-in ones in app.business_days"""
+    __tablename__ = "Holiday"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class Deadline(Base):
+    __tablename__ = "Deadline"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False, index=True)
+    caseId = Column(Integer, ForeignKey("Case.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Milestone the period runs from (e.g. the notification), if it was an event
+    sourceEventId = Column(Integer, ForeignKey("Event.id", ondelete="SET NULL"))
+    # Calendar entry created for the due date
+    eventId = Column(Integer, ForeignKey("Event.id", ondelete="SET NULL"))
+    title = Column(String, nullable=False)
+    baseDate = Column(Date, nullable=False)
+    amount = Column(Integer, nullable=False)
+    unit = Column(String, nullable=False)
+    judicialRecess = Column(Boolean, nullable=False, default=False)
+    dueDate = Column(Date, nullable=False)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+    updatedAt = Column(DateTime(timezone=True), onupdate=func.now())
+
+class TimeEntry(Base):
+    __tablename__ = "TimeEntry"
+    __table_args__ = (Index("ix_TimeEntry_userId_workDate", "userId", "workDate"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False)
+    caseId = Column(Integer, ForeignKey("Case.id"), nullable=False, index=True)
+    # Set once billed; billed entries can no longer change
+    invoiceId = Column(Integer, ForeignKey("Invoice.id"), index=True)
+    description = Column(Text)
+    workDate = Column(Date, nullable=False)
+    minutes = Column(Integer, nullable=False)
+    hourlyRate = Column(Numeric(12, 2), nullable=False, default=0)
+    amount = Column(Numeric(12, 2), nullable=False, default=0)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+    updatedAt = Column(DateTime(timezone=True), onupdate=func.now())
+
+class Invoice(Base):
+    __tablename__ = "Invoice"
+    __table_args__ = (Index("ix_Invoice_userId_number", "userId", "number", unique=True),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False)
+    clientId = Column(Integer, ForeignKey("Client.id"), nullable=False, index=True)
+    number = Column(String, nullable=False)
+    periodStart = Column(Date, nullable=False)
+    periodEnd = Column(Date, nullable=False)
+    minutes = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(12, 2), nullable=False, default=0)
+    taxRate = Column(Numeric(5, 2), nullable=False, default=20)
+    tax = Column(Numeric(12, 2), nullable=False, default=0)
+    total = Column(Numeric(12, 2), nullable=False, default=0)
+    status = Column(String, nullable=False, default="draft")
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class InvoiceCounter(Base):
+    """The last invoice number a user issued in a year, see app.billing"""
+    __tablename__ = "InvoiceCounter"
+    __table_args__ = (Index("ix_InvoiceCounter_userId_year", "userId", "year", unique=True),)
+    
+    id = Column(Integer, primary_key=True)
+    userId = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
+    year = Column(Integer, nullable=False)
+    lastNumber = Column(Integer, nullable=False)
+
+class BillingRollup(Base):
+    """Running time and amount totals per case, maintained by app.billing"""
+    __tablename__ = "BillingRollup"
+    __table_args__ = (Index("ix_BillingRollup_userId_caseId", "userId", "caseId", unique=True),)
+    
+    id = Column(Integer, primary_key=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False)
+    caseId = Column(Integer, ForeignKey("Case.id", ondelete="CASCADE"), nullable=False)
+    unbilledMinutes = Column(Integer, nullable=False, default=0, server_default="0")
+    unbilledAmount = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+    billedMinutes = Column(Integer, nullable=False, default=0, server_default="0")
+    billedAmount = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+
+class Blob(Base):
+    """One stored file content, shared by every Document with the same hash"""
+    __tablename__ = "Blob"
+    
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class Document(Base):
+    __tablename__ = "Document"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False, index=True)
+    caseId = Column(Integer, ForeignKey("Case.id"), index=True)
+    eventId = Column(Integer, ForeignKey("Event.id"), index=True)
+    sha256 = Column(String(64), ForeignKey("Blob.sha256"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    contentType = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class AuditLog(Base):
+    """
+    Who read or changed what, written in batches by app.audit. On Postgres
+    the table is partitioned by month (app.partitioning), so the partition
+    key is part of the primary key and ids are generated by the writer.
+    """
+    __tablename__ = "AuditLog"
+    __table_args__ = (
+        Index("ix_AuditLog_userId_occurredAt", "userId", "occurredAt"),
+        Index("ix_AuditLog_entity", "entityType", "entityId"),
+        {"postgresql_partition_by": 'RANGE ("occurredAt")'},
+    )
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    occurredAt = Column(DateTime(timezone=True), primary_key=True)
+    userId = Column(Integer)
+    action = Column(String(16), nullable=False)
+    method = Column(String(8), nullable=False)
+    route = Column(String, nullable=False)
+    entityType = Column(String(32))
+    entityId = Column(String(64))
+    status = Column(Integer, nullable=False)
+    ip = Column(String(45))
+
+class RetentionJob(Base):
+    """Progress of a client erasure run by app.retention, so it can resume"""
+    __tablename__ = "RetentionJob"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False, index=True)
+    clientId = Column(Integer, nullable=False)
+    status = Column(String(16), nullable=False, default="pending", index=True)
+    # Current step and the last id it finished; batches resume after it
+    step = Column(String(32))
+    lastId = Column(Integer, nullable=False, default=0)
+    rowsDeleted = Column(Integer, nullable=False, default=0)
+    rowsPseudonymized = Column(Integer, nullable=False, default=0)
+    elapsedSeconds = Column(Float, nullable=False, default=0)
+    error = Column(Text)
+    heartbeatAt = Column(DateTime)
+    finishedAt = Column(DateTime)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class ImportFile(Base):
+    """
+    An uploaded case list waiting for its import job, see app.importer.
+    Kept in the database since the worker may run on another machine; the
+    content is in ImportFilePart.
+    """
+    __tablename__ = "ImportFile"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    # csv or xlsx
+    format = Column(String(8), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    # Spreadsheet row number of the last committed chunk, and the counts so far
+    rowsDone = Column(Integer, nullable=False, default=0)
+    state = Column(JSON)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class ImportFilePart(Base):
+    """A piece of an ImportFile's content, so neither side holds the whole file"""
+    __tablename__ = "ImportFilePart"
+    __table_args__ = (Index("ix_ImportFilePart_importId_start", "importId", "start", unique=True),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    importId = Column(Integer, ForeignKey("ImportFile.id", ondelete="CASCADE"), nullable=False)
+    # Position of the part's first byte in the file
+    start = Column(BigInteger, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+
+class Job(Base):
+    """Background work run by run_worker.py, see app.jobs"""
+    __tablename__ = "Job"
+    __table_args__ = (Index("ix_Job_status_runAt", "status", "runAt"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), index=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False)
+    # queued, running, done or failed
+    status = Column(String(16), nullable=False, default="queued")
+    progress = Column(Float, nullable=False, default=0)
+    message = Column(String)
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    maxAttempts = Column(Integer, nullable=False, default=3)
+    # Not claimed before this time; pushed back by retries
+    runAt = Column(DateTime, nullable=False)
+    workerId = Column(String(128))
+    heartbeatAt = Column(DateTime)
+    startedAt = Column(DateTime)
+    finishedAt = Column(DateTime)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class CaseReport(Base):
+    """The latest rendered case summary PDF, see app.reports"""
+    __tablename__ = "CaseReport"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id"), nullable=False, index=True)
+    caseId = Column(Integer, ForeignKey("Case.id", ondelete="CASCADE"), nullable=False, unique=True)
+    # Of the case, its client and events when rendered (app.reports.report_versions)
+    version = Column(String(64), nullable=False)
+    # Shows the client's contact details, so encrypted like them (app.crypto)
+    content = deferred(Column(EncryptedBytes, nullable=False))
+    size = Column(Integer, nullable=False)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+
+class Agenda(Base):
+    """A user's precomputed agenda for a day, see app.agenda"""
+    __tablename__ = "Agenda"
+    __table_args__ = (Index("ix_Agenda_userId_day", "userId", "day", unique=True),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    # The user's sync version the events are current as of
+    syncVersion = Column(BigInteger, nullable=False)
+    events = Column(JSON, nullable=False)
+    computedAt = Column(DateTime, nullable=False)
+
+class IdempotencyKey(Base):
+    """The response to a POST sent with an Idempotency-Key, see app.idempotency"""
+    __tablename__ = "IdempotencyKey"
+    __table_args__ = (Index("ix_IdempotencyKey_userId_key", "userId", "key", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    userId = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # SHA-256 of the method, path, query and body the key was first used with
+    fingerprint = Column(String(64), nullable=False)
+    # NULL while the first request is still running
+    status = Column(Integer)
+    contentType = Column(String(100))
+    # Create responses carry client personal data
+    body = Column(EncryptedString)
+    createdAt = Column(DateTime, nullable=False)
+    expiresAt = Column(DateTime, nullable=False, index=True)
+
+def unpartitioned(ddl, target, bind, dialect=None, **kw):
+    return dialect.name != "postgresql"
+
+# A partitioned table can only have unique constraints that include the
+# partition key, so on Postgres Event.id has a plain index (ids still come
+# from one sequence) and the references to it are kept by the application
+Event.__table__.primary_key.ddl_if(callable_=unpartitioned)
+for _table in (Deadline.__table__, Document.__table__):
+    for _constraint in _table.foreign_key_constraints:
+        if _constraint.referred_table is Event.__table__:
+            _constraint.ddl_if(callable_=unpartitioned)
@@ -0,0 +1,176 @@
+"""
+Conflict-of-interest and duplicate-client matching
+
+Names are normalized with Turkish case folding (I/ı, İ/i) and stripped of
+diacritics, then expanded into blocking keys stored in ClientNameKey:
+
+- ``n:`` the sorted normalized tokens (exact duplicates)
+- ``s:`` the sorted phonetic codes (spelling variants)
+- ``p:`` one phonetic code per token
+- ``t:`` trigrams of each token
+
+A check looks up the ``p:``/``t:`` keys of the queried name through the
+``(userId, key)`` index, keeps the clients sharing the most keys and only
+scores those, so the cost depends on the number of near matches rather
+than the size of the client list.
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import Client, ClientNameKey
+
+CANDIDATE_LIMIT = 50
+MIN_SCORE = 0.6
+
+TURKISH_FOLD = str.maketrans({"I": "ı", "İ": "i"})
+ASCII_FOLD = str.maketrans({"ı": "i", "ğ": "g", "ş": "s", "ç": "c", "ö": "o", "ü": "u"})
+# Company forms and titles that say nothing about who the party is
+IGNORED_TOKENS = {"av", "dr", "ltd", "sti", "as", "anonim", "limited", "sirketi", "ve", "tic", "san"}
+
+PHONETIC_GROUPS = {
+    "b": "b", "p": "b",
+    "c": "c", "j": "c",
+    "d": "d", "t": "d",
+    "g": "k", "k": "k", "q": "k",
+    "f": "f", "v": "f", "w": "f",
+    "s": "s", "z": "s", "x": "s",
+    "m": "m", "n": "m",
+    "l": "l", "r": "r",
+}
+
+
+def normalize(name: str) -> str:
+    folded = name.translate(TURKISH_FOLD).lower().translate(ASCII_FOLD)
+    stripped = "".join(c for c in unicodedata.normalize("NFKD", folded) if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[a-z0-9]+", stripped))
+
+
+def tokens(name: str) -> List[str]:
+    words = normalize(name).split()
+    return [w for w in words if w not in IGNORED_TOKENS] or words
+
+
+def phonetic(token: str) -> str:
+    """Soundex-like code tuned for Turkish spellings (Yılmaz/Yilmas -> ylms)"""
+    code = token[0]
+    last = PHONETIC_GROUPS.get(token[0], "")
+    for char in token[1:]:
+        group = PHONETIC_GROUPS.get(char, "")
+        if group and group != last:
+            code += group
+        last = group
+    return code[:6]
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def blocking_keys(name: str) -> Set[str]:
+    words = tokens(name)
+    if not words:
+        return set()
+    codes = [phonetic(w) for w in words]
+    keys = {"n:" + " ".join(sorted(words)), "s:" + " ".join(sorted(codes))}
+    keys.update("p:" + code for code in codes)
+    for word in words:
+        keys.update("t:" + gram for gram in trigrams(word))
+    return keys
+
+
+def search_keys(name: str) -> List[str]:
+    return sorted(k for k in blocking_keys(name) if k[0] in "pt")
+
+
+def score(query: str, candidate: str) -> float:
+    query_words, candidate_words = tokens(query), tokens(candidate)
+    if sorted(query_words) == sorted(candidate_words):
+        return 1.0
+    query_grams = set().union(*(trigrams(w) for w in query_words)) if query_words else set()
+    candidate_grams = set().union(*(trigrams(w) for w in candidate_words)) if candidate_words else set()
+    if not query_grams or not candidate_grams:
+        return 0.0
+    dice = 2 * len(query_grams & candidate_grams) / (len(query_grams) + len(candidate_grams))
+    if sorted(map(phonetic, query_words)) == sorted(map(phonetic, candidate_words)):
+        dice = max(dice, 0.9)
+    return round(dice, 3)
+
+
+def index_client(db: Session, user_id: int, client_id: int, name: str):
+    """Replace a client's blocking keys; runs in the caller's transaction"""
+    db.execute(delete(ClientNameKey).where(ClientNameKey.clientId == client_id, ClientNameKey.userId == user_id))
+    keys = blocking_keys(name)
+    if keys:
+        db.execute(insert(ClientNameKey), [{"userId": user_id, "clientId": client_id, "key": k} for k in keys])
+
+
+def find_matches(db: Session, user_id: int, name: str, min_score: float = MIN_SCORE) -> List[dict]:
+    keys = search_keys(name)
+    if not keys:
+        return []
+    shared = func.count().label("shared")
+    candidates = (
+        select(ClientNameKey.clientId, shared)
+        .where(ClientNameKey.userId == user_id, ClientNameKey.key.in_(keys))
+        .group_by(ClientNameKey.clientId)
+        .order_by(shared.desc())
+        .limit(CANDIDATE_LIMIT)
+        .subquery()
+    )
+    clients = db.query(Client).join(candidates, Client.id == candidates.c.clientId).filter(
+        Client.userId == user_id
+    ).all()
+    matches = [{"client": c, "score": score(name, c.name)} for c in clients]
+    return sorted((m for m in matches if m["score"] >= min_score), key=lambda m: -m["score"])
+
+
+def find_duplicates(db: Session, user_id: int) -> List[List[Client]]:
+    """Groups of the user's clients sharing a normalized or phonetic name"""
+    groups = (
+        select(ClientNameKey.key)
+        .where(ClientNameKey.userId == user_id, ClientNameKey.key.like("n:%") | ClientNameKey.key.like("s:%"))
+        .group_by(ClientNameKey.key)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    rows = db.execute(
+        select(ClientNameKey.key, ClientNameKey.clientId)
+        .where(ClientNameKey.userId == user_id, ClientNameKey.key.in_(select(groups.c.key)))
+    ).all()
+    by_key: Dict[str, Set[int]] = {}
+    for key, client_id in rows:
+        by_key.setdefault(key, set()).add(client_id)
+
+    # An exact duplicate also shares its phonetic key; report each group once
+    unique = {frozenset(ids) for ids in by_key.values()}
+    unique = [ids for ids in unique if not any(ids < other for other in unique)]
+    clients = {c.id: c for c in db.query(Client).filter(
+        Client.userId == user_id, Client.id.in_(set().union(*unique) if unique else set())
+    )}
+    groups = ([clients[i] for i in sorted(ids) if i in clients] for ids in unique)
+    return sorted((group for group in groups if len(group) > 1), key=lambda group: group[0].id)
+
+
+def reindex(db: Session, client_ids: Optional[Iterable[int]] = None):
+    """Rebuild blocking keys, e.g. for clients created before they existed"""
+    query = db.query(Client.id, Client.userId, Client.name)
+    if client_ids is not None:
+        query = query.filter(Client.id.in_(list(client_ids)))
+    for client_id, user_id, name in query.all():
+        index_client(db, user_id, client_id, name)
+    db.commit()
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        reindex(session)
+    finally:
+        session.close()
@@ -0,0 +1,89 @@
+"""
+Monthly range partitions on Postgres
+
+Tables declared with ``postgresql_partition_by='RANGE ("<column>")'`` get
+one partition per calendar month, named ``<table>_YYYY_MM``, plus a
+``<table>_default`` partition so inserts never fail when maintenance
+falls behind. Rows that landed in the default partition are moved into a
+month's partition when it is created. Retention is a metadata-only DETACH
+and DROP of whole months instead of a large DELETE.
+"""
+import logging
+import re
+from datetime import date
+from typing import List
+
+from sqlalchemy import text
+
+from app.business_days import add_months
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"_(\d{4})_(\d{2})$")
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def ensure_partitions(conn, table: str, column: str, start: date, months: int):
+    """Create the monthly partitions from ``start``'s month on, and the default one"""
+    # Every worker runs maintenance; one at a time per table, until commit
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:table))"), {"table": table})
+    existing = set(list_partitions(conn, table))
+    default = f"{table}_default"
+    if default not in existing:
+        conn.execute(text(f'CREATE TABLE "{default}" PARTITION OF "{table}" DEFAULT'))
+    month = month_start(start)
+    for _ in range(months):
+        following = add_months(month, 1)
+        name = partition_name(table, month)
+        if name not in existing:
+            # Postgres refuses a new partition while the default one holds
+            # rows in its range, so build it beside the table and attach it
+            conn.execute(text(
+                f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+            ))
+            conn.execute(text(
+                f'WITH moved AS (DELETE FROM "{default}" WHERE "{column}" >= :start AND "{column}" < :end '
+                f'RETURNING *) INSERT INTO "{name}" SELECT * FROM moved'
+            ), {"start": month, "end": following})
+            conn.execute(text(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            ))
+        month = following
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = partrelid WHERE relname = :table"
+    ), {"table": table}).scalar())
+
+
+def list_partitions(conn, table: str) -> List[str]:
+    return list(conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :table ORDER BY child.relname"
+    ), {"table": table}).scalars())
+
+
+def drop_partitions_before(conn, table: str, cutoff: date) -> List[str]:
+    """Drop the monthly partitions that end on or before ``cutoff``'s month"""
+    dropped = []
+    cutoff = month_start(cutoff)
+    for name in list_partitions(conn, table):
+        match = PARTITION_NAME.search(name)
+        if match and date(int(match[1]), int(match[2]), 1) < cutoff:
+            conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            conn.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    if dropped:
+        logger.info("Dropped partitions %s", ", ".join(dropped))
+    return dropped
@@ -0,0 +1,155 @@
+"""
+Minimal PDF writer for printable reports
+
+Text is set in the standard Helvetica fonts, which every viewer has, so
+no font is embedded. Strings are encoded in Windows-1254, and the fonts
+use WinAnsiEncoding with the six positions where Windows-1254 differs
+remapped to the Turkish glyphs (Ğ, İ, Ş, ğ, ı, ş). Characters outside
+Windows-1254 print as "?". Page content streams are Flate-compressed.
+"""
+import unicodedata
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+A4 = (595.0, 842.0)
+
+ENCODING = "cp1254"
+# Windows-1254 positions whose WinAnsiEncoding glyphs aren't Turkish
+TURKISH_DIFFERENCES = "[208 /Gbreve 221 /Idotaccent 222 /Scedilla 240 /gbreve 253 /dotlessi 254 /scedilla]"
+
+FONTS = {"regular": "Helvetica", "bold": "Helvetica-Bold"}
+# Advance widths of printable ASCII (32-126) in 1/1000 em, from the AFM files
+WIDTHS = {
+    "regular": (
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+    ),
+    "bold": (
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+    ),
+}
+# Used for characters without an ASCII base letter
+DEFAULT_WIDTH = 556
+
+
+def char_width(char: str, font: str) -> int:
+    # Accented letters are as wide as their base letter (ş as s, İ as I)
+    base = "i" if char == "ı" else unicodedata.normalize("NFKD", char)[:1] or char
+    code = ord(base)
+    return WIDTHS[font][code - 32] if 32 <= code <= 126 else DEFAULT_WIDTH
+
+
+def text_width(text: str, font: str, size: float) -> float:
+    return sum(char_width(char, font) for char in text) * size / 1000
+
+
+def wrap(text: str, font: str, size: float, width: float) -> List[str]:
+    """Break ``text`` into lines no wider than ``width``, keeping its line breaks"""
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and text_width(candidate, font, size) > width:
+                lines.append(line)
+                candidate = word
+            # A word longer than the line is cut wherever it overflows
+            while text_width(candidate, font, size) > width and len(candidate) > 1:
+                cut = len(candidate) - 1
+                while cut > 1 and text_width(candidate[:cut], font, size) > width:
+                    cut -= 1
+                lines.append(candidate[:cut])
+                candidate = candidate[cut:]
+            line = candidate
+        lines.append(line)
+    return lines
+
+
+def literal(text: str) -> str:
+    """A PDF string literal of ``text`` in the fonts' encoding"""
+    encoded = text.encode(ENCODING, errors="replace")
+    escaped = "".join(
+        "\\" + chr(byte) if byte in b"()\\" else chr(byte) if 32 <= byte < 127 else f"\\{byte:03o}"
+        for byte in encoded
+    )
+    return f"({escaped})"
+
+
+def text_string(text: str) -> str:
+    """A PDF text string for the document information, in UTF-16"""
+    return "<FEFF" + text.encode("utf-16-be").hex().upper() + ">"
+
+
+class Page:
+    def __init__(self, size: Tuple[float, float] = A4):
+        self.size = size
+        self.operations: List[str] = []
+
+    def text(self, x: float, y: float, text: str, font: str = "regular", size: float = 10):
+        self.operations.append(f"BT /{font} {size:g} Tf {x:.2f} {y:.2f} Td {literal(text)} Tj ET")
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.5, gray: float = 0.6):
+        self.operations.append(f"{gray:g} G {width:g} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    def content(self) -> bytes:
+        return "\n".join(self.operations).encode("ascii")
+
+
+class Document:
+    """Pages drawn with ``Page`` and written out by ``render``"""
+
+    def __init__(self, title: str, size: Tuple[float, float] = A4):
+        self.title = title
+        self.size = size
+        self.pages: List[Page] = []
+
+    def add_page(self) -> Page:
+        page = Page(self.size)
+        self.pages.append(page)
+        return page
+
+    def render(self, created: Optional[datetime] = None) -> bytes:
+        created = created or datetime.utcnow()
+        # Objects 1-6: catalog, page tree, encoding, two fonts, info; then each page and its contents
+        kids = " ".join(f"{7 + 2 * i} 0 R" for i in range(len(self.pages)))
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode(),
+            f"<< /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences {TURKISH_DIFFERENCES} >>".encode(),
+            f"<< /Type /Font /Subtype /Type1 /BaseFont /{FONTS['regular']} /Encoding 3 0 R >>".encode(),
+            f"<< /Type /Font /Subtype /Type1 /BaseFont /{FONTS['bold']} /Encoding 3 0 R >>".encode(),
+            (
+                f"<< /Title {text_string(self.title)} /Producer (AvukatAjanda) "
+                f"/CreationDate (D:{created:%Y%m%d%H%M%S}Z) >>"
+            ).encode(),
+        ]
+        for i, page in enumerate(self.pages):
+            stream = zlib.compress(page.content())
+            objects.append((
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page.size[0]:g} {page.size[1]:g}] "
+                f"/Resources << /Font << /regular 4 0 R /bold 5 0 R >> >> /Contents {8 + 2 * i} 0 R >>"
+            ).encode())
+            objects.append(
+                f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode() + stream + b"\nendstream"
+            )
+
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        xref = len(output)
+        output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+        output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+        output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R /Info 6 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        return bytes(output)
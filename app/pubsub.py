@@ -0,0 +1,153 @@
+"""
+Per-user change notifications
+
+Write paths queue a small message on the SQLAlchemy session; it is fanned
+out to the user's open /api/stream connections only once the transaction
+commits. Fan-out across uvicorn workers goes through a backend:
+
+- ``local``: in-process only (single worker, tests)
+- ``postgres``: ``pg_notify`` inside the writing transaction (Postgres
+  delivers it on commit) and one LISTEN connection per worker
+
+Each connection has a bounded buffer. When a slow consumer fills it, the
+backlog is replaced by a single "resync" message (catch up via /api/sync)
+instead of growing memory.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "local")
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "100"))
+CHANNEL = "avukat_changes"
+
+PENDING_KEY = "pubsub_pending"
+
+
+class Subscription:
+    def __init__(self, user_id: int, maxsize: int = STREAM_BUFFER_SIZE):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, message: dict):
+        if self.queue.full():
+            # The client has fallen behind: replace the whole backlog with one
+            # instruction to catch up through /api/sync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            message = {"type": "resync", "dropped": self.dropped}
+        self.queue.put_nowait(message)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class LocalBackend:
+    def publish(self, db: Session, user_id: int, message: dict):
+        db.info.setdefault(PENDING_KEY, []).append((user_id, message))
+
+    def start(self, broker: "Broker"):
+        pass
+
+    def stop(self):
+        pass
+
+
+class PostgresBackend:
+    """NOTIFY from the writing transaction, LISTEN on a dedicated connection"""
+
+    def __init__(self, engine):
+        self.dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, db: Session, user_id: int, message: dict):
+        payload = json.dumps({"user_id": user_id, "message": message})
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+    def start(self, broker: "Broker"):
+        self._thread = threading.Thread(target=self._listen, args=(broker,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _listen(self, broker: "Broker"):
+        import psycopg
+
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=1.0):
+                            data = json.loads(notify.payload)
+                            broker.deliver_threadsafe(data["user_id"], data["message"])
+            except Exception:
+                logger.exception("LISTEN connection lost, reconnecting")
+                self._stop.wait(1.0)
+
+
+class Broker:
+    def __init__(self):
+        self.backend = LocalBackend()
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self, engine, backend: str = PUBSUB_BACKEND):
+        self._loop = asyncio.get_running_loop()
+        self.backend = PostgresBackend(engine) if backend == "postgres" else LocalBackend()
+        self.backend.start(self)
+
+    def stop(self):
+        self.backend.stop()
+        self._loop = None
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscriptions.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, db: Session, user_id: int, message: dict):
+        """Queue a notification that goes out only if ``db`` commits"""
+        self.backend.publish(db, user_id, message)
+
+    def deliver(self, user_id: int, message: dict):
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            subscription.offer(message)
+
+    def deliver_threadsafe(self, user_id: int, message: dict):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.deliver, user_id, message)
+
+
+broker = Broker()
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(session):
+    for user_id, message in session.info.pop(PENDING_KEY, ()):
+        broker.deliver_threadsafe(user_id, message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
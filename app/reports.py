@@ -0,0 +1,262 @@
+"""
+Case summary PDF reports
+
+A report shows a case, its client and the timeline of its events, for
+printing before a hearing. Reports are rendered by jobs (app.jobs) and
+the latest one per case is kept in CaseReport together with the version
+of the data it shows. ``report_versions`` computes that version for any
+number of cases in one grouped query, so a request for an unchanged case
+is answered from CaseReport without rendering anything.
+
+Rendering loads any number of cases with the same two queries: the cases
+joined with their clients, then all of their events. The batch run for a
+day's hearings (``python -m app.reports hearings``, run nightly) renders
+the stale reports of every case with a hearing that day.
+"""
+import logging
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import pdf
+from app.importer import HEARING_TYPE
+from app.jobs import JobContext, PermanentJobError
+from app.models import Case, CaseReport, Client, Event
+
+logger = logging.getLogger(__name__)
+
+# Part of every report version, so a new layout re-renders cached reports
+REPORT_LAYOUT = 1
+REPORT_BATCH_SIZE = 50
+
+MARGIN = 50.0
+LEADING = 1.35
+STATUS_LABELS = {"active": "Devam ediyor", "closed": "Kapandı", "pending": "Beklemede"}
+
+
+class CaseData(NamedTuple):
+    case: Case
+    client: Optional[Client]
+    events: List[Event]
+
+    @property
+    def version(self) -> str:
+        return version_key(
+            self.case.syncVersion,
+            self.client.syncVersion if self.client else None,
+            len(self.events),
+            max((event.syncVersion for event in self.events), default=None),
+        )
+
+
+def version_key(case_version: int, client_version: Optional[int], events: int, event_version: Optional[int]) -> str:
+    # Edits raise a sync version and deletions lower the event count
+    return f"{REPORT_LAYOUT}.{case_version}.{client_version or 0}.{events}.{event_version or 0}"
+
+
+def report_versions(db: Session, case_ids: Iterable[int], user_id: Optional[int] = None) -> Dict[int, str]:
+    """The current report version of each existing case (owned by ``user_id``, if given)"""
+    query = (
+        select(Case.id, Case.syncVersion, Client.syncVersion, func.count(Event.id), func.max(Event.syncVersion))
+        .outerjoin(Client, Client.id == Case.clientId)
+        .outerjoin(Event, Event.caseId == Case.id)
+        .where(Case.id.in_(list(case_ids)))
+        .group_by(Case.id, Case.syncVersion, Client.syncVersion)
+    )
+    if user_id is not None:
+        query = query.where(Case.userId == user_id)
+    return {row[0]: version_key(*row[1:]) for row in db.execute(query)}
+
+
+def load_cases(db: Session, case_ids: List[int]) -> List[CaseData]:
+    cases = db.execute(
+        select(Case, Client).outerjoin(Client, Client.id == Case.clientId).where(Case.id.in_(case_ids)).order_by(Case.id)
+    ).all()
+    events = defaultdict(list)
+    for event in db.execute(
+        select(Event).where(Event.caseId.in_(case_ids)).order_by(Event.caseId, Event.eventDate, Event.id)
+    ).scalars():
+        events[event.caseId].append(event)
+    return [CaseData(case, client, events[case.id]) for case, client in cases]
+
+
+def format_date(value: Optional[datetime], with_time: bool = False) -> str:
+    if value is None:
+        return "-"
+    if with_time and (value.hour or value.minute):
+        return f"{value:%d.%m.%Y %H:%M}"
+    return f"{value:%d.%m.%Y}"
+
+
+class Layout:
+    """Flows text down A4 pages, starting a new page when one is full"""
+
+    def __init__(self, document: pdf.Document):
+        self.document = document
+        self.width = document.size[0] - 2 * MARGIN
+        self.new_page()
+
+    def new_page(self):
+        self.page = self.document.add_page()
+        self.y = self.document.size[1] - MARGIN
+
+    def space(self, height: float):
+        if self.y - height < MARGIN + 20:
+            self.new_page()
+        self.y -= height
+
+    def paragraph(self, text: str, x: float = MARGIN, width: Optional[float] = None,
+                  font: str = "regular", size: float = 10):
+        for line in pdf.wrap(text, font, size, width or self.width - (x - MARGIN)):
+            self.space(size * LEADING)
+            self.page.text(x, self.y, line, font, size)
+
+    def heading(self, text: str):
+        self.space(14)
+        self.paragraph(text, font="bold", size=12)
+        self.space(4)
+        self.page.line(MARGIN, self.y, MARGIN + self.width, self.y)
+        self.space(4)
+
+    def field(self, label: str, value: Optional[str]):
+        lines = pdf.wrap(value or "-", "regular", 10, self.width - 110)
+        for i, line in enumerate(lines):
+            self.space(10 * LEADING)
+            if i == 0:
+                self.page.text(MARGIN, self.y, label, "bold", 10)
+            self.page.text(MARGIN + 110, self.y, line, "regular", 10)
+
+
+def render_report(data: CaseData, generated: Optional[datetime] = None) -> bytes:
+    generated = generated or datetime.now()
+    case, client = data.case, data.client
+    document = pdf.Document(f"Dava özeti: {case.title}")
+    layout = Layout(document)
+
+    layout.paragraph("DAVA ÖZETİ", font="bold", size=9)
+    layout.paragraph(case.title, font="bold", size=16)
+    layout.space(6)
+    layout.field("Esas no", case.caseNumber)
+    layout.field("Durum", STATUS_LABELS.get(case.status, case.status))
+    layout.field("Başlangıç", format_date(case.startDate))
+    layout.field("Bitiş", format_date(case.endDate))
+
+    layout.heading("Müvekkil")
+    if client is None:
+        layout.paragraph("Müvekkil atanmamış")
+    else:
+        layout.field("Ad", client.name)
+        layout.field("E-posta", client.email)
+        layout.field("Telefon", client.phone)
+        layout.field("Adres", client.address)
+
+    if case.description:
+        layout.heading("Açıklama")
+        layout.paragraph(case.description)
+
+    layout.heading("Süreç")
+    if not data.events:
+        layout.paragraph("Kayıtlı etkinlik yok")
+    for event in data.events:
+        title = event.title if not event.eventType else f"{event.title} ({event.eventType})"
+        lines = [(line, "bold") for line in pdf.wrap(title, "bold", 10, layout.width - 110)]
+        if event.description:
+            lines += [(line, "regular") for line in pdf.wrap(event.description, "regular", 9, layout.width - 110)]
+        for i, (line, font) in enumerate(lines):
+            layout.space(10 * LEADING)
+            if i == 0:
+                layout.page.text(MARGIN, layout.y, format_date(event.eventDate, with_time=True), "regular", 10)
+            layout.page.text(MARGIN + 110, layout.y, line, font, 10 if font == "bold" else 9)
+        layout.space(4)
+
+    footer = f"{generated:%d.%m.%Y %H:%M} tarihinde oluşturuldu"
+    for number, page in enumerate(document.pages, start=1):
+        page.text(MARGIN, MARGIN - 10, footer, "regular", 8)
+        label = f"Sayfa {number} / {len(document.pages)}"
+        page.text(document.size[0] - MARGIN - pdf.text_width(label, "regular", 8), MARGIN - 10, label, "regular", 8)
+    return document.render()
+
+
+def store(db: Session, data: CaseData, content: bytes):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    values = {"version": data.version, "content": content, "size": len(content)}
+    upsert = dialect.insert(CaseReport).values(userId=data.case.userId, caseId=data.case.id, **values)
+    db.execute(upsert.on_conflict_do_update(index_elements=[CaseReport.caseId], set_=values))
+
+
+def render_cases(db: Session, case_ids: List[int], context: Optional[JobContext] = None) -> int:
+    """Render the reports of ``case_ids`` that are missing or out of date; returns how many"""
+    versions = report_versions(db, case_ids)
+    current = set(db.execute(
+        select(CaseReport.caseId, CaseReport.version).where(CaseReport.caseId.in_(list(versions)))
+    ).tuples())
+    stale = sorted(case_id for case_id, version in versions.items() if (case_id, version) not in current)
+    for start in range(0, len(stale), REPORT_BATCH_SIZE):
+        for data in load_cases(db, stale[start:start + REPORT_BATCH_SIZE]):
+            store(db, data, render_report(data))
+        db.commit()
+        if context is not None:
+            done = min(start + REPORT_BATCH_SIZE, len(stale))
+            context.progress(done / len(stale), f"{done} / {len(stale)} reports")
+    return len(stale)
+
+
+def hearing_cases(db: Session, day: date, user_id: Optional[int] = None) -> List[int]:
+    """Cases with a hearing on ``day``"""
+    start = datetime.combine(day, datetime.min.time())
+    query = (
+        select(Event.caseId).distinct()
+        .join(Case, Case.id == Event.caseId)
+        .where(Event.eventType == HEARING_TYPE, Event.eventDate >= start, Event.eventDate < start + timedelta(days=1))
+    )
+    if user_id is not None:
+        query = query.where(Case.userId == user_id)
+    return sorted(db.execute(query).scalars())
+
+
+def run_case_report(context: JobContext) -> dict:
+    """Job handler for ``case_report``"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        case_id = context.payload["caseId"]
+        if not report_versions(db, [case_id], context.user_id):
+            raise PermanentJobError("Case not found")
+        return {"caseId": case_id, "rendered": render_cases(db, [case_id], context)}
+    finally:
+        db.close()
+
+
+def run_hearing_reports(context: JobContext) -> dict:
+    """Job handler for ``hearing_reports``: the user's (or everyone's) hearings on a day"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        day = date.fromisoformat(context.payload["date"])
+        case_ids = hearing_cases(db, day, context.user_id)
+        return {"date": day.isoformat(), "caseIds": case_ids, "rendered": render_cases(db, case_ids, context)}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+    from app.jobs import enqueue
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) not in (2, 3) or sys.argv[1] != "hearings":
+        sys.exit("usage: python -m app.reports hearings [YYYY-MM-DD]")
+    day = date.fromisoformat(sys.argv[2]) if len(sys.argv) == 3 else date.today() + timedelta(days=1)
+    session = SessionLocal()
+    try:
+        job = enqueue(session, "hearing_reports", {"date": day.isoformat()})
+        print(f"Queued job {job.id} for hearings on {day}")
+    finally:
+        session.close()
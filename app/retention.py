@@ -0,0 +1,333 @@
+"""
+KVKK erasure of a former client's personal data
+
+A RetentionJob runs on the job queue (app.jobs). It first drops the user's
+pending import uploads, which could bring the client back, then walks the
+client's data leaf-first (rendered reports, documents, deadlines, events,
+time entries, cases, archived events and cases, then the client itself).
+Last come copies of client data kept elsewhere: the bodies of stored
+Idempotency-Key responses are cleared (the keys stay used, so a retry
+still doesn't create anything twice), and the user's stored agendas are
+dropped and recomputed on the next read. Each step pages through matching ids with keyset pagination
+(``id > :last ORDER BY id LIMIT :n``) and handles one page per short
+transaction. The same
+transaction records the step and last id on the job, so an interrupted
+run resumes at the next page without redoing or skipping rows.
+
+Rows that back issued invoices have to be kept for the statutory period
+for financial records. Those are pseudonymized: free text cleared, names
+replaced. Everything else is deleted. Deletions of synced entities leave
+tombstones so devices drop them on their next /api/sync.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import String, cast, delete, exists, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Agenda, BillingRollup, Blob, Case, CaseArchive, CaseReport, Client, ClientNameKey, Deadline, Document, Event,
+    EventArchive, IdempotencyKey, ImportFile, ImportFilePart, Invoice, RetentionJob, TimeEntry
+)
+from app.jobs import JobContext
+from app.storage import get_storage
+from app.sync import next_version, record_deletion
+
+logger = logging.getLogger(__name__)
+
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+# A running job without a heartbeat for this long is considered abandoned
+STALE_AFTER = timedelta(minutes=5)
+
+PSEUDONYM = "Anonimleştirilmiş"
+
+
+class Outcome(NamedTuple):
+    deleted: int = 0
+    pseudonymized: int = 0
+
+
+class Step(NamedTuple):
+    name: str
+    model: type
+    scope: Callable[[RetentionJob], object]
+    apply: Callable[[Session, RetentionJob, List[int]], Outcome]
+
+
+def client_cases(job: RetentionJob):
+    return select(Case.id).where(Case.clientId == job.clientId, Case.userId == job.userId)
+
+
+def erase_imports(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    # Their import jobs fail with "Import file is gone"
+    db.execute(delete(ImportFilePart).where(ImportFilePart.importId.in_(ids)).execution_options(synchronize_session=False))
+    db.execute(delete(ImportFile).where(ImportFile.id.in_(ids)).execution_options(synchronize_session=False))
+    return Outcome(deleted=len(ids))
+
+
+def erase_reports(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    db.execute(delete(CaseReport).where(CaseReport.id.in_(ids)).execution_options(synchronize_session=False))
+    return Outcome(deleted=len(ids))
+
+
+def erase_documents(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    digests = db.execute(
+        delete(Document).where(Document.id.in_(ids)).returning(Document.sha256)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    orphaned = db.execute(
+        delete(Blob).where(Blob.sha256.in_(set(digests)), ~exists().where(Document.sha256 == Blob.sha256))
+        .returning(Blob.sha256)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    storage = get_storage()
+    for digest in orphaned:
+        storage.delete(digest)
+    return Outcome(deleted=len(ids))
+
+
+def erase_deadlines(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    db.execute(delete(Deadline).where(Deadline.id.in_(ids)).execution_options(synchronize_session=False))
+    return Outcome(deleted=len(ids))
+
+
+def erase_events(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    version = next_version(db, job.userId)
+    db.execute(delete(Event).where(Event.id.in_(ids)).execution_options(synchronize_session=False))
+    for event_id in ids:
+        record_deletion(db, job.userId, "event", event_id, version)
+    return Outcome(deleted=len(ids))
+
+
+def erase_time_entries(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    pseudonymized = db.execute(
+        update(TimeEntry).where(TimeEntry.id.in_(ids), TimeEntry.invoiceId.isnot(None))
+        .values(description=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    deleted = db.execute(
+        delete(TimeEntry).where(TimeEntry.id.in_(ids), TimeEntry.invoiceId.is_(None))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return Outcome(deleted=deleted, pseudonymized=pseudonymized)
+
+
+def erase_cases(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    version = next_version(db, job.userId)
+    billed = exists().where(TimeEntry.caseId == Case.id)
+    kept = db.execute(
+        update(Case).where(Case.id.in_(ids), billed)
+        .values(
+            title=literal(f"{PSEUDONYM} dava #") + cast(Case.id, String),
+            description=None,
+            version=Case.version + 1,
+            syncVersion=version,
+        )
+        .returning(Case.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    # Unbilled time is gone with the entries deleted in the previous step
+    db.execute(
+        update(BillingRollup).where(BillingRollup.caseId.in_(kept))
+        .values(unbilledMinutes=0, unbilledAmount=0)
+        .execution_options(synchronize_session=False)
+    )
+
+    removed = [case_id for case_id in ids if case_id not in set(kept)]
+    db.execute(delete(BillingRollup).where(BillingRollup.caseId.in_(removed)).execution_options(synchronize_session=False))
+    db.execute(delete(Case).where(Case.id.in_(removed)).execution_options(synchronize_session=False))
+    for case_id in removed:
+        record_deletion(db, job.userId, "case", case_id, version)
+    return Outcome(deleted=len(removed), pseudonymized=len(kept))
+
+
+# Archived cases have no time entries and left their tombstones when archived
+def erase_archived_events(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    db.execute(delete(EventArchive).where(EventArchive.id.in_(ids)).execution_options(synchronize_session=False))
+    return Outcome(deleted=len(ids))
+
+
+def erase_archived_cases(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    db.execute(delete(CaseArchive).where(CaseArchive.id.in_(ids)).execution_options(synchronize_session=False))
+    return Outcome(deleted=len(ids))
+
+
+def erase_client(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    version = next_version(db, job.userId)
+    db.execute(delete(ClientNameKey).where(ClientNameKey.clientId.in_(ids)).execution_options(synchronize_session=False))
+    retained = or_(exists().where(Invoice.clientId == Client.id), exists().where(Case.clientId == Client.id))
+    kept = db.execute(
+        update(Client).where(Client.id.in_(ids), retained)
+        .values(
+            name=literal(f"{PSEUDONYM} müvekkil #") + cast(Client.id, String),
+            email=None,
+            phone=None,
+            address=None,
+            emailIndex=None,
+            phoneIndex=None,
+            version=Client.version + 1,
+            syncVersion=version,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    deleted = db.execute(
+        delete(Client).where(Client.id.in_(ids), ~retained).execution_options(synchronize_session=False)
+    ).rowcount
+    if deleted:
+        record_deletion(db, job.userId, "client", job.clientId, version)
+    return Outcome(deleted=deleted, pseudonymized=kept)
+
+
+def erase_idempotent_responses(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    from app.idempotency import idempotency_cache
+
+    idempotency_cache.forget_user(job.userId)
+    db.execute(
+        update(IdempotencyKey).where(IdempotencyKey.id.in_(ids)).values(body=None, contentType=None)
+        .execution_options(synchronize_session=False)
+    )
+    return Outcome(pseudonymized=len(ids))
+
+
+def erase_agendas(db: Session, job: RetentionJob, ids: List[int]) -> Outcome:
+    db.execute(delete(Agenda).where(Agenda.id.in_(ids)).execution_options(synchronize_session=False))
+    return Outcome(deleted=len(ids))
+
+
+STEPS = [
+    Step("imports", ImportFile, lambda job: ImportFile.userId == job.userId, erase_imports),
+    Step("reports", CaseReport, lambda job: CaseReport.caseId.in_(client_cases(job)), erase_reports),
+    Step("documents", Document, lambda job: Document.caseId.in_(client_cases(job)), erase_documents),
+    Step("deadlines", Deadline, lambda job: Deadline.caseId.in_(client_cases(job)), erase_deadlines),
+    Step("events", Event, lambda job: Event.caseId.in_(client_cases(job)), erase_events),
+    Step("time_entries", TimeEntry, lambda job: TimeEntry.caseId.in_(client_cases(job)), erase_time_entries),
+    Step("cases", Case, lambda job: (Case.clientId == job.clientId) & (Case.userId == job.userId), erase_cases),
+    Step(
+        "archived_events", EventArchive,
+        lambda job: EventArchive.caseId.in_(
+            select(CaseArchive.id).where(CaseArchive.clientId == job.clientId, CaseArchive.userId == job.userId)
+        ),
+        erase_archived_events,
+    ),
+    Step(
+        "archived_cases", CaseArchive,
+        lambda job: (CaseArchive.clientId == job.clientId) & (CaseArchive.userId == job.userId),
+        erase_archived_cases,
+    ),
+    Step("client", Client, lambda job: (Client.id == job.clientId) & (Client.userId == job.userId), erase_client),
+    Step(
+        "idempotency_keys", IdempotencyKey,
+        lambda job: (IdempotencyKey.userId == job.userId) & IdempotencyKey.body.isnot(None),
+        erase_idempotent_responses,
+    ),
+    # After the client, so an agenda computed meanwhile can't bring the names back
+    Step("agendas", Agenda, lambda job: Agenda.userId == job.userId, erase_agendas),
+]
+STEP_NAMES = [step.name for step in STEPS]
+
+
+def claim(db: Session, job_id: int) -> bool:
+    """Mark a pending or abandoned job as ours; False if another worker runs it"""
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(RetentionJob)
+        .where(
+            RetentionJob.id == job_id,
+            or_(
+                RetentionJob.status.in_(("pending", "failed")),
+                (RetentionJob.status == "running") & (RetentionJob.heartbeatAt < now - STALE_AFTER),
+            ),
+        )
+        .values(status="running", heartbeatAt=now, error=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(claimed)
+
+
+def run_job(db: Session, job_id: int, batch_size: int = RETENTION_BATCH_SIZE) -> Optional[RetentionJob]:
+    """Run (or resume) an erasure job to completion; returns None if it's claimed elsewhere"""
+    if not claim(db, job_id):
+        return None
+    job = db.get(RetentionJob, job_id)
+    start = STEP_NAMES.index(job.step) if job.step in STEP_NAMES else 0
+    try:
+        for step in STEPS[start:]:
+            if job.step != step.name:
+                job.step, job.lastId = step.name, 0
+            while True:
+                started = time.perf_counter()
+                ids = db.execute(
+                    select(step.model.id)
+                    .where(step.scope(job), step.model.id > job.lastId)
+                    .order_by(step.model.id)
+                    .limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                outcome = step.apply(db, job, ids)
+                job.lastId = ids[-1]
+                job.rowsDeleted += outcome.deleted
+                job.rowsPseudonymized += outcome.pseudonymized
+                job.elapsedSeconds += time.perf_counter() - started
+                job.heartbeatAt = datetime.utcnow()
+                db.commit()
+                logger.info(
+                    "Retention job %s %s: %d rows up to id %s (%.0f rows/s overall)",
+                    job.id, step.name, len(ids), job.lastId, throughput(job),
+                )
+        job.status = "done"
+        job.finishedAt = datetime.utcnow()
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        job = db.get(RetentionJob, job_id)
+        job.status = "failed"
+        job.error = str(exc)
+        db.commit()
+        logger.exception("Retention job %s failed in step %s", job_id, job.step)
+    return job
+
+
+def throughput(job: RetentionJob) -> float:
+    rows = job.rowsDeleted + job.rowsPseudonymized
+    return rows / job.elapsedSeconds if job.elapsedSeconds else 0.0
+
+
+def run_erasure(context: JobContext) -> dict:
+    """Job handler for ``retention``; a failed run is retried by the queue and resumes"""
+    from app.database import SessionLocal
+
+    job_id = context.payload["retentionJobId"]
+    db = SessionLocal()
+    try:
+        job = run_job(db, job_id)
+        if job is None:
+            job = db.get(RetentionJob, job_id)
+            if job.status != "done":
+                raise RuntimeError(f"Retention job {job_id} is running elsewhere")
+        elif job.status == "failed":
+            raise RuntimeError(job.error)
+        return {"rowsDeleted": job.rowsDeleted, "rowsPseudonymized": job.rowsPseudonymized}
+    finally:
+        db.close()
+
+
+def resume_all(db: Session):
+    """Run every pending, failed or abandoned job, e.g. one whose queue job ran out of attempts"""
+    for (job_id,) in db.query(RetentionJob.id).filter(RetentionJob.status != "done").order_by(RetentionJob.id).all():
+        run_job(db, job_id)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        resume_all(session)
+    finally:
+        session.close()
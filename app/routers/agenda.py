@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.agenda import day_start, get_agenda, local_today
+from app.database import get_db
+from app.schemas import AgendaResponse
+from app.auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/today", response_model=AgendaResponse)
+async def get_today(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    """Today's events and the rest of the week's (Turkish days), with case and client names"""
+    today = local_today()
+    agenda = get_agenda(db, current_user.id, today)
+    tomorrow = day_start(today + timedelta(days=1)).isoformat()
+    return {
+        "date": today,
+        "today": [e for e in agenda["events"] if e["eventDate"] < tomorrow],
+        "week": [e for e in agenda["events"] if e["eventDate"] >= tomorrow],
+        "computedAt": agenda["computedAt"],
+    }
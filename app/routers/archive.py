@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.database import get_db
+from app.models import CaseArchive, EventArchive
+from app.schemas import ArchivedCaseResponse, ArchivedCaseDetail, CaseResponse, EventResponse
+from app.auth import get_current_user
+from app.archive import restore_case
+
+router = APIRouter()
+
+@router.get("/cases", response_model=List[ArchivedCaseResponse])
+async def get_archived_cases(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    return db.query(CaseArchive).filter(CaseArchive.userId == current_user.id).order_by(CaseArchive.id).all()
+
+@router.get("/cases/{case_id}", response_model=ArchivedCaseDetail)
+async def get_archived_case(
+    case_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """An archived case with its events"""
+    case = db.query(CaseArchive).filter(
+        CaseArchive.id == case_id,
+        CaseArchive.userId == current_user.id
+    ).first()
+    if not case:
+        raise HTTPException(status_code=404, detail="Archived case not found")
+    events = db.query(EventArchive).filter(EventArchive.caseId == case_id).order_by(EventArchive.eventDate).all()
+    return ArchivedCaseDetail.model_validate(case).model_copy(
+        update={"events": [EventResponse.model_validate(event) for event in events]}
+    )
+
+@router.post("/cases/{case_id}/restore", response_model=CaseResponse)
+async def restore_archived_case(
+    case_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Move an archived case and its events back to the live tables"""
+    return restore_case(db, current_user.id, case_id)
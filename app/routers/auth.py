@@ -4,34 +4,32 @@ from datetime import timedelta
 
 from app.database import get_db
 from app.models import User
-from app.schemas import UserLogin, UserRegister, Token
+from app.schemas import UserLogin, UserRegister, Token, RefreshRequest
 from app.auth import (
     verify_password,
     get_password_hash,
+    run_password_hash,
     create_access_token,
+    create_session,
+    rotate_session,
+    revoke_token,
+    get_current_user,
+    oauth2_scheme,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
 router = APIRouter()
 
-@router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_data.email).first()
-    
-    if not user or not verify_password(user_data.password, user.passwordHash):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials"
-        )
-    
+def token_response(user, session, refresh_token: str):
     access_token = create_access_token(
-        data={"sub": user.email},
+        data={"sub": user.email, "sid": session.id},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
+        "refresh_token": refresh_token,
         "user": {
             "id": user.id,
             "email": user.email,
@@ -40,6 +38,23 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         }
     }
 
+def issue_tokens(db: Session, user):
+    session, refresh_token = create_session(db, user.id)
+    db.commit()
+    return token_response(user, session, refresh_token)
+
+@router.post("/login", response_model=Token)
+async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.email == user_data.email).first()
+    
+    if not user or not await run_password_hash(verify_password, user_data.password, user.passwordHash):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials"
+        )
+    
+    return issue_tokens(db, user)
+
 @router.post("/register", response_model=Token)
 async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     # Check if user exists
@@ -51,7 +66,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         )
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await run_password_hash(get_password_hash, user_data.password)
     user = User(
         email=user_data.email,
         passwordHash=hashed_password,
@@ -63,18 +78,18 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     db.refresh(user)
     
     # Auto login
-    access_token = create_access_token(
-        data={"sub": user.email},
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {
-            "id": user.id,
-            "email": user.email,
-            "name": user.name,
-            "role": user.role
-        }
-    }
+    return issue_tokens(db, user)
+
+@router.post("/refresh", response_model=Token)
+async def refresh(data: RefreshRequest, db: Session = Depends(get_db)):
+    """Trade a refresh token for a new access/refresh pair without a password check"""
+    user, session, refresh_token = rotate_session(db, data.refresh_token)
+    return token_response(user, session, refresh_token)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    revoke_token(db, token)
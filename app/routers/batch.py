@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.orm import Session
+
+from app.batch import run_batch
+from app.database import get_db
+from app.schemas import BatchRequest, BatchResponse
+from app.auth import get_current_user
+
+router = APIRouter()
+
+@router.post("/", response_model=BatchResponse)
+async def batch(
+    body: BatchRequest,
+    request: Request,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Run up to 20 GET requests in one round-trip"""
+    outcomes = await run_batch(request, [item.path for item in body.requests], current_user, db, body.concurrent)
+    return {"responses": [
+        {"id": item.id, "status": status, "body": content}
+        for item, (status, content) in zip(body.requests, outcomes)
+    ]}
@@ -1,18 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import delete, exists, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
-from app.models import Case
-from app.schemas import CaseCreate, CaseResponse
+from app.models import Case, Client, Document, Event, TimeEntry
+from app.schemas import CaseCreate, CaseUpdate, CaseResponse
 from app.auth import get_current_user
+from app.sync import next_version, record_deletion
+from app.crud import update_owned, delete_owned
+from app.fields import FIELDS_DESCRIPTION, parse_fields, sparse_response
+from app.idempotency import IdempotentRoute
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
 
 @router.get("/", response_model=List[CaseResponse])
-async def get_cases(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
-    cases = db.query(Case).filter(Case.userId == current_user.id).all()
-    return cases
+async def get_cases(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    selected = parse_fields(fields, CaseResponse)
+    cases = select(Case).where(Case.userId == current_user.id)
+    if selected:
+        return sparse_response(db, CaseResponse, Case, selected, cases)
+    return db.execute(cases).scalars().all()
 
 @router.post("/", response_model=CaseResponse)
 async def create_case(
@@ -22,7 +34,8 @@ async def create_case(
 ):
     case = Case(
         **case_data.dict(),
-        userId=current_user.id
+        userId=current_user.id,
+        syncVersion=next_version(db, current_user.id)
     )
     db.add(case)
     db.commit()
@@ -44,3 +57,60 @@ async def get_case(
         raise HTTPException(status_code=404, detail="Case not found")
     
     return case
+
+@router.patch("/{case_id}", response_model=CaseResponse)
+async def update_case(
+    case_id: int,
+    case_data: CaseUpdate,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    values = case_data.dict(exclude_unset=True, exclude={"version"})
+    extra = ()
+    if "clientId" in values:
+        # Moving a case is only allowed onto one of the user's own clients
+        extra = (exists().where(Client.id == values["clientId"], Client.userId == current_user.id),)
+    return update_owned(
+        db, Case, case_id,
+        owned=Case.userId == current_user.id,
+        values=values,
+        user_id=current_user.id,
+        expected_version=case_data.version,
+        label="Case",
+        extra_conditions=extra
+    )
+
+@router.delete("/{case_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_case(
+    case_id: int,
+    version: Optional[int] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a case together with its events"""
+    owned_case = select(Case.id).where(Case.id == case_id, Case.userId == current_user.id)
+    if version is not None:
+        owned_case = owned_case.where(Case.version == version)
+
+    change_version = next_version(db, current_user.id)
+    event_ids = db.execute(
+        delete(Event).where(Event.caseId.in_(owned_case)).returning(Event.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for event_id in event_ids:
+        record_deletion(db, current_user.id, "event", event_id, change_version)
+
+    delete_owned(
+        db, Case, case_id,
+        owned=Case.userId == current_user.id,
+        user_id=current_user.id,
+        entity_type="case",
+        expected_version=version,
+        label="Case",
+        extra_conditions=(
+            ~exists().where(TimeEntry.caseId == Case.id),
+            ~exists().where(Document.caseId == Case.id),
+        ),
+        blocked_detail="Case has time entries or documents",
+        version=change_version
+    )
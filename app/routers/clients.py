@@ -1,18 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import delete, exists, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
-from app.models import Client
-from app.schemas import ClientCreate, ClientResponse
+from app.models import Client, Case, CaseArchive, ClientNameKey
+from app.schemas import (
+    ClientCreate, ClientUpdate, ClientResponse,
+    ConflictOfInterestCheck, PartyMatchResponse, DuplicateClientsResponse
+)
 from app.auth import get_current_user
+from app.sync import next_version
+from app.crud import update_owned, delete_owned
+from app.parties import index_client, find_matches, find_duplicates
+from app.crypto import BLIND_INDEXES, blind_index, with_blind_indexes
+from app.fields import FIELDS_DESCRIPTION, parse_fields, sparse_response
+from app.idempotency import IdempotentRoute
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
 
 @router.get("/", response_model=List[ClientResponse])
-async def get_clients(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
-    clients = db.query(Client).filter(Client.userId == current_user.id).all()
-    return clients
+async def get_clients(
+    email: Optional[str] = Query(None),
+    phone: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """The user's clients, optionally only those with the exact email or phone"""
+    selected = parse_fields(fields, ClientResponse)
+    clients = select(Client).where(Client.userId == current_user.id)
+    for field, value in (("email", email), ("phone", phone)):
+        if value is None:
+            continue
+        index = blind_index(field, value)
+        if index is None:
+            # Nothing left after normalizing, e.g. a phone without digits
+            return []
+        clients = clients.where(getattr(Client, BLIND_INDEXES[field][0]) == index)
+    if selected:
+        return sparse_response(db, ClientResponse, Client, selected, clients)
+    return db.execute(clients).scalars().all()
 
 @router.post("/", response_model=ClientResponse)
 async def create_client(
@@ -21,14 +49,31 @@ async def create_client(
     db: Session = Depends(get_db)
 ):
     client = Client(
-        **client_data.dict(),
-        userId=current_user.id
+        **with_blind_indexes(client_data.dict()),
+        userId=current_user.id,
+        syncVersion=next_version(db, current_user.id)
     )
     db.add(client)
+    db.flush()
+    index_client(db, current_user.id, client.id, client.name)
     db.commit()
     db.refresh(client)
     return client
 
+@router.post("/conflict-check", response_model=PartyMatchResponse)
+async def conflict_check(
+    check: ConflictOfInterestCheck,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """The user's clients whose name matches a party, best match first"""
+    return {"matches": find_matches(db, current_user.id, check.name, check.minScore)}
+
+@router.get("/duplicates", response_model=DuplicateClientsResponse)
+async def get_duplicates(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    """Groups of the user's clients that are probably the same person"""
+    return {"groups": find_duplicates(db, current_user.id)}
+
 @router.get("/{client_id}", response_model=ClientResponse)
 async def get_client(
     client_id: int,
@@ -44,3 +89,46 @@ async def get_client(
         raise HTTPException(status_code=404, detail="Client not found")
     
     return client
+
+@router.patch("/{client_id}", response_model=ClientResponse)
+async def update_client(
+    client_id: int,
+    client_data: ClientUpdate,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if client_data.name is not None:
+        # Same transaction as the update, so a miss rolls the keys back too
+        index_client(db, current_user.id, client_id, client_data.name)
+    return update_owned(
+        db, Client, client_id,
+        owned=Client.userId == current_user.id,
+        values=with_blind_indexes(client_data.dict(exclude_unset=True, exclude={"version"})),
+        user_id=current_user.id,
+        expected_version=client_data.version,
+        label="Client"
+    )
+
+@router.delete("/{client_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_client(
+    client_id: int,
+    version: Optional[int] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    db.execute(delete(ClientNameKey).where(
+        ClientNameKey.clientId == client_id, ClientNameKey.userId == current_user.id
+    ))
+    delete_owned(
+        db, Client, client_id,
+        owned=Client.userId == current_user.id,
+        user_id=current_user.id,
+        entity_type="client",
+        expected_version=version,
+        label="Client",
+        extra_conditions=(
+            ~exists().where(Case.clientId == Client.id),
+            ~exists().where(CaseArchive.clientId == Client.id),
+        ),
+        blocked_detail="Client still has cases"
+    )
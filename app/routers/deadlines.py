@@ -0,0 +1,120 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+
+from app.database import get_db
+from app.models import Deadline, Holiday
+from app.schemas import (
+    DeadlineCompute, DeadlineComputeResponse, DeadlineCreate, DeadlineResponse,
+    HolidayCreate, HolidayResponse, HolidayCreateResponse
+)
+from app.auth import get_current_user
+from app.business_days import builtin_holidays, calendar_cache
+from app.deadlines import create_deadline, delete_deadline, recompute_deadlines
+from app.idempotency import IdempotentRoute
+
+router = APIRouter(route_class=IdempotentRoute)
+
+def require_admin(current_user=Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return current_user
+
+@router.get("/", response_model=List[DeadlineResponse])
+async def get_deadlines(
+    caseId: Optional[int] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(Deadline).filter(Deadline.userId == current_user.id)
+    if caseId is not None:
+        query = query.filter(Deadline.caseId == caseId)
+    return query.order_by(Deadline.dueDate).all()
+
+@router.post("/compute", response_model=DeadlineComputeResponse)
+async def compute_deadline(
+    data: DeadlineCompute,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Due date for a period without saving anything"""
+    try:
+        due = calendar_cache.get(db).due_date(data.baseDate, data.amount, data.unit, data.judicialRecess)
+    except (ValueError, IndexError):
+        raise HTTPException(status_code=400, detail="Due date is outside the supported calendar")
+    return {"dueDate": due}
+
+@router.post("/", response_model=DeadlineResponse)
+async def add_deadline(
+    data: DeadlineCreate,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Save a deadline and put its due date on the calendar"""
+    return create_deadline(db, current_user.id, data)
+
+@router.delete("/{deadline_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_deadline(
+    deadline_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    delete_deadline(db, current_user.id, deadline_id)
+
+@router.get("/holidays", response_model=List[HolidayResponse])
+async def get_holidays(
+    year: int = Query(...),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    holidays = [
+        {"date": day, "name": name, "builtin": True}
+        for day, name in builtin_holidays() if day.year == year
+    ]
+    holidays.extend(
+        {"id": h.id, "date": h.date, "name": h.name}
+        for h in db.query(Holiday).filter(Holiday.date.between(date(year, 1, 1), date(year, 12, 31)))
+    )
+    return sorted(holidays, key=lambda h: h["date"])
+
+@router.post("/holidays", response_model=HolidayCreateResponse)
+async def add_holiday(
+    data: HolidayCreate,
+    current_user=Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Add a holiday and move every open case's deadlines accordingly"""
+    holiday = Holiday(date=data.date, name=data.name)
+    db.add(holiday)
+    try:
+        db.flush()
+        recomputed = recompute_deadlines(db)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Holiday already exists")
+    finally:
+        calendar_cache.invalidate()
+    db.refresh(holiday)
+    return {"holiday": holiday, "recomputed": recomputed}
+
+@router.delete("/holidays/{holiday_id}", response_model=HolidayCreateResponse)
+async def remove_holiday(
+    holiday_id: int,
+    current_user=Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    holiday = db.query(Holiday).filter(Holiday.id == holiday_id).first()
+    if not holiday:
+        raise HTTPException(status_code=404, detail="Holiday not found")
+    removed = HolidayResponse.model_validate(holiday)
+    db.delete(holiday)
+    try:
+        db.flush()
+        recomputed = recompute_deadlines(db)
+        db.commit()
+    finally:
+        calendar_cache.invalidate()
+    return {"holiday": removed, "recomputed": recomputed}
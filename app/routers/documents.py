@@ -0,0 +1,147 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db
+from app.models import Blob, Case, Document, Event
+from app.schemas import DocumentResponse
+from app.auth import get_current_user
+from app.storage import get_storage
+from app.idempotency import IdempotentRoute
+
+router = APIRouter(route_class=IdempotentRoute)
+
+def resolve_case(db: Session, user_id: int, case_id: Optional[int], event_id: Optional[int]) -> int:
+    """The owned case a document is attached to (an event's documents also belong to its case)"""
+    if event_id is not None:
+        event_case = db.execute(
+            select(Event.caseId).join(Case, Event.caseId == Case.id)
+            .where(Event.id == event_id, Case.userId == user_id)
+        ).scalar()
+        if event_case is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        if case_id is not None and case_id != event_case:
+            raise HTTPException(status_code=400, detail="Event belongs to another case")
+        return event_case
+    if case_id is None:
+        raise HTTPException(status_code=400, detail="caseId or eventId is required")
+    if db.execute(select(Case.id).where(Case.id == case_id, Case.userId == user_id)).scalar() is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return case_id
+
+def get_owned_document(db: Session, user_id: int, document_id: int) -> Document:
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.userId == user_id
+    ).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+@router.get("/", response_model=List[DocumentResponse])
+async def get_documents(
+    caseId: Optional[int] = Query(None),
+    eventId: Optional[int] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(Document).filter(Document.userId == current_user.id)
+    if caseId is not None:
+        query = query.filter(Document.caseId == caseId)
+    if eventId is not None:
+        query = query.filter(Document.eventId == eventId)
+    return query.order_by(Document.id).all()
+
+@router.post("/", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
+async def upload_document(
+    request: Request,
+    filename: str = Query(..., min_length=1),
+    caseId: Optional[int] = Query(None),
+    eventId: Optional[int] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload the raw request body as a document of a case or event; the body
+    is streamed to storage and never held in memory as a whole
+    """
+    case_id = resolve_case(db, current_user.id, caseId, eventId)
+    # Don't hold a pooled connection for the duration of the upload
+    db.rollback()
+
+    storage = get_storage()
+    tmp_path, digest, size = await storage.receive(request.stream())
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    upsert = dialect.insert(Blob).values(sha256=digest, size=size)
+    created = False
+    try:
+        # Upserting locks the Blob row, so a concurrent delete of the same
+        # content can't remove the file between the check and the commit
+        db.execute(upsert.on_conflict_do_update(index_elements=[Blob.sha256], set_={"size": upsert.excluded.size}))
+        document = Document(
+            userId=current_user.id,
+            caseId=case_id,
+            eventId=eventId,
+            sha256=digest,
+            filename=filename,
+            contentType=request.headers.get("content-type") or "application/octet-stream",
+            size=size
+        )
+        db.add(document)
+        db.flush()
+        created = storage.store(tmp_path, digest)
+        db.commit()
+    except BaseException:
+        if created:
+            storage.delete(digest)
+        else:
+            storage.discard(tmp_path)
+        db.rollback()
+        raise
+    db.refresh(document)
+    return document
+
+@router.get("/{document_id}", response_model=DocumentResponse)
+async def get_document(
+    document_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return get_owned_document(db, current_user.id, document_id)
+
+@router.get("/{document_id}/content", response_class=Response)
+async def download_document(
+    document_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """File content; supports Range requests for partial downloads"""
+    document = get_owned_document(db, current_user.id, document_id)
+    return get_storage().response(document.sha256, document.filename, document.contentType)
+
+@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_document(
+    document_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a document, and its content once no other document shares it"""
+    digest = db.execute(
+        delete(Document).where(Document.id == document_id, Document.userId == current_user.id)
+        .returning(Document.sha256)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if digest is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    orphaned = db.execute(
+        delete(Blob).where(Blob.sha256 == digest, ~exists().where(Document.sha256 == digest))
+        .returning(Blob.sha256)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if orphaned:
+        # Still holding the Blob row lock, see upload_document
+        get_storage().delete(digest)
+    db.commit()
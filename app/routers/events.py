@@ -1,30 +1,115 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, Query, status
+from sqlalchemy import exists, select, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
-from app.models import Event
-from app.schemas import EventCreate, EventResponse
+from app.models import Event, Case, Deadline, Document
+from app.schemas import (
+    EventCreate, EventUpdate, EventResponse, EventCreateResponse, ConflictCheck, ConflictResponse
+)
 from app.auth import get_current_user
+from app.crud import update_owned, delete_owned, insert_events
+from app.fields import FIELDS_DESCRIPTION, parse_fields, sparse_response
+from app.scheduling import find_conflicts, schedule_cache
+from app.idempotency import IdempotentRoute
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
+
+MAX_BATCH_SIZE = 500
 
 @router.get("/", response_model=List[EventResponse])
-async def get_events(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
-    events = db.query(Event).join(Event.case).filter(
-        Event.case.has(userId=current_user.id)
-    ).all()
-    return events
+async def get_events(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    selected = parse_fields(fields, EventResponse)
+    events = select(Event).join(Case, Case.id == Event.caseId).where(Case.userId == current_user.id)
+    if selected:
+        return sparse_response(db, EventResponse, Event, selected, events)
+    return db.execute(events).scalars().all()
 
-@router.post("/", response_model=EventResponse)
+@router.post("/", response_model=EventCreateResponse)
 async def create_event(
     event_data: EventCreate,
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # TODO: Verify case belongs to user
-    event = Event(**event_data.dict())
-    db.add(event)
-    db.commit()
-    db.refresh(event)
-    return event
+    """
+    Authorized and inserted by one INSERT ... SELECT. A dated event first
+    looks up the events it overlaps, one more SELECT (on SQLite none when
+    the schedule cache is warm and nothing overlaps).
+    """
+    conflicts = []
+    if event_data.eventDate is not None:
+        conflicts = [e.id for e in find_conflicts(db, current_user, event_data.eventDate, event_data.endDate)]
+    event = insert_events(db, current_user.id, [event_data.dict()])[0]
+    schedule_cache.note_inserted(current_user.id, [event])
+    return EventCreateResponse.model_validate(event).model_copy(update={"conflicts": conflicts})
+
+@router.post("/batch", response_model=List[EventResponse])
+async def create_events(
+    events_data: List[EventCreate] = Body(..., min_length=1, max_length=MAX_BATCH_SIZE),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create several events in one statement; fails as a whole if any case isn't the user's"""
+    events = insert_events(db, current_user.id, [event.dict() for event in events_data])
+    schedule_cache.note_inserted(current_user.id, events)
+    return events
+
+@router.post("/check-conflicts", response_model=ConflictResponse)
+async def check_conflicts(
+    check: ConflictCheck,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """The user's events overlapping a proposed time slot"""
+    conflicts = find_conflicts(db, current_user, check.start, check.end, check.excludeEventId)
+    return {"conflicts": conflicts}
+
+def owned_by(user_id: int):
+    return Event.caseId.in_(select(Case.id).where(Case.userId == user_id))
+
+@router.patch("/{event_id}", response_model=EventResponse)
+async def update_event(
+    event_id: int,
+    event_data: EventUpdate,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    values = event_data.dict(exclude_unset=True, exclude={"version"})
+    extra = ()
+    if "caseId" in values:
+        extra = (exists().where(Case.id == values["caseId"], Case.userId == current_user.id),)
+    return update_owned(
+        db, Event, event_id,
+        owned=owned_by(current_user.id),
+        values=values,
+        user_id=current_user.id,
+        expected_version=event_data.version,
+        label="Event",
+        extra_conditions=extra
+    )
+
+@router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_event(
+    event_id: int,
+    version: Optional[int] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # ON DELETE SET NULL, which Postgres can't declare against the partitioned Event table
+    for column in (Deadline.eventId, Deadline.sourceEventId):
+        db.execute(update(Deadline).where(column == event_id).values({column: None}))
+    delete_owned(
+        db, Event, event_id,
+        owned=owned_by(current_user.id),
+        user_id=current_user.id,
+        entity_type="event",
+        expected_version=version,
+        label="Event",
+        extra_conditions=(~exists().where(Document.eventId == Event.id),),
+        blocked_detail="Event has documents"
+    )
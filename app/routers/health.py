@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+@router.get("")
+async def health(request: Request):
+    probe = request.app.state.db_probe
+    result = await probe.snapshot()
+    body = {
+        "status": "healthy" if probe.healthy else "unhealthy",
+        "database": result["db"],
+        "version": request.app.version,
+        **result,
+    }
+    return JSONResponse(body, status_code=200 if probe.healthy else 503)
+
+@router.get("/live")
+async def liveness():
+    """Process is up and serving; never touches the database"""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness(request: Request):
+    """Ready to take traffic: the last cached database probe succeeded"""
+    return await health(request)
@@ -0,0 +1,59 @@
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.importer import IMPORT_MAX_BYTES, IMPORT_PART_BYTES, file_format, store_parts
+from app.jobs import enqueue
+from app.models import ImportFile
+from app.schemas import JobResponse
+from app.auth import get_current_user
+from app.idempotency import IdempotentRoute
+
+router = APIRouter(route_class=IdempotentRoute)
+
+@router.post("/", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_import(
+    request: Request,
+    filename: str = Query(..., min_length=1),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Import clients, cases and hearings from a .csv or .xlsx case list sent
+    as the raw request body; returns the import job to poll at /api/jobs.
+    The body is spooled to a temporary file and stored a part at a time,
+    so memory doesn't grow with the file.
+    """
+    try:
+        format = file_format(filename)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    # Don't hold a pooled connection for the duration of the upload
+    db.rollback()
+
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_PART_BYTES) as spool:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Import files are limited to {IMPORT_MAX_BYTES} bytes")
+            spool.write(chunk)
+        if not size:
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        upload = ImportFile(
+            userId=current_user.id,
+            filename=filename,
+            format=format,
+            size=size,
+        )
+        db.add(upload)
+        db.flush()
+        spool.seek(0)
+        store_parts(db, upload.id, spool)
+    job = enqueue(db, "import", {"importId": upload.id}, user_id=current_user.id, commit=False)
+    db.commit()
+    db.refresh(job)
+    return job
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db
+from app.models import Invoice, TimeEntry
+from app.schemas import InvoiceGenerate, InvoiceResponse, TimeEntryResponse
+from app.auth import get_current_user
+from app.billing import generate_month
+from app.idempotency import IdempotentRoute
+
+router = APIRouter(route_class=IdempotentRoute)
+
+@router.get("/", response_model=List[InvoiceResponse])
+async def get_invoices(
+    clientId: Optional[int] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(Invoice).filter(Invoice.userId == current_user.id)
+    if clientId is not None:
+        query = query.filter(Invoice.clientId == clientId)
+    return query.order_by(Invoice.id).all()
+
+@router.post("/generate", response_model=List[InvoiceResponse])
+async def generate_invoices(
+    request: InvoiceGenerate,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Invoice every client's unbilled time of a month in one transaction"""
+    return generate_month(db, current_user.id, request.year, request.month, request.taxRate)
+
+@router.get("/{invoice_id}", response_model=InvoiceResponse)
+async def get_invoice(
+    invoice_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    invoice = db.query(Invoice).filter(
+        Invoice.id == invoice_id,
+        Invoice.userId == current_user.id
+    ).first()
+
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    return invoice
+
+@router.get("/{invoice_id}/time-entries", response_model=List[TimeEntryResponse])
+async def get_invoice_entries(
+    invoice_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return db.query(TimeEntry).filter(
+        TimeEntry.invoiceId == invoice_id,
+        TimeEntry.userId == current_user.id
+    ).order_by(TimeEntry.workDate, TimeEntry.id).all()
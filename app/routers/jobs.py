@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.database import get_db
+from app.models import Job
+from app.schemas import JobResponse
+from app.auth import get_current_user
+
+router = APIRouter()
+
+RECENT_JOBS = 50
+# Suggested polling interval while a job is unfinished
+POLL_AFTER_SECONDS = 2
+
+@router.get("/", response_model=List[JobResponse])
+async def get_jobs(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    """The user's most recent jobs"""
+    return db.query(Job).filter(Job.userId == current_user.id).order_by(Job.id.desc()).limit(RECENT_JOBS).all()
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    response: Response,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = db.query(Job).filter(Job.id == job_id, Job.userId == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in ("queued", "running"):
+        response.headers["Retry-After"] = str(POLL_AFTER_SECONDS)
+    return job
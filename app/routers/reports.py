@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.jobs import enqueue
+from app.models import CaseReport, Job
+from app.reports import report_versions
+from app.schemas import JobResponse
+from app.auth import get_current_user
+from app.routers.jobs import POLL_AFTER_SECONDS
+from app.idempotency import IdempotentRoute
+
+router = APIRouter(route_class=IdempotentRoute)
+
+def accepted(job: Job) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(JobResponse.model_validate(job)),
+        headers={"Location": f"/api/jobs/{job.id}", "Retry-After": str(POLL_AFTER_SECONDS)},
+    )
+
+@router.get(
+    "/cases/{case_id}",
+    response_class=Response,
+    responses={
+        200: {"content": {"application/pdf": {}}, "description": "The case summary"},
+        202: {"model": JobResponse, "description": "Being rendered; poll the job, then request again"},
+    },
+)
+async def get_case_report(
+    case_id: int,
+    request: Request,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Case summary PDF, rendered by a worker when the case changed since the last one"""
+    version = report_versions(db, [case_id], current_user.id).get(case_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    etag = f'"{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    content = db.execute(
+        select(CaseReport.content).where(CaseReport.caseId == case_id, CaseReport.version == version)
+    ).scalar()
+    if content is not None:
+        return Response(
+            content,
+            media_type="application/pdf",
+            headers={"ETag": etag, "Content-Disposition": f'inline; filename="dava-{case_id}.pdf"'},
+        )
+
+    # One render at a time per case, however often the client asks
+    job = db.execute(
+        select(Job).where(
+            Job.userId == current_user.id,
+            Job.kind == "case_report",
+            Job.status.in_(("queued", "running")),
+            Job.payload["caseId"].as_integer() == case_id,
+        )
+    ).scalar()
+    return accepted(job or enqueue(db, "case_report", {"caseId": case_id}, user_id=current_user.id))
+
+@router.post("/hearings", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def render_hearing_reports(
+    day: Optional[date] = Query(None, alias="date"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Render the summaries of every case with a hearing on a day, tomorrow by default"""
+    day = day or date.today() + timedelta(days=1)
+    return enqueue(db, "hearing_reports", {"date": day.isoformat()}, user_id=current_user.id)
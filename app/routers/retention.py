@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.database import get_db
+from app.models import Client, RetentionJob
+from app.schemas import RetentionJobCreate, RetentionJobResponse
+from app.auth import get_current_user
+from app.jobs import enqueue
+from app.retention import throughput
+from app.idempotency import IdempotentRoute
+
+router = APIRouter(route_class=IdempotentRoute)
+
+def job_response(job: RetentionJob) -> RetentionJobResponse:
+    return RetentionJobResponse.model_validate(job).model_copy(update={"rowsPerSecond": round(throughput(job), 1)})
+
+@router.get("/", response_model=List[RetentionJobResponse])
+async def get_retention_jobs(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    jobs = db.query(RetentionJob).filter(RetentionJob.userId == current_user.id).order_by(RetentionJob.id).all()
+    return [job_response(job) for job in jobs]
+
+@router.post("/", response_model=RetentionJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_retention_job(
+    request: RetentionJobCreate,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Erase a former client's personal data on the job queue"""
+    client = db.query(Client.id).filter(
+        Client.id == request.clientId,
+        Client.userId == current_user.id
+    ).first()
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found")
+
+    job = RetentionJob(userId=current_user.id, clientId=request.clientId)
+    db.add(job)
+    db.flush()
+    enqueue(db, "retention", {"retentionJobId": job.id}, user_id=current_user.id, commit=False)
+    db.commit()
+    db.refresh(job)
+    return job_response(job)
+
+@router.get("/{job_id}", response_model=RetentionJobResponse)
+async def get_retention_job(
+    job_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = db.query(RetentionJob).filter(
+        RetentionJob.id == job_id,
+        RetentionJob.userId == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Retention job not found")
+    return job_response(job)
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db, SessionLocal
+from app.auth import get_current_user
+from app.pubsub import broker
+
+router = APIRouter()
+
+KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+
+def bearer_or_query_token(request: Request, token: Optional[str] = Query(None)) -> str:
+    """EventSource and browser WebSockets can't set headers, so ?token= is accepted too"""
+    authorization = request.headers.get("Authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    if token:
+        return token
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def format_sse(message: dict) -> str:
+    return f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+
+@router.get("", response_class=StreamingResponse)
+async def stream(
+    token: str = Depends(bearer_or_query_token),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events feed of change notifications for the current user"""
+    user_id = get_current_user(token, db).id
+    # Don't hold a pooled connection for the lifetime of the stream
+    db.close()
+
+    async def events():
+        # Subscribed once the response is actually sent, so one that is
+        # built and dropped leaves nothing behind
+        subscription = broker.subscribe(user_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(message)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/ws")
+async def stream_ws(websocket: WebSocket, token: str = Query(...)):
+    """WebSocket variant of the change feed"""
+    db = SessionLocal()
+    try:
+        user_id = get_current_user(token, db).id
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    finally:
+        db.close()
+
+    await websocket.accept()
+    subscription = broker.subscribe(user_id)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                message = {"type": "keepalive"}
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broker.unsubscribe(subscription)
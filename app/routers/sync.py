@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.schemas import SyncResponse
+from app.auth import get_current_user
+from app.sync import changes_since
+
+router = APIRouter()
+
+@router.get("", response_model=SyncResponse)
+async def sync(
+    since: int = Query(0, ge=0),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Everything changed after `since`; pass the returned `version` next time"""
+    # Read the version before the rows: a write landing in between is sent
+    # again on the next sync rather than skipped.
+    version = current_user.syncVersion
+    return {"version": version, **changes_since(db, current_user.id, since)}
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db
+from app.models import Case, TimeEntry
+from app.schemas import TimeEntryCreate, TimeEntryUpdate, TimeEntryResponse, BillingSummary
+from app.auth import get_current_user
+from app.billing import adjust_rollup, entry_amount, summary
+from app.idempotency import IdempotentRoute
+
+router = APIRouter(route_class=IdempotentRoute)
+
+def check_case(db: Session, user_id: int, case_id: int):
+    if db.execute(select(Case.id).where(Case.id == case_id, Case.userId == user_id)).scalar() is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+
+def get_unbilled_entry(db: Session, user_id: int, entry_id: int) -> TimeEntry:
+    # Locked so concurrent edits apply their rollup deltas one after another
+    entry = db.query(TimeEntry).filter(
+        TimeEntry.id == entry_id, TimeEntry.userId == user_id
+    ).with_for_update().first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="Time entry not found")
+    if entry.invoiceId is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Time entry is already invoiced")
+    return entry
+
+@router.get("/", response_model=List[TimeEntryResponse])
+async def get_time_entries(
+    caseId: Optional[int] = Query(None),
+    unbilled: bool = Query(False),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(TimeEntry).filter(TimeEntry.userId == current_user.id)
+    if caseId is not None:
+        query = query.filter(TimeEntry.caseId == caseId)
+    if unbilled:
+        query = query.filter(TimeEntry.invoiceId.is_(None))
+    return query.order_by(TimeEntry.workDate, TimeEntry.id).all()
+
+@router.get("/summary", response_model=BillingSummary)
+async def get_billing_summary(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    """Unbilled and billed totals per case, per client and overall"""
+    return summary(db, current_user.id)
+
+@router.post("/", response_model=TimeEntryResponse)
+async def create_time_entry(
+    entry_data: TimeEntryCreate,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    check_case(db, current_user.id, entry_data.caseId)
+    entry = TimeEntry(
+        **entry_data.dict(),
+        userId=current_user.id,
+        amount=entry_amount(entry_data.minutes, entry_data.hourlyRate)
+    )
+    db.add(entry)
+    adjust_rollup(db, current_user.id, entry.caseId, entry.minutes, entry.amount)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+@router.patch("/{entry_id}", response_model=TimeEntryResponse)
+async def update_time_entry(
+    entry_id: int,
+    entry_data: TimeEntryUpdate,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    entry = get_unbilled_entry(db, current_user.id, entry_id)
+    values = entry_data.dict(exclude_unset=True)
+    if "caseId" in values and values["caseId"] != entry.caseId:
+        check_case(db, current_user.id, values["caseId"])
+
+    adjust_rollup(db, current_user.id, entry.caseId, -entry.minutes, -entry.amount)
+    for field, value in values.items():
+        setattr(entry, field, value)
+    entry.amount = entry_amount(entry.minutes, entry.hourlyRate)
+    adjust_rollup(db, current_user.id, entry.caseId, entry.minutes, entry.amount)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+@router.delete("/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_time_entry(
+    entry_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    entry = get_unbilled_entry(db, current_user.id, entry_id)
+    adjust_rollup(db, current_user.id, entry.caseId, -entry.minutes, -entry.amount)
+    db.delete(entry)
+    db.commit()
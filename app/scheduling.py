@@ -0,0 +1,178 @@
+"""
+Double-booking detection
+
+An event occupies ``[eventDate, endDate)``; events without an end take
+DEFAULT_EVENT_MINUTES. On Postgres overlaps are answered by a GiST index on
+``tsrange("eventDate", <end>)``. Elsewhere (SQLite in development and tests)
+each user's events are loaded once into a static interval tree that is
+cached per worker and keyed by the user's ``syncVersion``, so it is rebuilt
+only after the user's data changed.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.orm import Session
+
+from app.models import DEFAULT_EVENT_MINUTES, Case, Event
+
+SCHEDULE_CACHE_USERS = int(os.getenv("SCHEDULE_CACHE_USERS", "256"))
+# New events are appended to a cached tree's overflow list and scanned
+# linearly; past this many the tree is rebuilt instead
+MAX_PENDING = 64
+
+Interval = Tuple[datetime, datetime, int]
+
+DEFAULT_DURATION = timedelta(minutes=DEFAULT_EVENT_MINUTES)
+
+
+def event_end(start: datetime, end: Optional[datetime]) -> datetime:
+    return end if end is not None and end > start else start + DEFAULT_DURATION
+
+
+class IntervalTree:
+    """
+    Static centered interval tree over half-open ``[start, end)`` intervals.
+
+    Each node keeps the intervals containing its center sorted by start and
+    by end, so a query touches O(log n) nodes plus the k reported overlaps.
+    """
+
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, intervals: Sequence[Interval]):
+        starts = sorted(interval[0] for interval in intervals)
+        self.center = starts[len(starts) // 2] if starts else None
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] <= self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda interval: interval[0])
+        self.by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlapping(self, start: datetime, end: datetime) -> List[int]:
+        found = []
+        stack = [self] if self.center is not None else []
+        while stack:
+            node = stack.pop()
+            if end <= node.center:
+                for interval in node.by_start:
+                    if interval[0] >= end:
+                        break
+                    found.append(interval[2])
+                if node.left:
+                    stack.append(node.left)
+            elif start >= node.center:
+                for interval in node.by_end:
+                    if interval[1] <= start:
+                        break
+                    found.append(interval[2])
+                if node.right:
+                    stack.append(node.right)
+            else:
+                found.extend(interval[2] for interval in node.by_start)
+                if node.left:
+                    stack.append(node.left)
+                if node.right:
+                    stack.append(node.right)
+        return found
+
+
+class UserSchedule:
+    def __init__(self, version: int, intervals: Sequence[Interval]):
+        self.version = version
+        self.tree = IntervalTree(intervals)
+        self.pending: List[Interval] = []
+
+    def overlapping(self, start: datetime, end: datetime) -> List[int]:
+        found = self.tree.overlapping(start, end)
+        found.extend(i[2] for i in self.pending if i[0] < end and start < i[1])
+        return found
+
+
+class ScheduleCache:
+    def __init__(self, maxsize: int = SCHEDULE_CACHE_USERS):
+        self.maxsize = maxsize
+        self._schedules: "OrderedDict[int, UserSchedule]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int, version: int) -> UserSchedule:
+        with self._lock:
+            schedule = self._schedules.get(user_id)
+            if schedule is not None and schedule.version == version:
+                self._schedules.move_to_end(user_id)
+                return schedule
+
+        rows = db.execute(
+            select(Event.id, Event.eventDate, Event.endDate)
+            .join(Case, Event.caseId == Case.id)
+            .where(Case.userId == user_id, Event.eventDate.isnot(None))
+        ).all()
+        schedule = UserSchedule(version, [(r.eventDate, event_end(r.eventDate, r.endDate), r.id) for r in rows])
+        with self._lock:
+            self._schedules[user_id] = schedule
+            self._schedules.move_to_end(user_id)
+            while len(self._schedules) > self.maxsize:
+                self._schedules.popitem(last=False)
+        return schedule
+
+    def note_inserted(self, user_id: int, events: Sequence[Event]):
+        """Fold freshly inserted events into a cached tree instead of dropping it"""
+        if not events:
+            return
+        dated = [e for e in events if e.eventDate is not None]
+        with self._lock:
+            schedule = self._schedules.get(user_id)
+            new_version = events[0].syncVersion
+            if schedule is None or schedule.version != new_version - 1:
+                return
+            if len(schedule.pending) + len(dated) > MAX_PENDING:
+                del self._schedules[user_id]
+                return
+            schedule.pending.extend((e.eventDate, event_end(e.eventDate, e.endDate), e.id) for e in dated)
+            schedule.version = new_version
+
+
+schedule_cache = ScheduleCache()
+
+
+def period_expression():
+    # Same expression as app.models.EVENT_PERIOD, so ix_Event_period answers it
+    return func.tsrange(
+        Event.eventDate,
+        func.coalesce(Event.endDate, Event.eventDate + text(f"interval '{DEFAULT_EVENT_MINUTES} minutes'")),
+    )
+
+
+def find_conflicts(
+    db: Session,
+    user,
+    start: datetime,
+    end: Optional[datetime] = None,
+    exclude_event_id: Optional[int] = None,
+) -> List[Event]:
+    """The user's events overlapping ``[start, end)``"""
+    end = event_end(start, end)
+    if db.get_bind().dialect.name == "postgresql":
+        query = db.query(Event).join(Case, Event.caseId == Case.id).filter(
+            Case.userId == user.id,
+            period_expression().op("&&")(func.tsrange(literal(start), literal(end))),
+        )
+    else:
+        ids = schedule_cache.get(db, user.id, user.syncVersion).overlapping(start, end)
+        if not ids:
+            return []
+        query = db.query(Event).filter(Event.id.in_(ids))
+
+    if exclude_event_id is not None:
+        query = query.filter(Event.id != exclude_event_id)
+    return query.order_by(Event.eventDate).all()
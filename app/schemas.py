@@ -1,6 +1,20 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Any, List, Literal, Optional
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+def not_null(value):
+    # PATCH fields may be omitted but not explicitly cleared
+    if value is None:
+        raise ValueError("field cannot be null")
+    return value
+
+def naive_utc(value):
+    # Event times are stored in naive UTC columns; an offset would make them
+    # incomparable with the stored ones
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 # Auth Schemas
 class UserLogin(BaseModel):
@@ -16,8 +30,12 @@ class UserRegister(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
     user: dict
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 # User Schemas  
 class UserBase(BaseModel):
     email: str
@@ -38,14 +56,39 @@ class ClientCreate(BaseModel):
     phone: Optional[str] = None
     address: Optional[str] = None
 
+class ClientUpdate(BaseModel):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    # Version the client last read; a mismatch is rejected with 409
+    version: Optional[int] = None
+
+    _check_name = field_validator("name")(not_null)
+
 class ClientResponse(ClientCreate):
     id: int
     userId: int
+    version: int
     createdAt: datetime
     
     class Config:
         from_attributes = True
 
+class ConflictOfInterestCheck(BaseModel):
+    name: str = Field(..., min_length=1)
+    minScore: float = Field(0.6, ge=0, le=1)
+
+class PartyMatch(BaseModel):
+    client: ClientResponse
+    score: float
+
+class PartyMatchResponse(BaseModel):
+    matches: List[PartyMatch]
+
+class DuplicateClientsResponse(BaseModel):
+    groups: List[List[ClientResponse]]
+
 # Case Schemas
 class CaseCreate(BaseModel):
     title: str
@@ -54,9 +97,20 @@ class CaseCreate(BaseModel):
     description: Optional[str] = None
     status: Optional[str] = "active"
 
+class CaseUpdate(BaseModel):
+    title: Optional[str] = None
+    clientId: Optional[int] = None
+    caseNumber: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[str] = None
+    version: Optional[int] = None
+
+    _check_required = field_validator("title", "clientId", "status")(not_null)
+
 class CaseResponse(CaseCreate):
     id: int
     userId: int
+    version: int
     createdAt: datetime
     
     class Config:
@@ -68,10 +122,148 @@ class EventCreate(BaseModel):
     caseId: int
     description: Optional[str] = None
     eventDate: Optional[datetime] = None
+    endDate: Optional[datetime] = None
+    eventType: Optional[str] = None
+
+    _naive_dates = field_validator("eventDate", "endDate")(naive_utc)
+
+class EventUpdate(BaseModel):
+    title: Optional[str] = None
+    caseId: Optional[int] = None
+    description: Optional[str] = None
+    eventDate: Optional[datetime] = None
+    endDate: Optional[datetime] = None
     eventType: Optional[str] = None
+    version: Optional[int] = None
+
+    _check_required = field_validator("title", "caseId")(not_null)
+    _naive_dates = field_validator("eventDate", "endDate")(naive_utc)
 
 class EventResponse(EventCreate):
     id: int
+    version: int
+    createdAt: datetime
+    
+    class Config:
+        from_attributes = True
+
+class ArchivedCaseResponse(CaseResponse):
+    archivedAt: datetime
+
+class ArchivedCaseDetail(ArchivedCaseResponse):
+    events: List[EventResponse] = []
+
+class EventCreateResponse(EventResponse):
+    # Ids of the user's events overlapping the new one
+    conflicts: List[int] = []
+
+class ConflictCheck(BaseModel):
+    start: datetime
+    end: Optional[datetime] = None
+    excludeEventId: Optional[int] = None
+
+    _naive_dates = field_validator("start", "end")(naive_utc)
+
+class ConflictResponse(BaseModel):
+    conflicts: List[EventResponse]
+
+# Billing Schemas
+class TimeEntryCreate(BaseModel):
+    caseId: int
+    workDate: date
+    minutes: int = Field(..., gt=0)
+    hourlyRate: Decimal = Field(0, ge=0, max_digits=12, decimal_places=2)
+    description: Optional[str] = None
+
+class TimeEntryUpdate(BaseModel):
+    caseId: Optional[int] = None
+    workDate: Optional[date] = None
+    minutes: Optional[int] = Field(None, gt=0)
+    hourlyRate: Optional[Decimal] = Field(None, ge=0, max_digits=12, decimal_places=2)
+    description: Optional[str] = None
+
+    _check_required = field_validator("caseId", "workDate", "minutes", "hourlyRate")(not_null)
+
+class TimeEntryResponse(TimeEntryCreate):
+    id: int
+    # Amounts are Decimal in the database and JSON numbers in responses
+    hourlyRate: float
+    amount: float
+    invoiceId: Optional[int] = None
+    createdAt: datetime
+    
+    class Config:
+        from_attributes = True
+
+class BillingTotals(BaseModel):
+    unbilledMinutes: int
+    unbilledAmount: float
+    billedMinutes: int
+    billedAmount: float
+
+class CaseBillingTotals(BillingTotals):
+    caseId: int
+    clientId: int
+
+class ClientBillingTotals(BillingTotals):
+    clientId: int
+
+class BillingSummary(BaseModel):
+    cases: List[CaseBillingTotals]
+    clients: List[ClientBillingTotals]
+    totals: BillingTotals
+
+class InvoiceGenerate(BaseModel):
+    year: int = Field(..., ge=2000, le=2100)
+    month: int = Field(..., ge=1, le=12)
+    taxRate: Decimal = Field(20, ge=0, max_digits=5, decimal_places=2)
+
+class InvoiceResponse(BaseModel):
+    id: int
+    clientId: int
+    number: str
+    periodStart: date
+    periodEnd: date
+    minutes: int
+    amount: float
+    taxRate: float
+    tax: float
+    total: float
+    status: str
+    createdAt: datetime
+    
+    class Config:
+        from_attributes = True
+
+# Document Schemas
+class DocumentResponse(BaseModel):
+    id: int
+    caseId: Optional[int] = None
+    eventId: Optional[int] = None
+    filename: str
+    contentType: str
+    size: int
+    sha256: str
+    createdAt: datetime
+    
+    class Config:
+        from_attributes = True
+
+# Retention Schemas
+class RetentionJobCreate(BaseModel):
+    clientId: int
+
+class RetentionJobResponse(BaseModel):
+    id: int
+    clientId: int
+    status: str
+    step: Optional[str] = None
+    rowsDeleted: int
+    rowsPseudonymized: int
+    elapsedSeconds: float
+    rowsPerSecond: float = 0
+    error: Optional[str] = None
+    finishedAt: Optional[datetime] = None
     createdAt: datetime
     
     class Config:
@@ -83,3 +275,138 @@ class StatsResponse(BaseModel):
     total_cases: int
     active_cases: int
     upcoming_events: int
+
+# Sync Schemas
+class DeletedEntity(BaseModel):
+    type: str
+    id: int
+    version: int
+
+class SyncResponse(BaseModel):
+    version: int
+    clients: List[ClientResponse]
+    cases: List[CaseResponse]
+    events: List[EventResponse]
+    deleted: List[DeletedEntity]
+
+# Deadline Schemas
+DeadlineUnit = Literal["days", "weeks", "months", "business_days"]
+
+class DeadlineCompute(BaseModel):
+    baseDate: date
+    amount: int = Field(..., ge=1)
+    unit: DeadlineUnit = "days"
+    judicialRecess: bool = False
+
+class DeadlineComputeResponse(BaseModel):
+    dueDate: date
+
+class DeadlineCreate(BaseModel):
+    title: str
+    # Milestone: an event (e.g. the notification) or the case, whose start
+    # date is used unless baseDate is given
+    caseId: Optional[int] = None
+    sourceEventId: Optional[int] = None
+    baseDate: Optional[date] = None
+    amount: int = Field(..., ge=1)
+    unit: DeadlineUnit = "days"
+    judicialRecess: bool = False
+    description: Optional[str] = None
+
+class DeadlineResponse(BaseModel):
+    id: int
+    title: str
+    caseId: int
+    sourceEventId: Optional[int] = None
+    eventId: Optional[int] = None
+    baseDate: date
+    amount: int
+    unit: str
+    judicialRecess: bool
+    dueDate: date
+    createdAt: datetime
+    
+    class Config:
+        from_attributes = True
+
+class HolidayCreate(BaseModel):
+    date: date
+    name: str
+
+class HolidayResponse(BaseModel):
+    id: Optional[int] = None
+    date: date
+    name: str
+    builtin: bool = False
+    
+    class Config:
+        from_attributes = True
+
+class HolidayCreateResponse(BaseModel):
+    holiday: HolidayResponse
+    recomputed: int
+
+# Agenda Schemas
+class AgendaEntry(BaseModel):
+    id: int
+    caseId: int
+    title: str
+    eventType: Optional[str] = None
+    eventDate: datetime
+    endDate: Optional[datetime] = None
+    caseTitle: str
+    caseNumber: Optional[str] = None
+    clientId: Optional[int] = None
+    clientName: Optional[str] = None
+
+class AgendaResponse(BaseModel):
+    date: date
+    today: List[AgendaEntry]
+    # The rest of the week, after today
+    week: List[AgendaEntry]
+    computedAt: datetime
+
+# Batch Schemas
+class BatchRequestItem(BaseModel):
+    # Echoed back so clients can match responses to requests
+    id: Optional[str] = None
+    method: Literal["GET"] = "GET"
+    path: str
+
+    @field_validator("path")
+    @classmethod
+    def api_path(cls, value):
+        if not value.startswith("/api/"):
+            raise ValueError("path must start with /api/")
+        return value
+
+class BatchRequest(BaseModel):
+    requests: List[BatchRequestItem] = Field(min_length=1, max_length=20)
+    concurrent: bool = False
+
+class BatchResponseItem(BaseModel):
+    id: Optional[str] = None
+    status: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchResponseItem]
+
+# Job Schemas
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int
+    maxAttempts: int
+    runAt: datetime
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+    createdAt: datetime
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,122 @@
+"""
+Content-addressed document storage
+
+Uploads are consumed chunk by chunk, hashed with SHA-256 while they are
+written to a temporary file, then moved to ``<root>/<ab>/<cd>/<sha256>``.
+Identical files therefore share one stored copy however many cases they
+are attached to. Callers store and delete content while holding the lock
+on its Blob row, so an upload never attaches to content being deleted.
+
+Backends implement ``receive``, ``store``, ``discard``, ``delete`` and
+``response``. The local one serves files through ``FileResponse``, which
+answers ``Range`` requests, or hands them to nginx with X-Accel-Redirect
+when DOCUMENT_ACCEL_REDIRECT is set, so the proxy sends them with sendfile.
+"""
+import hashlib
+import os
+import tempfile
+from typing import AsyncIterator, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, status
+from starlette.responses import FileResponse, Response
+
+DOCUMENT_STORAGE = os.getenv("DOCUMENT_STORAGE", "local")
+DOCUMENT_STORAGE_DIR = os.getenv("DOCUMENT_STORAGE_DIR", "./storage")
+DOCUMENT_ACCEL_REDIRECT = os.getenv("DOCUMENT_ACCEL_REDIRECT", "")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+
+def content_disposition(filename: str) -> str:
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+class LocalStorage:
+    def __init__(
+        self,
+        root: str = DOCUMENT_STORAGE_DIR,
+        accel_redirect: str = DOCUMENT_ACCEL_REDIRECT,
+        max_upload_bytes: int = MAX_UPLOAD_BYTES,
+    ):
+        self.root = os.path.abspath(root)
+        self.max_upload_bytes = max_upload_bytes
+        self.accel_redirect = accel_redirect.rstrip("/")
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+    def relative_path(self, digest: str) -> str:
+        return os.path.join(digest[:2], digest[2:4], digest)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, self.relative_path(digest))
+
+    async def receive(self, chunks: AsyncIterator[bytes]) -> Tuple[str, str, int]:
+        """Spool an upload to a temporary file; returns ``(tmp_path, sha256, size)``"""
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large"
+                        )
+                    sha256.update(chunk)
+                    tmp.write(chunk)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+        return tmp_path, sha256.hexdigest(), size
+
+    def store(self, tmp_path: str, digest: str) -> bool:
+        """
+        Move a received file to its content address. Returns False, dropping
+        the temporary copy, when identical content is already stored.
+        """
+        target = self.path(digest)
+        if os.path.exists(target):
+            self.discard(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+        return True
+
+    def discard(self, tmp_path: str):
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def delete(self, digest: str):
+        try:
+            os.unlink(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def response(self, digest: str, filename: str, media_type: str) -> Response:
+        if self.accel_redirect:
+            return Response(headers={
+                "X-Accel-Redirect": f"{self.accel_redirect}/{self.relative_path(digest)}",
+                "Content-Type": media_type,
+                "Content-Disposition": content_disposition(filename),
+            })
+        if not os.path.exists(self.path(digest)):
+            raise HTTPException(status_code=404, detail="Document content missing")
+        return FileResponse(
+            self.path(digest),
+            media_type=media_type,
+            headers={"Content-Disposition": content_disposition(filename)},
+        )
+
+
+BACKENDS = {"local": LocalStorage}
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = BACKENDS[DOCUMENT_STORAGE]()
+    return _storage
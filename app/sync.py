@@ -0,0 +1,65 @@
+"""
+Per-tenant change versions for delta sync
+
+Every write bumps the owning user's ``syncVersion`` and stamps the written
+row (or a tombstone, for deletes) with the new value. The bump is an UPDATE
+on the user row, so concurrent writers for one tenant serialize on that row
+lock and versions become visible in commit order: a client that has seen
+version N never misses a later commit with a lower number.
+"""
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models import User, Client, Case, Event, Tombstone
+from app.pubsub import broker
+
+
+def next_version(db: Session, user_id: int) -> int:
+    """
+    Bump the user's change counter inside the current transaction and
+    notify the user's open streams once it commits
+    """
+    version = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(syncVersion=User.syncVersion + 1)
+        .returning(User.syncVersion),
+        execution_options={"synchronize_session": False},
+    ).scalar_one()
+    broker.publish(db, user_id, {"type": "change", "version": version})
+    return version
+
+
+def record_deletion(db: Session, user_id: int, entity_type: str, entity_id: int, version: int):
+    db.add(Tombstone(userId=user_id, entityType=entity_type, entityId=entity_id, syncVersion=version))
+
+
+def changes_since(db: Session, user_id: int, since: int) -> dict:
+    """
+    Rows written after ``since`` plus tombstones for rows deleted after it.
+
+    ``since=0`` is a full sync: every row, including ones written before
+    versions were tracked, and no tombstones.
+    """
+    clients = db.query(Client).filter(Client.userId == user_id)
+    cases = db.query(Case).filter(Case.userId == user_id)
+    events = db.query(Event).join(Event.case).filter(Case.userId == user_id)
+    deleted = []
+    if since:
+        clients = clients.filter(Client.syncVersion > since)
+        cases = cases.filter(Case.syncVersion > since)
+        events = events.filter(Event.syncVersion > since)
+        deleted = db.query(Tombstone).filter(
+            Tombstone.userId == user_id,
+            Tombstone.syncVersion > since
+        ).order_by(Tombstone.syncVersion)
+
+    return {
+        "clients": clients.all(),
+        "cases": cases.all(),
+        "events": events.all(),
+        "deleted": [
+            {"type": t.entityType, "id": t.entityId, "version": t.syncVersion}
+            for t in deleted
+        ],
+    }
@@ -0,0 +1,224 @@
+"""
+JWT encoding/decoding, verified-token cache and revocation denylist
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, select
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import record_cache
+from app.models import RevokedToken
+
+JWT_BACKEND = os.getenv("JWT_BACKEND", "auto")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+DENYLIST_SYNC_INTERVAL = float(os.getenv("DENYLIST_SYNC_INTERVAL", "5"))
+DENYLIST_PRUNE_EVERY = 60
+
+logger = logging.getLogger(__name__)
+
+
+class TokenError(Exception):
+    """Token is malformed, has a bad signature, is expired or was revoked"""
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """
+    PyJWT when available (noticeably cheaper decode than python-jose),
+    python-jose otherwise. Force one with JWT_BACKEND=pyjwt|jose.
+    """
+    if JWT_BACKEND in ("auto", "pyjwt"):
+        try:
+            import jwt
+            if hasattr(jwt, "PyJWTError"):
+                return "pyjwt", jwt, jwt.PyJWTError
+        except ImportError:
+            pass
+        if JWT_BACKEND == "pyjwt":
+            raise RuntimeError("JWT_BACKEND=pyjwt but PyJWT is not installed")
+    from jose import JWTError, jwt
+    return "jose", jwt, JWTError
+
+
+def encode(claims: dict, key: str, algorithm: str) -> str:
+    _, backend, _ = get_backend()
+    return backend.encode(claims, key, algorithm=algorithm)
+
+
+def decode(token: str, key: str, algorithm: str) -> dict:
+    _, backend, error = get_backend()
+    try:
+        return backend.decode(token, key, algorithms=[algorithm])
+    except error as e:
+        raise TokenError(str(e))
+
+
+class TokenCache:
+    """
+    Bounded LRU of already-verified tokens -> claims.
+
+    Keyed on the whole token string so a cached signature can never vouch
+    for a different header or payload. Entries are dropped once past their
+    ``exp``, so a hit is exactly as valid as a fresh decode would be.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            claims, expires = entry
+            if expires <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return claims
+
+    def put(self, token: str, claims: dict):
+        expires = claims.get("exp")
+        if expires is None:
+            return
+        with self._lock:
+            self._entries[token] = (claims, float(expires))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class BloomFilter:
+    def __init__(self, size_bits: int = 1 << 16, hashes: int = 4):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self.bits = bytearray(size_bits // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=4 * self.hashes).digest()
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[4 * i:4 * i + 4], "little") % self.size_bits
+
+    def add(self, value: str):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class Denylist:
+    """
+    Revoked token ids until their tokens would have expired anyway.
+
+    The bloom filter answers the common "not revoked" case without touching
+    the jti map; the map confirms the rare positive. Expired ids are pruned
+    and the filter rebuilt so it never saturates.
+    """
+
+    def __init__(self, size_bits: int = 1 << 16):
+        self.size_bits = size_bits
+        self._bloom = BloomFilter(size_bits)
+        self._jtis: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires: float):
+        with self._lock:
+            self._jtis[jti] = expires
+            self._bloom.add(jti)
+
+    def extend(self, entries: Iterable[Tuple[str, float]]):
+        for jti, expires in entries:
+            self.add(jti, expires)
+
+    def __contains__(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            return False
+        expires = self._jtis.get(jti)
+        return expires is not None and expires > time.time()
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+            self._bloom = BloomFilter(self.size_bits)
+            for jti in self._jtis:
+                self._bloom.add(jti)
+
+    def __len__(self):
+        return len(self._jtis)
+
+
+token_cache = TokenCache()
+denylist = Denylist()
+
+
+def verify(token: str, key: str, algorithm: str) -> dict:
+    """Decode and check a token, skipping signature work for cached tokens"""
+    claims = token_cache.get(token)
+    record_cache("jwt", claims is not None)
+    if claims is None:
+        claims = decode(token, key, algorithm)
+        token_cache.put(token, claims)
+
+    jti = claims.get("jti")
+    if jti is not None and jti in denylist:
+        raise TokenError("Token has been revoked")
+    return claims
+
+
+def _load_revoked(engine, prune: bool):
+    """
+    Every unexpired revocation, not just those with an id past the last one
+    seen: Postgres ids can commit out of order across transactions, and a
+    later-committed lower id would otherwise be missed for good. The set is
+    bounded by the access token lifetime, so it stays small.
+    """
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        if prune:
+            conn.execute(delete(RevokedToken).where(RevokedToken.expiresAt < now))
+        rows = conn.execute(
+            select(RevokedToken.jti, RevokedToken.expiresAt).where(RevokedToken.expiresAt > now)
+        ).all()
+    denylist.extend(
+        (row.jti, row.expiresAt.replace(tzinfo=timezone.utc).timestamp()) for row in rows
+    )
+
+
+async def sync_denylist(engine, interval: float = DENYLIST_SYNC_INTERVAL):
+    """
+    Background task pulling revocations made by other workers.
+
+    One indexed range read every few seconds per worker replaces a denylist
+    query on every request.
+    """
+    cycles = 0
+    while True:
+        prune = cycles % DENYLIST_PRUNE_EVERY == 0
+        try:
+            await run_in_threadpool(_load_revoked, engine, prune)
+        except Exception:
+            logger.exception("Denylist sync failed")
+        if prune:
+            denylist.prune()
+        cycles += 1
+        await asyncio.sleep(interval)
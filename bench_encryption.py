@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Client field encryption benchmark
+
+Times GET /api/clients/ for one user with N clients, once with email,
+phone and address encrypted and once with the same rows stored in
+plaintext, plus a lookup by email through the blind index against
+decrypting every row and comparing. Runs against a throwaway SQLite
+database.
+
+    python bench_encryption.py [--clients 2000] [--repeat 20]
+"""
+import argparse
+import base64
+import os
+import secrets
+import statistics
+import tempfile
+import time
+
+
+def timed(fn, repeat: int) -> float:
+    """Median wall time of ``fn`` in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DOCUMENT_STORAGE_DIR"] = os.path.join(workdir, "storage")
+    # Throwaway keys for the throwaway database
+    os.environ.setdefault("FIELD_ENCRYPTION_KEYS", base64.urlsafe_b64encode(os.urandom(32)).decode())
+    os.environ.setdefault("BLIND_INDEX_KEY", secrets.token_urlsafe(32))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert, select, text
+
+    from app import crypto, database
+    from app.main import app
+    from app.models import Client
+
+    with TestClient(app) as client:
+        user = client.post("/auth/register", json={
+            "email": "bench@example.com", "password": "Bench1234!", "name": "Bench"
+        }).json()
+        headers = {"Authorization": f"Bearer {user['access_token']}"}
+        rows = [
+            crypto.with_blind_indexes({
+                "userId": user["user"]["id"],
+                "name": f"Müvekkil {i}",
+                "email": f"muvekkil{i}@example.com",
+                "phone": f"0532 {i:07d}",
+                "address": f"Bağdat Caddesi No: {i}, Kadıköy, İstanbul",
+            })
+            for i in range(args.clients)
+        ]
+        target = f"muvekkil{args.clients // 2}@example.com"
+        db = database.SessionLocal()
+        try:
+            start = time.perf_counter()
+            db.execute(insert(Client), rows)
+            db.commit()
+            print(f"insert {args.clients} clients:     {(time.perf_counter() - start) * 1000:>8.1f} ms")
+
+            def list_clients():
+                assert len(client.get("/api/clients/", headers=headers).json()) == args.clients
+
+            def seek():
+                assert len(client.get("/api/clients/", params={"email": target}, headers=headers).json()) == 1
+
+            def scan():
+                emails = db.execute(select(Client.email).where(Client.userId == user["user"]["id"])).scalars()
+                assert target in emails
+
+            encrypted = timed(list_clients, args.repeat)
+            print(f"list, encrypted:          {encrypted:>8.1f} ms")
+            print(f"lookup, blind index:      {timed(seek, args.repeat):>8.1f} ms")
+            print(f"lookup, decrypt and scan: {timed(scan, args.repeat):>8.1f} ms")
+
+            # Plaintext values pass through EncryptedString unchanged
+            db.execute(
+                text('UPDATE "Client" SET email = :email, phone = :phone, address = :address WHERE id = :id'),
+                [
+                    {"id": row.id, "email": row.email, "phone": row.phone, "address": row.address}
+                    for row in db.execute(select(Client.id, Client.email, Client.phone, Client.address))
+                ],
+            )
+            db.commit()
+            plaintext = timed(list_clients, args.repeat)
+            print(f"list, plaintext:          {plaintext:>8.1f} ms")
+            print(f"encryption overhead:      {encrypted - plaintext:>8.1f} ms "
+                  f"({(encrypted - plaintext) * 1000 / args.clients:.1f} µs per client)")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
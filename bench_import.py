@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Case list import benchmark
+
+Imports a generated UYAP-style CSV of N rows (one case and hearing per
+row, a client for every five rows) through the import job, then imports
+it again to time the duplicate checks alone. Runs against a throwaway
+SQLite database.
+
+    python bench_import.py [--rows 100000]
+"""
+import argparse
+import base64
+import os
+import resource
+import secrets
+import tempfile
+import time
+
+
+def case_list(rows: int) -> bytes:
+    lines = ["Müvekkil;E-posta;Telefon;Esas No;Dava Türü;Mahkeme;Durum;Duruşma Tarihi"]
+    for i in range(rows):
+        lines.append(
+            f"Müvekkil Şahin {i // 5};muvekkil{i // 5}@example.com;0532 {i // 5:07d};{2000 + i % 25}/{i};"
+            f"Alacak;İstanbul {i % 40 + 1}. Asliye Hukuk;{'Kapandı' if i % 7 == 0 else 'Açık'};"
+            f"{i % 28 + 1:02d}.{i % 12 + 1:02d}.2026 10:00"
+        )
+    return ("\n".join(lines) + "\n").encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DOCUMENT_STORAGE_DIR"] = os.path.join(workdir, "storage")
+    # Throwaway keys for the throwaway database
+    os.environ.setdefault("FIELD_ENCRYPTION_KEYS", base64.urlsafe_b64encode(os.urandom(32)).decode())
+    os.environ.setdefault("BLIND_INDEX_KEY", secrets.token_urlsafe(32))
+    os.environ["IMPORT_MAX_BYTES"] = str(1 << 30)
+
+    from fastapi.testclient import TestClient
+
+    from app import database
+    from app.jobs import Worker
+    from app.main import app
+
+    content = case_list(args.rows)
+    print(f"file:                {len(content) / 1e6:>8.1f} MB")
+    with TestClient(app) as client:
+        user = client.post("/auth/register", json={
+            "email": "bench@example.com", "password": "Bench1234!", "name": "Bench"
+        }).json()
+        headers = {"Authorization": f"Bearer {user['access_token']}"}
+        for label in ("import", "re-import"):
+            job = client.post("/api/imports/?filename=uyap.csv", content=content, headers=headers).json()
+            start = time.perf_counter()
+            Worker(database.SessionLocal).run_once()
+            elapsed = time.perf_counter() - start
+            result = client.get(f"/api/jobs/{job['id']}", headers=headers).json()["result"]
+            print(f"{label + ':':<20} {elapsed:>8.1f} s  ({args.rows / elapsed:,.0f} rows/s) "
+                  f"cases={result['cases']} clients={result['clients']} duplicates={result['duplicates']}")
+    print(f"peak RSS:            {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Startup profiling
+
+Prints the slowest imports of ``app.main`` (from ``python -X importtime``)
+and the wall time from launching uvicorn to the first answered request.
+
+    python profile_startup.py [--top 20] [--port 8765]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+
+def import_times():
+    """Exclusive import time in microseconds, summed per top-level package"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    totals = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_time)
+    return totals
+
+
+def time_to_first_request(port: int, timeout: float = 30.0) -> float:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/live", timeout=1):
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PROFILE_PORT", 8765)))
+    args = parser.parse_args()
+
+    totals = import_times()
+    print(f"{'package':<30}{'self ms':>15}")
+    for name, micros in sorted(totals.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"{name:<30}{micros / 1000:>15.1f}")
+    print(f"{'total':<30}{sum(totals.values()) / 1000:>15.1f}")
+
+    print(f"\ntime to first request: {time_to_first_request(args.port) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
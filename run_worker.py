@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Background job worker
+
+Runs queued jobs (app.jobs) in a pool of processes next to the API
+server. Start as many workers as needed; they share the queue.
+
+    python run_worker.py [--processes 2]
+"""
+import argparse
+import logging
+
+from app.crypto import check_keys
+from app.database import Base, SessionLocal, engine
+from app.jobs import JOB_WORKER_PROCESSES, Worker
+from app.migrations import check_schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, default=JOB_WORKER_PROCESSES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    check_keys()
+    check_schema(engine, Base.metadata)
+    Worker(SessionLocal, processes=args.processes).run()
+
+
+if __name__ == "__main__":
+    main()
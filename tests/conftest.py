@@ -1,12 +1,21 @@
 """Test configuration and fixtures"""
+import os
+
+# Set before the app is imported; the server refuses to start without keys
+os.environ.setdefault("FIELD_ENCRYPTION_KEYS", "Y7LOuToSBij3gTIDswVd7bNAjOb_-vYI2nVBbY28dQU=")
+os.environ.setdefault("BLIND_INDEX_KEY", "test-blind-index-key")
+
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
 from app.main import app
 from app.db import Base, get_db
 from app.auth import get_password_hash
-import os
+from app import database
+import uuid
 
 # Test database URL
 TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -38,6 +47,20 @@ def client():
     # Drop tables after tests
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture
+def count_statements():
+    """``with count_statements() as statements:`` collects the SQL the app runs inside the block"""
+    @contextmanager
+    def counting():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(database.engine, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(database.engine, "before_cursor_execute", listener)
+    return counting
+
 @pytest.fixture
 def test_user():
     """Create test user data"""
@@ -58,3 +81,39 @@ def auth_headers(client, test_user):
     response = client.post("/auth/register", json=test_user)
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def make_user_headers(client):
+    """Factory registering a fresh user and returning its authentication headers"""
+    def make():
+        user_data = {
+            "email": f"user-{uuid.uuid4().hex[:12]}@example.com",
+            "password": "Test1234!",
+            "name": "Test User"
+        }
+        response = client.post("/auth/register", json=user_data)
+        token = response.json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return make
+
+@pytest.fixture
+def user_headers(make_user_headers):
+    """Authentication headers for a fresh user"""
+    return make_user_headers()
+
+@pytest.fixture
+def admin_headers(client):
+    """Authentication headers for a fresh user with the admin role"""
+    response = client.post("/auth/register", json={
+        "email": f"admin-{uuid.uuid4().hex[:12]}@example.com",
+        "password": "Test1234!",
+        "name": "Admin"
+    }).json()
+    # The routers use app.database's session, not the overridden app.db one
+    db = database.SessionLocal()
+    try:
+        db.execute(text('UPDATE "User" SET role = \'admin\' WHERE id = :id'), {"id": response["user"]["id"]})
+        db.commit()
+    finally:
+        db.close()
+    return {"Authorization": f"Bearer {response['access_token']}"}
@@ -0,0 +1,75 @@
+"""Test the precomputed daily agenda"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete
+
+from app import database
+from app.agenda import day_start, local_today, precompute
+from app.models import Agenda
+
+def at(day_offset, hour, minute=0):
+    """Stored (naive UTC) time of ``hour`` in Turkey, ``day_offset`` days from today there"""
+    return (day_start(local_today() + timedelta(days=day_offset)) + timedelta(hours=hour, minutes=minute)).isoformat()
+
+def setup_case(client, headers):
+    client_id = client.post("/api/clients/", json={"name": "Gündem Müvekkil"}, headers=headers).json()["id"]
+    case_id = client.post("/api/cases/", json={
+        "title": "Kira tespit", "clientId": client_id, "caseNumber": "2026/3"
+    }, headers=headers).json()["id"]
+    events = [
+        client.post("/api/events/", json={"title": title, "caseId": case_id, "eventDate": when}, headers=headers).json()["id"]
+        for title, when in (("Duruşma", at(0, 10)), ("Keşif", at(2, 9)), ("Bilirkişi", at(10, 9)))
+    ]
+    return case_id, events
+
+def test_agenda_follows_changes(client, user_headers, count_statements):
+    """Test the agenda is served from its row and patched after events, cases or deletions change"""
+    case_id, (hearing, visit, later) = setup_case(client, user_headers)
+    agenda = client.get("/api/agenda/today", headers=user_headers).json()
+    assert [e["id"] for e in agenda["today"]] == [hearing]
+    assert [e["id"] for e in agenda["week"]] == [visit]
+    assert agenda["today"][0]["caseTitle"] == "Kira tespit" and agenda["today"][0]["clientName"] == "Gündem Müvekkil"
+
+    with count_statements() as statements:
+        cached = client.get("/api/agenda/today", headers=user_headers).json()
+    assert cached == agenda
+    # The user for authentication, then the agenda row
+    assert len(statements) == 2
+
+    client.patch(f"/api/events/{later}", json={"eventDate": at(1, 14)}, headers=user_headers)
+    client.delete(f"/api/events/{visit}", headers=user_headers)
+    client.patch(f"/api/cases/{case_id}", json={"title": "Kira tespit ve tahliye"}, headers=user_headers)
+    agenda = client.get("/api/agenda/today", headers=user_headers).json()
+    assert [e["id"] for e in agenda["week"]] == [later]
+    assert {e["caseTitle"] for e in agenda["today"] + agenda["week"]} == {"Kira tespit ve tahliye"}
+
+def test_nightly_precompute(client, make_user_headers, count_statements):
+    """Test precomputed rows are served as they are"""
+    headers = make_user_headers()
+    case_id, (hearing, visit, later) = setup_case(client, headers)
+    db = database.SessionLocal()
+    try:
+        db.execute(delete(Agenda))
+        db.commit()
+        assert precompute(db, local_today()) >= 1
+    finally:
+        db.close()
+    with count_statements() as statements:
+        agenda = client.get("/api/agenda/today", headers=headers).json()
+    assert len(statements) == 2
+    assert [e["id"] for e in agenda["today"] + agenda["week"]] == [hearing, visit]
+    assert client.get("/api/agenda/today", headers=make_user_headers()).json()["today"] == []
+
+def test_days_are_turkish_days(client, make_user_headers):
+    """Test the agenda follows the Turkish calendar day, not the UTC one"""
+    assert day_start(date(2026, 10, 20)) == datetime(2026, 10, 19, 21, 0)
+    headers = make_user_headers()
+    client_id = client.post("/api/clients/", json={"name": "Gece Müvekkil"}, headers=headers).json()["id"]
+    case_id = client.post("/api/cases/", json={"title": "İcra", "clientId": client_id}, headers=headers).json()["id"]
+    early, late = [
+        client.post("/api/events/", json={"title": title, "caseId": case_id, "eventDate": when}, headers=headers).json()["id"]
+        for title, when in (("Haciz", at(0, 0, 30)), ("Tebligat", at(0, 23, 30)))
+    ]
+    agenda = client.get("/api/agenda/today", headers=headers).json()
+    assert agenda["date"] == local_today().isoformat()
+    assert [e["id"] for e in agenda["today"]] == [early, late]
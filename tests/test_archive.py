@@ -0,0 +1,150 @@
+"""Test event partitioning DDL and archival of closed cases"""
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, insert, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from app import database
+from app.archive import archive_cases, maintain_event_partitions
+from app.database import Base
+from app.models import Case, Deadline, Event, User
+
+# A scratch database the partitioning tests may drop and recreate every table in
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+def test_event_table_is_partitioned_on_postgres():
+    """Test Event is partitioned by month and nothing constrains its id alone"""
+    event_ddl = str(CreateTable(Event.__table__).compile(dialect=postgresql.dialect()))
+    deadline_ddl = str(CreateTable(Deadline.__table__).compile(dialect=postgresql.dialect()))
+    assert 'PARTITION BY RANGE ("eventDate")' in event_ddl
+    assert "PRIMARY KEY" not in event_ddl
+    assert 'REFERENCES "Event"' not in deadline_ddl
+    assert 'REFERENCES "Case"' in deadline_ddl
+    # What id lookups use in place of the primary key
+    assert any(list(index.columns.keys()) == ["id"] for index in Event.__table__.indexes)
+
+@pytest.fixture
+def postgres():
+    engine = create_engine(TEST_POSTGRES_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    try:
+        yield engine
+    finally:
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+def scans(conn, query):
+    """``(node type, relation)`` of every scan in the plan of ``query``"""
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+    pending, found = [plan[0]["Plan"]], []
+    while pending:
+        node = pending.pop()
+        if "Relation Name" in node:
+            found.append((node["Node Type"], node["Relation Name"]))
+        pending.extend(node.get("Plans", []))
+    return found
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="set TEST_POSTGRES_URL to a scratch Postgres database")
+def test_partitioned_event_lookups_on_postgres(postgres):
+    """Test ids stay unique and indexed in every partition, and date ranges prune partitions"""
+    maintain_event_partitions(postgres, date(2026, 10, 1))
+    with postgres.begin() as conn:
+        user_id = conn.execute(
+            insert(User).values(email="bolum@example.com", passwordHash="x").returning(User.id)
+        ).scalar()
+        case_id = conn.execute(insert(Case).values(userId=user_id, title="Bölüm").returning(Case.id)).scalar()
+        ids = conn.execute(insert(Event).returning(Event.id, sort_by_parameter_order=True), [
+            {"caseId": case_id, "title": "Duruşma", "eventDate": datetime(2026, month, 10, 10)}
+            for month in (10, 11, 12)
+        ] + [{"caseId": case_id, "title": "Tarihsiz", "eventDate": None}]).scalars().all()
+    assert len(set(ids)) == 4
+
+    with postgres.connect() as conn:
+        assert {fk["referred_table"] for fk in inspect(conn).get_foreign_keys("Deadline")} == {"Case", "User"}
+        assert [fk["referred_table"] for fk in inspect(conn).get_foreign_keys("Event")] == ["Case"]
+        # Tiny tables are cheapest to scan; any scan left is a partition lacking the id index
+        conn.execute(text("SET enable_seqscan = off"))
+        by_id = scans(conn, f'SELECT * FROM "Event" WHERE id = {ids[1]}')
+        assert by_id and not [scan for scan in by_id if scan[0] == "Seq Scan"], by_id
+        november = scans(conn, """SELECT id FROM "Event" WHERE "eventDate" >= '2026-11-01' AND "eventDate" < '2026-12-01'""")
+        assert {relation for _, relation in november} == {"Event_2026_11"}
+
+def touch(case_id, when):
+    db = database.SessionLocal()
+    try:
+        db.execute(text('UPDATE "Case" SET "updatedAt" = :when WHERE id = :id'), {"when": when, "id": case_id})
+        db.commit()
+    finally:
+        db.close()
+
+def create_case(client, headers, client_id, status, touched=None):
+    case = client.post(
+        "/api/cases/", json={"title": f"Dava {status}", "clientId": client_id, "status": status}, headers=headers
+    ).json()
+    for day in (1, 2):
+        client.post("/api/events/", json={
+            "title": "Duruşma", "caseId": case["id"], "eventDate": f"2016-03-0{day}T10:00:00"
+        }, headers=headers)
+    if touched:
+        touch(case["id"], touched)
+    return case["id"]
+
+def run_archive():
+    db = database.SessionLocal()
+    try:
+        return archive_cases(db, datetime(2020, 1, 1), batch_size=1)
+    finally:
+        db.close()
+
+def test_archive_and_restore(client, user_headers):
+    """Test old closed cases move to the archive with their events and can come back"""
+    client_id = client.post("/api/clients/", json={"name": "Arşiv Müvekkil"}, headers=user_headers).json()["id"]
+    old = create_case(client, user_headers, client_id, "closed", datetime(2017, 5, 1))
+    recent = create_case(client, user_headers, client_id, "closed")
+    active = create_case(client, user_headers, client_id, "active", datetime(2017, 5, 1))
+    billed = create_case(client, user_headers, client_id, "closed")
+    client.post("/api/time-entries/", json={
+        "caseId": billed, "description": "Dilekçe", "workDate": "2017-04-01", "minutes": 60, "hourlyRate": 1000
+    }, headers=user_headers)
+    touch(billed, datetime(2017, 5, 1))
+    version = client.get("/api/sync?since=0", headers=user_headers).json()["version"]
+
+    assert run_archive() >= 1
+    cases = [c["id"] for c in client.get("/api/cases/", headers=user_headers).json()]
+    assert old not in cases and {recent, active, billed} <= set(cases)
+    assert all(e["caseId"] != old for e in client.get("/api/events/", headers=user_headers).json())
+    deleted = client.get(f"/api/sync?since={version}", headers=user_headers).json()["deleted"]
+    assert {"type": "case", "id": old} in [{"type": d["type"], "id": d["id"]} for d in deleted]
+    assert len([d for d in deleted if d["type"] == "event"]) == 2
+
+    archived = client.get("/api/archive/cases", headers=user_headers).json()
+    assert [c["id"] for c in archived] == [old]
+    detail = client.get(f"/api/archive/cases/{old}", headers=user_headers).json()
+    assert len(detail["events"]) == 2 and detail["status"] == "closed"
+    assert client.delete(f"/api/cases/{recent}", headers=user_headers).status_code == 204
+    assert client.delete(f"/api/cases/{active}", headers=user_headers).status_code == 204
+    assert client.delete(f"/api/clients/{client_id}", headers=user_headers).status_code == 409
+
+    version = client.get(f"/api/sync?since={version}", headers=user_headers).json()["version"]
+    response = client.post(f"/api/archive/cases/{old}/restore", headers=user_headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == old
+    changes = client.get(f"/api/sync?since={version}", headers=user_headers).json()
+    assert [c["id"] for c in changes["cases"]] == [old]
+    assert len(changes["events"]) == 2
+    assert client.get("/api/archive/cases", headers=user_headers).json() == []
+    assert client.post(f"/api/archive/cases/{old}/restore", headers=user_headers).status_code == 404
+
+def test_archived_cases_are_private(client, user_headers, make_user_headers):
+    """Test another user can neither read nor restore an archived case"""
+    client_id = client.post("/api/clients/", json={"name": "Gizli"}, headers=user_headers).json()["id"]
+    case_id = create_case(client, user_headers, client_id, "closed", datetime(2015, 1, 1))
+    run_archive()
+    other = make_user_headers()
+    assert client.get(f"/api/archive/cases/{case_id}", headers=other).status_code == 404
+    assert client.post(f"/api/archive/cases/{case_id}/restore", headers=other).status_code == 404
+    assert client.get(f"/api/archive/cases/{case_id}", headers=user_headers).status_code == 200
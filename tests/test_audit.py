@@ -0,0 +1,56 @@
+"""Test the audit log"""
+import asyncio
+
+from sqlalchemy import select
+
+from app import database
+from app.audit import AuditLogger, audit_log
+from app.models import AuditLog
+
+def test_requests_are_audited(client, user_headers):
+    """Test reads and writes are recorded with user, action and entity"""
+    created = client.post("/api/clients/", json={"name": "Deniz Koç"}, headers=user_headers).json()
+    client.get(f"/api/clients/{created['id']}", headers=user_headers)
+    client.get("/api/clients/", headers={"Authorization": "Bearer invalid"})
+    client.portal.call(audit_log.flush, database.engine)
+
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(select(AuditLog).where(AuditLog.route.like("/api/clients%"))).scalars().all()
+    finally:
+        db.close()
+    read = [r for r in rows if r.action == "read" and r.entityId == str(created["id"])]
+    assert len(read) == 1
+    assert read[0].userId == created["userId"]
+    assert read[0].entityType == "clients"
+    assert read[0].status == 200
+    assert any(r.action == "create" and r.userId == created["userId"] for r in rows)
+    assert any(r.status == 401 and r.userId is None for r in rows)
+
+def test_creates_record_the_new_id(client, user_headers):
+    """Test a create is recorded with the id of the entity it created"""
+    created = client.post("/api/clients/", json={"name": "Ece Aydın"}, headers=user_headers).json()
+    client.post("/api/clients/", json={}, headers=user_headers)
+    client.portal.call(audit_log.flush, database.engine)
+
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(
+            select(AuditLog).where(AuditLog.route == "/api/clients/", AuditLog.action == "create")
+        ).scalars().all()
+    finally:
+        db.close()
+    assert str(created["id"]) in [r.entityId for r in rows if r.status == 200]
+    assert all(r.entityId is not None for r in rows if r.status == 200)
+    assert [r.entityId for r in rows if r.status == 422] == [None]
+
+def test_drop_overflow_policy():
+    """Test a full queue drops records instead of blocking under the drop policy"""
+    async def fill():
+        logger = AuditLogger(maxsize=2, overflow="drop")
+        logger.start()
+        for i in range(5):
+            await logger.record({"id": i})
+        return logger.queue.qsize()
+
+    assert asyncio.run(fill()) == 2
@@ -0,0 +1,113 @@
+"""Test batched read requests"""
+from fastapi import APIRouter, Depends, Security
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import database
+from app.audit import audit_log
+from app.auth import get_current_user
+from app.main import app
+from app.models import AuditLog
+from app.pubsub import broker
+
+def setup_case(client, headers):
+    client_id = client.post("/api/clients/", json={"name": "Toplu Müvekkil"}, headers=headers).json()["id"]
+    return client.post("/api/cases/", json={
+        "title": "Alacak davası", "clientId": client_id, "description": "Ayrıntılar"
+    }, headers=headers).json()["id"]
+
+REQUESTS = [
+    {"id": "stats", "path": "/api/stats"},
+    {"id": "cases", "path": "/api/cases/?fields=title"},
+    {"id": "agenda", "path": "/api/agenda/today"},
+    {"id": "case", "path": "/api/cases/{case_id}"},
+    {"id": "missing", "path": "/api/cases/999999"},
+    {"id": "unknown", "path": "/api/nowhere"},
+    {"id": "post-only", "path": "/api/batch/"},
+]
+
+def batch_body(case_id, concurrent=False):
+    requests = [dict(r, path=r["path"].format(case_id=case_id)) for r in REQUESTS]
+    return {"requests": requests, "concurrent": concurrent}
+
+def test_batch_shares_the_principal(client, user_headers, count_statements):
+    """Test sub-requests answer like their own requests while the user is looked up once"""
+    case_id = setup_case(client, user_headers)
+    with count_statements() as statements:
+        response = client.post("/api/batch/", json=batch_body(case_id), headers=user_headers)
+    assert response.status_code == 200
+    responses = {r["id"]: r for r in response.json()["responses"]}
+    assert list(responses) == [r["id"] for r in REQUESTS]
+
+    assert responses["stats"] == {
+        "id": "stats", "status": 200, "body": client.get("/api/stats", headers=user_headers).json()
+    }
+    assert responses["cases"]["body"] == [{"id": case_id, "title": "Alacak davası"}]
+    assert responses["agenda"]["status"] == 200 and responses["agenda"]["body"]["today"] == []
+    assert responses["case"]["body"]["description"] == "Ayrıntılar"
+    assert responses["missing"]["status"] == 404
+    assert responses["unknown"]["status"] == 404
+    assert responses["post-only"]["status"] == 405
+    # get_current_user's lookup, once for the whole batch
+    assert len([s for s in statements if '"User".id AS "User_id"' in s]) == 1
+
+def test_scoped_dependencies_use_the_batch_principal(client, user_headers, count_statements, monkeypatch):
+    """Test a route taking the user through Security(..., scopes=...) doesn't look it up again"""
+    scoped = APIRouter()
+
+    @scoped.get("/api/scoped")
+    async def read_scoped(
+        current_user=Security(get_current_user, scopes=["cases:read"]),
+        db: Session = Depends(database.get_db)
+    ):
+        return {"userId": current_user.id}
+
+    monkeypatch.setattr(app.router, "routes", [*app.router.routes, *scoped.routes])
+    body = {"requests": [{"id": "scoped", "path": "/api/scoped"}, {"id": "stats", "path": "/api/stats"}]}
+    with count_statements() as statements:
+        response = client.post("/api/batch/", json=body, headers=user_headers)
+    scoped_response = response.json()["responses"][0]
+    assert scoped_response["status"] == 200, scoped_response
+    assert len([s for s in statements if '"User".id AS "User_id"' in s]) == 1
+
+def test_streams_are_refused_before_they_run(client, user_headers):
+    """Test a batched SSE or PDF route is refused without subscribing or touching the shared session"""
+    case_id = setup_case(client, user_headers)
+    subscriptions = sum(len(s) for s in broker._subscriptions.values())
+    body = {"requests": [
+        {"id": "stream", "path": "/api/stream"},
+        {"id": "report", "path": f"/api/reports/cases/{case_id}"},
+        {"id": "case", "path": f"/api/cases/{case_id}"},
+    ]}
+    for _ in range(3):
+        responses = client.post("/api/batch/", json=body, headers=user_headers).json()["responses"]
+        assert [r["status"] for r in responses] == [400, 400, 200]
+    assert sum(len(s) for s in broker._subscriptions.values()) == subscriptions
+    assert client.get("/api/jobs/", headers=user_headers).json() == []
+
+def test_concurrent_batch(client, user_headers):
+    """Test a concurrent batch returns what a sequential one does"""
+    case_id = setup_case(client, user_headers)
+    sequential = client.post("/api/batch/", json=batch_body(case_id), headers=user_headers).json()
+    concurrent = client.post("/api/batch/", json=batch_body(case_id, True), headers=user_headers).json()
+    for item in sequential["responses"] + concurrent["responses"]:
+        if item["id"] == "agenda":
+            item["body"].pop("computedAt")
+    assert concurrent == sequential
+
+def test_batch_validation_and_audit(client, user_headers):
+    """Test batches are validated and every sub-request is audited"""
+    assert client.post("/api/batch/", json={"requests": []}, headers=user_headers).status_code == 422
+    assert client.post("/api/batch/", json={"requests": [{"path": "/auth/me"}]}, headers=user_headers).status_code == 422
+    assert client.post("/api/batch/", json={"requests": [{"path": "/api/stats"}]}).status_code == 401
+
+    case_id = setup_case(client, user_headers)
+    client.post("/api/batch/", json={"requests": [{"path": f"/api/cases/{case_id}"}]}, headers=user_headers)
+    client.portal.call(audit_log.flush, database.engine)
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(select(AuditLog).where(AuditLog.entityId == str(case_id))).scalars().all()
+    finally:
+        db.close()
+    reads = [r for r in rows if r.action == "read" and r.route == "/api/cases/{case_id}"]
+    assert len(reads) == 1 and reads[0].status == 200 and reads[0].userId is not None
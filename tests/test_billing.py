@@ -0,0 +1,103 @@
+"""Test time tracking and invoicing"""
+from datetime import date
+
+from app import database
+from app.models import Invoice
+
+def create_case(client, headers, name="Selin Arslan"):
+    client_id = client.post("/api/clients/", json={"name": name}, headers=headers).json()["id"]
+    case_id = client.post(
+        "/api/cases/", json={"title": "Kira", "clientId": client_id}, headers=headers
+    ).json()["id"]
+    return client_id, case_id
+
+def log_time(client, headers, case_id, minutes, work_date="2026-09-15", rate=1200):
+    return client.post("/api/time-entries/", json={
+        "caseId": case_id, "workDate": work_date, "minutes": minutes, "hourlyRate": rate
+    }, headers=headers)
+
+def test_rollups_follow_time_entry_changes(client, user_headers):
+    """Test summary totals track creates, edits and deletes"""
+    client_id, case_id = create_case(client, user_headers)
+    first = log_time(client, user_headers, case_id, 90).json()
+    assert first["amount"] == 1800.0
+    second = log_time(client, user_headers, case_id, 30).json()
+
+    client.patch(f"/api/time-entries/{first['id']}", json={"minutes": 60}, headers=user_headers)
+    client.delete(f"/api/time-entries/{second['id']}", headers=user_headers)
+
+    summary = client.get("/api/time-entries/summary", headers=user_headers).json()
+    assert summary["cases"] == [{
+        "caseId": case_id, "clientId": client_id,
+        "unbilledMinutes": 60, "unbilledAmount": 1200.0, "billedMinutes": 0, "billedAmount": 0.0
+    }]
+    assert summary["totals"]["unbilledMinutes"] == 60
+
+def test_time_entry_requires_own_case(client, user_headers, make_user_headers):
+    """Test time can't be logged against another user's case"""
+    _, case_id = create_case(client, make_user_headers())
+    assert log_time(client, user_headers, case_id, 60).status_code == 404
+
+def test_generate_month_invoices_each_client(client, user_headers):
+    """Test monthly generation bills every client's unbilled time once"""
+    first_client, first_case = create_case(client, user_headers, "Ali Koç")
+    second_client, second_case = create_case(client, user_headers, "Ece Kurt")
+    log_time(client, user_headers, first_case, 60)
+    log_time(client, user_headers, first_case, 30)
+    log_time(client, user_headers, second_case, 120)
+    october = log_time(client, user_headers, second_case, 60, work_date="2026-10-01").json()
+
+    response = client.post("/api/invoices/generate", json={"year": 2026, "month": 9}, headers=user_headers)
+    assert response.status_code == 200
+    invoices = {i["clientId"]: i for i in response.json()}
+    assert invoices[first_client]["amount"] == 1800.0
+    assert invoices[first_client]["tax"] == 360.0
+    assert invoices[first_client]["total"] == 2160.0
+    assert invoices[second_client]["minutes"] == 120
+
+    again = client.post("/api/invoices/generate", json={"year": 2026, "month": 9}, headers=user_headers)
+    assert again.json() == []
+
+    totals = client.get("/api/time-entries/summary", headers=user_headers).json()["totals"]
+    assert totals["billedMinutes"] == 210
+    assert totals["unbilledMinutes"] == 60
+
+    entries = client.get(
+        f"/api/invoices/{invoices[first_client]['id']}/time-entries", headers=user_headers
+    ).json()
+    assert len(entries) == 2
+    assert client.patch(
+        f"/api/time-entries/{entries[0]['id']}", json={"minutes": 10}, headers=user_headers
+    ).status_code == 409
+    assert client.delete(f"/api/time-entries/{october['id']}", headers=user_headers).status_code == 204
+
+def test_amounts_round_half_up_to_kurus(client, user_headers):
+    """Test amounts are exact decimals, not floating point approximations"""
+    _, case_id = create_case(client, user_headers)
+    entry = log_time(client, user_headers, case_id, 30, rate=1.05).json()
+    assert entry["amount"] == 0.53
+    assert log_time(client, user_headers, case_id, 30, rate=1.055).status_code == 422
+
+    invoice = client.post("/api/invoices/generate", json={"year": 2026, "month": 9}, headers=user_headers).json()[0]
+    assert (invoice["amount"], invoice["tax"], invoice["total"]) == (0.53, 0.11, 0.64)
+
+def test_invoice_numbers_run_per_year(client, make_user_headers):
+    """Test numbering starts over each year and continues after existing invoices"""
+    headers = make_user_headers()
+    client_id, case_id = create_case(client, headers)
+    for work_date in ("2025-12-10", "2026-01-10", "2026-02-10"):
+        log_time(client, headers, case_id, 60, work_date=work_date)
+    user_id = client.get(f"/api/clients/{client_id}", headers=headers).json()["userId"]
+    db = database.SessionLocal()
+    try:
+        db.add(Invoice(userId=user_id, clientId=client_id, number="2025-00007",
+                       periodStart=date(2025, 1, 1), periodEnd=date(2025, 1, 31)))
+        db.commit()
+    finally:
+        db.close()
+
+    numbers = [
+        client.post("/api/invoices/generate", json={"year": year, "month": month}, headers=headers).json()[0]["number"]
+        for year, month in ((2025, 12), (2026, 1), (2026, 2))
+    ]
+    assert numbers == ["2025-00008", "2026-00001", "2026-00002"]
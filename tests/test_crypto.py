@@ -0,0 +1,90 @@
+"""Test field-level encryption of client data and blind index lookups"""
+import pytest
+from cryptography.fernet import Fernet, MultiFernet
+from sqlalchemy import text
+
+from app import crypto, database
+from app.crypto import blind_index, decrypt, encrypt
+
+def test_blind_index_normalizes():
+    """Test equivalent spellings of an email or phone share a blind index"""
+    assert blind_index("email", " Ayse@Example.COM ") == blind_index("email", "ayse@example.com")
+    assert blind_index("phone", "0532 123 45 67") == blind_index("phone", "+90 (532) 123-4567")
+    assert blind_index("phone", "05321234567") != blind_index("email", "05321234567")
+    assert blind_index("phone", "yok") is None
+
+def test_key_rotation(monkeypatch):
+    """Test values encrypted under an old key still decrypt after rotation"""
+    old, new = Fernet.generate_key(), Fernet.generate_key()
+    monkeypatch.setattr(crypto, "fernet", lambda: MultiFernet([Fernet(old)]))
+    token = encrypt("ayse@example.com")
+    monkeypatch.setattr(crypto, "fernet", lambda: MultiFernet([Fernet(new), Fernet(old)]))
+    assert decrypt(token) == "ayse@example.com"
+    assert Fernet(new).decrypt(encrypt("x").encode()) == b"x"
+    assert decrypt("legacy plaintext") == "legacy plaintext"
+
+def test_keys_are_required(monkeypatch):
+    """Test missing keys are an error rather than derived from the JWT secret"""
+    monkeypatch.setattr(crypto, "FIELD_ENCRYPTION_KEYS", " , ")
+    with pytest.raises(crypto.KeysMissing, match="FIELD_ENCRYPTION_KEYS"):
+        crypto.check_keys()
+    # The old fallback can still be recovered to decrypt what it encrypted
+    legacy = crypto.legacy_key("your-secret-key-change-this")
+    assert Fernet(legacy).decrypt(Fernet(legacy).encrypt(b"x")) == b"x"
+
+def test_client_fields_encrypted_at_rest(client, user_headers):
+    """Test email, phone and address are stored encrypted but served in clear"""
+    created = client.post("/api/clients/", json={
+        "name": "Ayşe Demir", "email": "ayse@example.com", "phone": "0532 123 45 67", "address": "Kadıköy"
+    }, headers=user_headers).json()
+    assert created["email"] == "ayse@example.com"
+
+    db = database.SessionLocal()
+    try:
+        row = db.execute(
+            text('SELECT email, phone, address FROM "Client" WHERE id = :id'), {"id": created["id"]}
+        ).one()
+    finally:
+        db.close()
+    assert all(value.startswith(crypto.TOKEN_PREFIX) for value in row)
+    assert client.get(f"/api/clients/{created['id']}", headers=user_headers).json()["address"] == "Kadıköy"
+
+def test_lookup_by_email_and_phone(client, user_headers, make_user_headers):
+    """Test exact lookups by email and phone, including after an update"""
+    ayse = client.post("/api/clients/", json={
+        "name": "Ayşe Demir", "email": "ayse@example.com", "phone": "0532 123 45 67"
+    }, headers=user_headers).json()
+    client.post("/api/clients/", json={"name": "Ali Veli", "email": "ali@example.com"}, headers=user_headers)
+    client.post("/api/clients/", json={"name": "Ayşe", "email": "ayse@example.com"}, headers=make_user_headers())
+
+    def lookup(**params):
+        response = client.get("/api/clients/", params=params, headers=user_headers)
+        assert response.status_code == 200
+        return [c["id"] for c in response.json()]
+
+    assert lookup(email="AYSE@example.com") == [ayse["id"]]
+    assert lookup(phone="+905321234567") == [ayse["id"]]
+    assert lookup(phone="-") == []
+
+    client.patch(f"/api/clients/{ayse['id']}", json={"email": "ayse.demir@example.com"}, headers=user_headers)
+    assert lookup(email="ayse@example.com") == []
+    assert lookup(email="ayse.demir@example.com") == [ayse["id"]]
+    assert len(lookup()) == 2
+
+def test_rewrap_encrypts_legacy_rows(client, user_headers):
+    """Test rewrap encrypts plaintext rows and fills in their blind indexes"""
+    created = client.post("/api/clients/", json={"name": "Eski Kayıt"}, headers=user_headers).json()
+    db = database.SessionLocal()
+    try:
+        db.execute(
+            text('UPDATE "Client" SET email = :email WHERE id = :id'),
+            {"email": "eski@example.com", "id": created["id"]}
+        )
+        db.commit()
+        assert crypto.rewrap(db, batch_size=1) >= 1
+        stored = db.execute(text('SELECT email FROM "Client" WHERE id = :id'), {"id": created["id"]}).scalar()
+    finally:
+        db.close()
+    assert stored.startswith(crypto.TOKEN_PREFIX)
+    found = client.get("/api/clients/", params={"email": "eski@example.com"}, headers=user_headers).json()
+    assert [c["id"] for c in found] == [created["id"]]
@@ -0,0 +1,114 @@
+"""Test deadline calculation"""
+from datetime import date
+
+import pytest
+
+from app.business_days import BusinessCalendar, builtin_holidays
+
+calendar = BusinessCalendar(builtin_holidays())
+
+def create_case(client, headers):
+    client_id = client.post("/api/clients/", json={"name": "Can Öztürk"}, headers=headers).json()["id"]
+    return client.post(
+        "/api/cases/", json={"title": "Tazminat", "clientId": client_id}, headers=headers
+    ).json()["id"]
+
+def test_business_days_skip_weekends_and_holidays():
+    """Test working days skip the weekend and Ramazan Bayramı"""
+    assert calendar.add_business_days(date(2025, 3, 28), 1) == date(2025, 4, 2)
+    assert calendar.add_business_days(date(2025, 4, 2), 3) == date(2025, 4, 7)
+    assert not calendar.is_business_day(date(2025, 10, 29))
+
+def test_calendar_periods_roll_forward():
+    """Test periods ending on a holiday or weekend run to the next working day"""
+    assert calendar.due_date(date(2025, 5, 5), 2, "weeks") == date(2025, 5, 20)
+    assert calendar.due_date(date(2025, 1, 31), 1, "months") == date(2025, 2, 28)
+    assert calendar.due_date(date(2025, 3, 3), 7, "days") == date(2025, 3, 10)
+
+def test_judicial_recess_extends_deadline():
+    """Test a period ending in the judicial recess runs until a week after it"""
+    assert calendar.due_date(date(2025, 7, 10), 2, "weeks") == date(2025, 7, 24)
+    assert calendar.due_date(date(2025, 7, 10), 2, "weeks", judicial_recess=True) == date(2025, 9, 8)
+
+def test_calendar_covers_years_with_known_bayrams():
+    """Test dates past the known religious holidays are refused until a year's bayrams are added"""
+    assert (calendar.start, calendar.end) == (date(2024, 1, 1), date(2027, 12, 31))
+    with pytest.raises(ValueError):
+        calendar.add_business_days(date(2028, 1, 10), 1)
+    with pytest.raises(IndexError):
+        calendar.add_business_days(date(2027, 12, 30), 5)
+
+    kurban = [(date(2028, 5, day), "Kurban Bayramı") for day in range(4, 8)]
+    ramazan = [(date(2028, 2, day), "Ramazan Bayramı") for day in range(26, 29)]
+    assert BusinessCalendar(builtin_holidays() + kurban).end == date(2027, 12, 31)
+    extended = BusinessCalendar(builtin_holidays() + kurban + ramazan)
+    assert extended.end == date(2028, 12, 31)
+    assert extended.add_business_days(date(2028, 2, 25), 1) == date(2028, 2, 29)
+
+def test_compute_endpoint(client, user_headers):
+    """Test computing a due date without saving it"""
+    response = client.post("/api/deadlines/compute", json={
+        "baseDate": "2025-03-28", "amount": 1, "unit": "business_days"
+    }, headers=user_headers)
+    assert response.status_code == 200
+    assert response.json()["dueDate"] == "2025-04-02"
+    outside = client.post("/api/deadlines/compute", json={
+        "baseDate": "2030-03-04", "amount": 2, "unit": "weeks"
+    }, headers=user_headers)
+    assert outside.status_code == 400
+
+def test_deadline_from_event_creates_calendar_event(client, user_headers):
+    """Test a deadline runs from its milestone event and lands on the calendar"""
+    case_id = create_case(client, user_headers)
+    notice = client.post("/api/events/", json={
+        "title": "Karar tebliği", "caseId": case_id, "eventDate": "2025-05-05T10:00:00"
+    }, headers=user_headers).json()
+
+    response = client.post("/api/deadlines/", json={
+        "title": "İstinaf süresi", "sourceEventId": notice["id"], "amount": 2, "unit": "weeks"
+    }, headers=user_headers)
+    assert response.status_code == 200
+    deadline = response.json()
+    assert deadline["caseId"] == case_id
+    assert deadline["dueDate"] == "2025-05-20"
+
+    events = {e["id"]: e for e in client.get("/api/events/", headers=user_headers).json()}
+    assert events[deadline["eventId"]]["eventType"] == "deadline"
+    assert events[deadline["eventId"]]["eventDate"].startswith("2025-05-20")
+
+def test_deadline_requires_owned_milestone(client, user_headers, make_user_headers):
+    """Test deadlines can't be attached to another user's case"""
+    case_id = create_case(client, make_user_headers())
+    response = client.post("/api/deadlines/", json={
+        "title": "Cevap süresi", "caseId": case_id, "baseDate": "2025-05-05", "amount": 2, "unit": "weeks"
+    }, headers=user_headers)
+    assert response.status_code == 404
+
+def test_holiday_change_recomputes_deadlines(client, user_headers, admin_headers):
+    """Test adding a holiday moves open deadlines and their events"""
+    case_id = create_case(client, user_headers)
+    deadline = client.post("/api/deadlines/", json={
+        "title": "Cevap süresi", "caseId": case_id, "baseDate": "2027-10-04", "amount": 2, "unit": "weeks"
+    }, headers=user_headers).json()
+    assert deadline["dueDate"] == "2027-10-18"
+
+    assert client.post("/api/deadlines/holidays", json={
+        "date": "2027-10-18", "name": "Test"
+    }, headers=user_headers).status_code == 403
+
+    response = client.post("/api/deadlines/holidays", json={
+        "date": "2027-10-18", "name": "Test"
+    }, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["recomputed"] >= 1
+
+    moved = client.get(f"/api/deadlines/?caseId={case_id}", headers=user_headers).json()
+    assert moved[0]["dueDate"] == "2027-10-19"
+    events = {e["id"]: e for e in client.get("/api/events/", headers=user_headers).json()}
+    assert events[deadline["eventId"]]["eventDate"].startswith("2027-10-19")
+    assert events[deadline["eventId"]]["version"] == 2
+
+    holiday_id = response.json()["holiday"]["id"]
+    client.delete(f"/api/deadlines/holidays/{holiday_id}", headers=admin_headers)
+    restored = client.get(f"/api/deadlines/?caseId={case_id}", headers=user_headers).json()
+    assert restored[0]["dueDate"] == "2027-10-18"
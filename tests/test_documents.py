@@ -0,0 +1,76 @@
+"""Test document uploads and downloads"""
+import os
+
+import pytest
+
+from app import storage
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    backend = storage.LocalStorage(root=str(tmp_path))
+    monkeypatch.setattr(storage, "_storage", backend)
+    return backend
+
+def create_case(client, headers):
+    client_id = client.post("/api/clients/", json={"name": "Burak Aydın"}, headers=headers).json()["id"]
+    return client.post(
+        "/api/cases/", json={"title": "İş davası", "clientId": client_id}, headers=headers
+    ).json()["id"]
+
+def upload(client, headers, case_id, body, filename="dilekce.pdf"):
+    return client.post(
+        f"/api/documents/?caseId={case_id}&filename={filename}",
+        content=body,
+        headers={**headers, "Content-Type": "application/pdf"}
+    )
+
+def test_upload_and_range_download(client, user_headers, local_storage):
+    """Test an uploaded file is served whole and in byte ranges"""
+    case_id = create_case(client, user_headers)
+    body = bytes(range(256)) * 1000
+    response = upload(client, user_headers, case_id, body)
+    assert response.status_code == 201
+    document = response.json()
+    assert document["size"] == len(body)
+    assert document["contentType"] == "application/pdf"
+
+    full = client.get(f"/api/documents/{document['id']}/content", headers=user_headers)
+    assert full.content == body
+
+    partial = client.get(
+        f"/api/documents/{document['id']}/content",
+        headers={**user_headers, "Range": "bytes=100-199"}
+    )
+    assert partial.status_code == 206
+    assert partial.content == body[100:200]
+
+def test_identical_files_are_stored_once(client, user_headers, local_storage):
+    """Test the same content attached twice shares one file until both are deleted"""
+    first_case = create_case(client, user_headers)
+    second_case = create_case(client, user_headers)
+    first = upload(client, user_headers, first_case, b"%PDF-1.4 vekaletname").json()
+    second = upload(client, user_headers, second_case, b"%PDF-1.4 vekaletname", "kopya.pdf").json()
+    assert first["sha256"] == second["sha256"]
+    path = local_storage.path(first["sha256"])
+
+    client.delete(f"/api/documents/{first['id']}", headers=user_headers)
+    assert client.get(f"/api/documents/{second['id']}/content", headers=user_headers).content.endswith(b"vekaletname")
+
+    client.delete(f"/api/documents/{second['id']}", headers=user_headers)
+    assert not os.path.exists(path)
+
+def test_documents_are_private(client, user_headers, make_user_headers, local_storage):
+    """Test other users can neither attach to nor read a user's documents"""
+    case_id = create_case(client, user_headers)
+    document = upload(client, user_headers, case_id, b"gizli").json()
+    other = make_user_headers()
+    assert upload(client, other, case_id, b"x").status_code == 404
+    assert client.get(f"/api/documents/{document['id']}/content", headers=other).status_code == 404
+
+def test_upload_size_limit(client, user_headers, local_storage):
+    """Test uploads over the limit are rejected without keeping the file"""
+    local_storage.max_upload_bytes = 10
+    case_id = create_case(client, user_headers)
+    response = upload(client, user_headers, case_id, b"x" * 11)
+    assert response.status_code == 413
+    assert os.listdir(os.path.join(local_storage.root, "tmp")) == []
@@ -0,0 +1,74 @@
+"""Test event creation"""
+
+def create_case(client, headers):
+    client_id = client.post("/api/clients/", json={"name": "Can Öz"}, headers=headers).json()["id"]
+    return client.post(
+        "/api/cases/", json={"title": "İş Davası", "clientId": client_id}, headers=headers
+    ).json()["id"]
+
+def test_create_event(client, user_headers):
+    """Test creating an event under the user's own case"""
+    case_id = create_case(client, user_headers)
+    response = client.post(
+        "/api/events/",
+        json={"title": "Duruşma", "caseId": case_id, "eventDate": "2026-11-02T10:00:00"},
+        headers=user_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["caseId"] == case_id
+    assert data["eventDate"] == "2026-11-02T10:00:00"
+    assert data["version"] == 1
+
+def test_create_event_in_one_statement(client, user_headers, count_statements):
+    """Test authorization and insertion share a single INSERT ... SELECT"""
+    case_id = create_case(client, user_headers)
+    with count_statements() as statements:
+        client.post("/api/events/", json={"title": "Duruşma", "caseId": case_id}, headers=user_headers)
+    event_statements = [s for s in statements if '"Event"' in s or '"Case"' in s]
+    assert len(event_statements) == 1
+    assert event_statements[0].lstrip().upper().startswith("INSERT")
+
+def test_create_dated_event_statements(client, user_headers, count_statements):
+    """Test a dated event adds one conflict lookup before the INSERT ... SELECT"""
+    case_id = create_case(client, user_headers)
+    hearing = {"title": "Duruşma", "caseId": case_id, "eventDate": "2026-11-02T10:00:00"}
+    first = client.post("/api/events/", json=hearing, headers=user_headers).json()
+    with count_statements() as statements:
+        second = client.post("/api/events/", json={**hearing, "title": "Keşif"}, headers=user_headers)
+    assert second.json()["conflicts"] == [first["id"]]
+    event_statements = [s.lstrip().split()[0].upper() for s in statements if '"Event"' in s or '"Case"' in s]
+    assert event_statements == ["SELECT", "INSERT"]
+
+def test_create_event_cross_tenant(client, user_headers, make_user_headers):
+    """Test an event can't be attached to another user's case"""
+    case_id = create_case(client, user_headers)
+    response = client.post(
+        "/api/events/", json={"title": "Sızma", "caseId": case_id}, headers=make_user_headers()
+    )
+    assert response.status_code == 404
+    events = client.get("/api/events/", headers=user_headers).json()
+    assert events == []
+
+def test_batch_create_events(client, user_headers, count_statements):
+    """Test a batch is inserted with one statement"""
+    case_id = create_case(client, user_headers)
+    batch = [{"title": f"Duruşma {i}", "caseId": case_id} for i in range(3)]
+    with count_statements() as statements:
+        response = client.post("/api/events/batch", json=batch, headers=user_headers)
+    assert response.status_code == 200
+    assert sorted(e["title"] for e in response.json()) == ["Duruşma 0", "Duruşma 1", "Duruşma 2"]
+    assert len([s for s in statements if '"Event"' in s]) == 1
+
+def test_batch_with_foreign_case_inserts_nothing(client, user_headers, make_user_headers):
+    """Test a batch containing another user's case is rejected as a whole"""
+    own_case = create_case(client, user_headers)
+    foreign_case = create_case(client, make_user_headers())
+    batch = [
+        {"title": "Mine", "caseId": own_case},
+        {"title": "Theirs", "caseId": foreign_case},
+    ]
+    response = client.post("/api/events/batch", json=batch, headers=user_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"]["caseIds"] == [foreign_case]
+    assert client.get("/api/events/", headers=user_headers).json() == []
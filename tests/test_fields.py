@@ -0,0 +1,38 @@
+"""Test sparse fieldsets on list endpoints"""
+
+def test_fields_narrow_the_select(client, user_headers, count_statements):
+    """Test only the requested columns are selected and returned"""
+    client_id = client.post("/api/clients/", json={
+        "name": "Alan Müvekkil", "email": "alan@example.com", "address": "Moda, Kadıköy"
+    }, headers=user_headers).json()["id"]
+    case_id = client.post("/api/cases/", json={
+        "title": "Tapu iptali", "clientId": client_id, "description": "Uzun açıklama " * 500
+    }, headers=user_headers).json()["id"]
+    client.post("/api/events/", json={
+        "title": "Duruşma", "caseId": case_id, "eventDate": "2026-11-02T10:30:00", "description": "Notlar"
+    }, headers=user_headers)
+
+    with count_statements() as statements:
+        response = client.get("/api/cases/?fields=title,status", headers=user_headers)
+    assert response.json() == [{"id": case_id, "title": "Tapu iptali", "status": "active"}]
+    listing = [s for s in statements if 'FROM "Case"' in s]
+    assert len(listing) == 1 and "description" not in listing[0]
+
+    full = client.get("/api/events/", headers=user_headers).json()
+    with count_statements() as statements:
+        response = client.get("/api/events/?fields=eventDate, title", headers=user_headers)
+    assert response.json() == [{k: full[0][k] for k in ("id", "title", "eventDate")}]
+    assert not any('"Event".description' in s for s in statements)
+
+    clients = client.get("/api/clients/?fields=name&email=ALAN@example.com", headers=user_headers).json()
+    assert clients == [{"id": client_id, "name": "Alan Müvekkil"}]
+    assert client.get("/api/clients/?fields=email", headers=user_headers).json() == [
+        {"id": client_id, "email": "alan@example.com"}
+    ]
+
+def test_unknown_fields_are_rejected(client, user_headers):
+    """Test a field missing from the response schema is a 400 naming it"""
+    response = client.get("/api/cases/?fields=title,passwordHash", headers=user_headers)
+    assert response.status_code == 400
+    assert "passwordHash" in response.json()["detail"]["message"]
+    assert "description" in response.json()["detail"]["fields"]
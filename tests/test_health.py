@@ -24,3 +24,34 @@ def test_api_health(client):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
+
+def test_liveness(client):
+    """Test liveness probe"""
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json()["status"] == "alive"
+
+def test_readiness_reports_pool_and_migration(client):
+    """Test readiness probe reports pool usage and migration version"""
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["database"] == "connected"
+    assert "migration_version" in data
+    assert "checkedout" in data["pool"]
+
+def test_health_probe_is_cached(client):
+    """Test repeated probes reuse the cached result instead of connecting"""
+    from sqlalchemy import event
+    from app.database import engine
+
+    client.get("/health")
+    checkouts = []
+    listener = lambda *args: checkouts.append(1)
+    event.listen(engine, "checkout", listener)
+    try:
+        for _ in range(5):
+            assert client.get("/health").status_code == 200
+    finally:
+        event.remove(engine, "checkout", listener)
+    assert checkouts == []
@@ -0,0 +1,139 @@
+"""Test Idempotency-Key handling on create routes"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app import database
+from app.idempotency import claim, purge_expired
+from app.models import Case, IdempotencyKey, ImportFile
+from app.routers import imports
+
+def count_cases(title):
+    db = database.SessionLocal()
+    try:
+        return len(db.execute(select(Case.id).where(Case.title == title)).all())
+    finally:
+        db.close()
+
+def test_retry_replays_the_response(client, user_headers, count_statements):
+    """Test a retried create returns the first response without inserting again"""
+    client_id = client.post("/api/clients/", json={"name": "Tekrar Müvekkil"}, headers=user_headers).json()["id"]
+    body = {"title": "Ecrimisil", "clientId": client_id}
+    headers = {**user_headers, "Idempotency-Key": "case-1"}
+    first = client.post("/api/cases/", json=body, headers=headers)
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+
+    with count_statements() as statements:
+        retry = client.post("/api/cases/", json=body, headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert not any(s.startswith("INSERT") for s in statements)
+    assert count_cases("Ecrimisil") == 1
+
+    event_body = {"title": "Duruşma", "caseId": first.json()["id"], "eventDate": "2026-12-01T10:00:00"}
+    events = [
+        client.post("/api/events/", json=event_body, headers={**user_headers, "Idempotency-Key": "event-1"}).json()
+        for _ in range(2)
+    ]
+    assert events[0] == events[1]
+    assert len(client.get("/api/events/", headers=user_headers).json()) == 1
+
+    changed = client.post("/api/cases/", json={**body, "title": "Başka"}, headers=headers)
+    assert changed.status_code == 422
+    assert client.post("/api/cases/", json=body, headers=user_headers).json()["id"] != first.json()["id"]
+
+def test_keys_are_per_user_and_errors_are_not_stored(client, make_user_headers):
+    """Test keys are scoped to the user and a failed request can be retried"""
+    first, second = make_user_headers(), make_user_headers()
+    key = {"Idempotency-Key": "shared"}
+    body = {"title": "Duruşma", "caseId": 999999, "eventDate": "2026-12-01T10:00:00"}
+    assert client.post("/api/events/", json=body, headers={**first, **key}).status_code == 404
+    assert "Idempotent-Replayed" not in client.post("/api/events/", json=body, headers={**first, **key}).headers
+
+    client_id = client.post("/api/clients/", json={"name": "Ayrı Müvekkil"}, headers=first).json()["id"]
+    created = client.post("/api/cases/", json={"title": "Ortaklığın giderilmesi", "clientId": client_id},
+                          headers={**first, **key})
+    assert created.status_code == 200
+    other = client.post("/api/clients/", json={"name": "Diğer"}, headers={**second, **key})
+    assert other.status_code == 200 and "Idempotent-Replayed" not in other.headers
+
+def test_expired_keys(client, user_headers):
+    """Test an expired key runs the request again and expired keys are purged"""
+    user_id = client.post("/api/clients/", json={"name": "Süre"}, headers=user_headers).json()["userId"]
+    db = database.SessionLocal()
+    try:
+        past = datetime.utcnow() - timedelta(hours=1)
+        db.add(IdempotencyKey(userId=user_id, key="old", fingerprint="0" * 64, status=200,
+                              contentType="application/json", body="{}", createdAt=past, expiresAt=past))
+        db.commit()
+    finally:
+        db.close()
+    headers = {**user_headers, "Idempotency-Key": "old"}
+    created = client.post("/api/clients/", json={"name": "Yeniden"}, headers=headers)
+    assert created.json()["name"] == "Yeniden" and "Idempotent-Replayed" not in created.headers
+    assert client.post("/api/clients/", json={"name": "Yeniden"}, headers=headers).headers["Idempotent-Replayed"] == "true"
+
+    assert purge_expired(database.engine, datetime.utcnow() + timedelta(days=2)) >= 1
+    db = database.SessionLocal()
+    try:
+        assert db.execute(select(IdempotencyKey).where(IdempotencyKey.userId == user_id)).first() is None
+    finally:
+        db.close()
+
+def test_streaming_route_holds_its_key(client, user_headers, monkeypatch):
+    """Test a retry arriving while an upload is read finds the key taken"""
+    retried = []
+
+    def retry_while_reading(**values):
+        # The route rolled back before reading the body; the claim must survive that
+        with pytest.raises(HTTPException) as exc:
+            claim(database.engine, values["userId"], "import-1", "0" * 64)
+        retried.append(exc.value.status_code)
+        return ImportFile(**values)
+
+    monkeypatch.setattr(imports, "ImportFile", retry_while_reading)
+    headers = {**user_headers, "Idempotency-Key": "import-1"}
+    content = "Müvekkil;Esas No\nAkış Müvekkil;2026/9\n".encode()
+    first = client.post("/api/imports/?filename=akis.csv", content=content, headers=headers)
+    assert first.status_code == 202 and retried == [409]
+
+    retry = client.post("/api/imports/?filename=akis.csv", content=content, headers=headers)
+    assert retry.status_code == 202 and retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"] and retried == [409]
+    db = database.SessionLocal()
+    try:
+        assert db.execute(select(func.count()).where(ImportFile.filename == "akis.csv")).scalar() == 1
+    finally:
+        db.close()
+
+def test_reused_key_with_another_file_is_refused(client, user_headers):
+    """Test a streamed upload retried with different content of the same size is a 422"""
+    headers = {**user_headers, "Idempotency-Key": "import-2"}
+    first = client.post("/api/imports/?filename=a.csv", content=b"Muvekkil\nAyse\n", headers=headers)
+    assert first.status_code == 202
+    other = client.post("/api/imports/?filename=a.csv", content=b"Muvekkil\nAli\n\n", headers=headers)
+    assert other.status_code == 422
+    same = client.post("/api/imports/?filename=a.csv", content=b"Muvekkil\nAyse\n", headers=headers)
+    assert same.status_code == 202 and same.json()["id"] == first.json()["id"]
+
+def test_abandoned_claims_expire(client, user_headers):
+    """Test a claim left without a response is taken over once its lease is up"""
+    user_id = client.post("/api/clients/", json={"name": "Kira"}, headers=user_headers).json()["userId"]
+    db = database.SessionLocal()
+    try:
+        now = datetime.utcnow()
+        for key, claimed_at in (("fresh", now), ("stale", now - timedelta(hours=1))):
+            db.add(IdempotencyKey(userId=user_id, key=key, fingerprint="0" * 64,
+                                  createdAt=claimed_at, expiresAt=now + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+    body = {"name": "Yarım kalan"}
+    assert client.post("/api/clients/", json=body, headers={**user_headers, "Idempotency-Key": "fresh"}).status_code == 409
+    taken = client.post("/api/clients/", json=body, headers={**user_headers, "Idempotency-Key": "stale"})
+    assert taken.status_code == 200 and "Idempotent-Replayed" not in taken.headers
+    replayed = client.post("/api/clients/", json=body, headers={**user_headers, "Idempotency-Key": "stale"})
+    assert replayed.json() == taken.json() and replayed.headers["Idempotent-Replayed"] == "true"
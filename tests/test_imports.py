@@ -0,0 +1,154 @@
+"""Test case list imports from CSV and XLSX"""
+import io
+import zipfile
+
+import pytest
+
+from sqlalchemy import func, select
+
+from app import database, importer
+from app.importer import RowError, csv_rows, parse_date, xlsx_rows
+from app.jobs import Worker
+from app.models import ImportFilePart, Job
+
+UYAP_CSV = (
+    "Müvekkil;E-posta;Esas No;Dava Türü;Mahkeme;Durum;Duruşma Tarihi\n"
+    "Ayşe Yılmaz;ayse@example.com;2024/101;Boşanma;İstanbul 3. Aile Mahkemesi;Açık;12.03.2025 10:30\n"
+    "AYŞE YILMAZ;;2024/101;Boşanma;İstanbul 3. Aile Mahkemesi;Açık;02.06.2025 14:00\n"
+    "Çelik İnşaat Ltd. Şti.;;2023/55;Alacak;Ankara 5. Asliye Ticaret;Kapandı;\n"
+    "Mehmet Öz;;2024/7;Tazminat;;;31.02.2025\n"
+    ";;2024/8;Tazminat;;;\n"
+)
+
+def xlsx(rows):
+    """A minimal workbook with shared strings, as Excel writes them"""
+    strings = sorted({cell for row in rows for cell in row if isinstance(cell, str)})
+    cells = []
+    for number, row in enumerate(rows, start=1):
+        values = "".join(
+            f'<c r="{chr(65 + i)}{number}" t="s"><v>{strings.index(cell)}</v></c>' if isinstance(cell, str)
+            else f'<c r="{chr(65 + i)}{number}"><v>{cell}</v></c>'
+            for i, cell in enumerate(row) if cell is not None
+        )
+        cells.append(f'<row r="{number}">{values}</row>')
+    main = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    rel = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("xl/workbook.xml", (
+            f'<workbook xmlns="{main}" xmlns:r="{rel}"><sheets>'
+            '<sheet name="Dosyalar" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        archive.writestr("xl/_rels/workbook.xml.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>'
+        ))
+        archive.writestr("xl/sharedStrings.xml", f'<sst xmlns="{main}">' + "".join(
+            f"<si><t>{s}</t></si>" for s in strings
+        ) + "</sst>")
+        archive.writestr("xl/worksheets/sheet1.xml", f'<worksheet xmlns="{main}"><sheetData>{"".join(cells)}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+def run_import(client, headers, content, filename):
+    job = client.post(f"/api/imports/?filename={filename}", content=content, headers=headers)
+    assert job.status_code == 202
+    Worker(database.SessionLocal).run_once()
+    return client.get(f"/api/jobs/{job.json()['id']}", headers=headers).json()
+
+def test_csv_and_xlsx_readers():
+    """Test delimiters, Windows-1254 text and XLSX cells are read as rows"""
+    assert list(csv_rows(io.BytesIO("Müvekkil;Esas No\nŞule;1\n".encode("cp1254")))) == [
+        ["Müvekkil", "Esas No"], ["Şule", "1"]
+    ]
+    assert list(csv_rows(io.BytesIO(b"\xef\xbb\xbfa,b\n1,2\n"))) == [["a", "b"], ["1", "2"]]
+    assert list(xlsx_rows(io.BytesIO(xlsx([["Müvekkil", None, "Tarih"], ["Şule", None, 45000]])))) == [
+        ["Müvekkil", None, "Tarih"], ["Şule", None, "45000"]
+    ]
+
+def test_import_csv(client, make_user_headers):
+    """Test rows become clients, cases and hearings and re-importing adds nothing"""
+    headers = make_user_headers()
+    job = run_import(client, headers, UYAP_CSV.encode(), "uyap.csv")
+    assert job["status"] == "done", job["error"]
+    result = job["result"]
+    assert {k: result[k] for k in ("rows", "clients", "cases", "events", "duplicates", "errors")} == {
+        "rows": 5, "clients": 2, "cases": 2, "events": 2, "duplicates": 0, "errors": 2,
+    }
+    assert result["errorDetails"] == [
+        {"row": 5, "error": "Unrecognized date '31.02.2025'"}, {"row": 6, "error": "No client name"}
+    ]
+
+    cases = {c["caseNumber"]: c for c in client.get("/api/cases/", headers=headers).json()}
+    assert cases["2023/55"]["status"] == "closed" and cases["2024/101"]["title"] == "Boşanma"
+    assert "İstanbul 3. Aile Mahkemesi" in cases["2024/101"]["description"]
+    events = client.get("/api/events/", headers=headers).json()
+    assert sorted(e["eventDate"][:16] for e in events) == ["2025-03-12T10:30", "2025-06-02T14:00"]
+    assert {e["caseId"] for e in events} == {cases["2024/101"]["id"]}
+    clients = client.get("/api/clients/", params={"email": "AYSE@example.com"}, headers=headers).json()
+    assert [c["name"] for c in clients] == ["Ayşe Yılmaz"]
+
+    again = run_import(client, headers, UYAP_CSV.encode(), "uyap.csv")["result"]
+    assert (again["clients"], again["cases"], again["events"], again["duplicates"]) == (0, 0, 0, 3)
+
+def test_import_xlsx(client, make_user_headers):
+    """Test an XLSX sheet with Excel date serials is imported"""
+    headers = make_user_headers()
+    content = xlsx([
+        ["Dosya No", "Müvekkil Adı Soyadı", "Konu", "Duruşma Tarihi"],
+        ["2022/9", "Zeynep Kaya", "İşçilik alacağı", 45658.4375],
+    ])
+    job = run_import(client, headers, content, "dosyalar.xlsx")
+    assert job["status"] == "done", job["error"]
+    assert (job["result"]["cases"], job["result"]["events"]) == (1, 1)
+    assert client.get("/api/events/", headers=headers).json()[0]["eventDate"].startswith("2025-01-01T10:30")
+
+def test_uploads_are_stored_and_read_in_parts(client, make_user_headers, monkeypatch):
+    """Test a file split over many parts imports like a whole one and its parts are removed"""
+    monkeypatch.setattr(importer, "IMPORT_PART_BYTES", 100)
+    headers = make_user_headers()
+    content = xlsx(
+        [["Dosya No", "Müvekkil Adı Soyadı", "Konu"]]
+        + [[f"2022/{n}", f"Müvekkil {n}", "Alacak"] for n in range(50)]
+    )
+    job_id = client.post("/api/imports/?filename=parcali.xlsx", content=content, headers=headers).json()["id"]
+    db = database.SessionLocal()
+    try:
+        parts = select(func.count()).where(ImportFilePart.importId == db.get(Job, job_id).payload["importId"])
+        assert db.execute(parts).scalar() == -(-len(content) // 100)
+        Worker(database.SessionLocal).run_once()
+        assert db.execute(parts).scalar() == 0
+    finally:
+        db.close()
+    job = client.get(f"/api/jobs/{job_id}", headers=headers).json()
+    assert job["status"] == "done", job["error"]
+    assert (job["result"]["clients"], job["result"]["cases"]) == (50, 50)
+
+    job = run_import(client, make_user_headers(), UYAP_CSV.encode(), "uyap.csv")
+    assert (job["result"]["clients"], job["result"]["cases"], job["result"]["events"]) == (2, 2, 2)
+
+def test_out_of_range_dates_fail_their_row(client, make_user_headers):
+    """Test day counts no calendar can hold are reported against their row only"""
+    for value in ("99999999", "inf", "-inf", "nan", "0"):
+        with pytest.raises(RowError, match="Date out of range"):
+            parse_date(value)
+    headers = make_user_headers()
+    content = (
+        "Müvekkil;Esas No;Duruşma Tarihi\n"
+        "Ali Veli;2024/1;99999999\n"
+        "Ali Veli;2024/2;inf\n"
+        "Ali Veli;2024/3;45658.5\n"
+    ).encode()
+    job = run_import(client, headers, content, "tarihler.csv")
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["errorDetails"] == [
+        {"row": 2, "error": "Date out of range '99999999'"}, {"row": 3, "error": "Date out of range 'inf'"}
+    ]
+    assert (job["result"]["cases"], job["result"]["events"]) == (1, 1)
+
+def test_unreadable_import_fails(client, make_user_headers):
+    """Test a file without a client column fails at once and other types are refused"""
+    headers = make_user_headers()
+    job = run_import(client, headers, b"foo,bar\n1,2\n", "liste.csv")
+    assert job["status"] == "failed" and job["attempts"] == 1
+    assert "client name column" in job["error"]
+    assert client.post("/api/imports/?filename=liste.pdf", content=b"%PDF", headers=headers).status_code == 400
@@ -0,0 +1,110 @@
+"""Test the background job queue"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import database, jobs
+from app.jobs import PermanentJobError, Worker, claim, enqueue, requeue_stale
+from app.models import Job
+
+def echo(context):
+    context.progress(0.5, "halfway")
+    return {"echo": context.payload, "attempt": context.attempt}
+
+def flaky(context):
+    raise RuntimeError("database unavailable")
+
+def broken_input(context):
+    raise PermanentJobError("not a spreadsheet")
+
+@pytest.fixture
+def handlers(monkeypatch):
+    monkeypatch.setitem(jobs.HANDLERS, "test.echo", f"{__name__}:echo")
+    monkeypatch.setitem(jobs.HANDLERS, "test.flaky", f"{__name__}:flaky")
+    monkeypatch.setitem(jobs.HANDLERS, "test.broken", f"{__name__}:broken_input")
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+def test_job_runs_and_is_polled(client, make_user_headers, handlers, db):
+    """Test a queued job is run by a worker and reported to its owner only"""
+    response = client.post("/auth/register", json={
+        "email": f"jobs-{time.time_ns()}@example.com", "password": "Test1234!", "name": "Jobs"
+    }).json()
+    headers = {"Authorization": f"Bearer {response['access_token']}"}
+    job = enqueue(db, "test.echo", {"file": "dosyalar.xlsx"}, user_id=response["user"]["id"])
+
+    polled = client.get(f"/api/jobs/{job.id}", headers=headers)
+    assert polled.json()["status"] == "queued"
+    assert polled.headers["Retry-After"] == "2"
+
+    assert Worker(database.SessionLocal).run_once() >= 1
+    polled = client.get(f"/api/jobs/{job.id}", headers=headers)
+    assert "Retry-After" not in polled.headers
+    body = polled.json()
+    assert body["status"] == "done" and body["progress"] == 1.0
+    assert body["result"] == {"echo": {"file": "dosyalar.xlsx"}, "attempt": 1}
+    assert [j["id"] for j in client.get("/api/jobs/", headers=headers).json()] == [job.id]
+    assert client.get(f"/api/jobs/{job.id}", headers=make_user_headers()).status_code == 404
+
+def test_failed_job_is_retried_with_backoff(handlers, db):
+    """Test a failure is retried later and gives up after maxAttempts"""
+    job = enqueue(db, "test.flaky", max_attempts=2)
+    worker = Worker(database.SessionLocal)
+    worker.run_once()
+    db.refresh(job)
+    assert (job.status, job.attempts) == ("queued", 1)
+    assert job.runAt > datetime.utcnow() + timedelta(seconds=20)
+    assert "database unavailable" in job.error
+
+    assert worker.run_once() == 0
+    job.runAt = datetime.utcnow()
+    db.commit()
+    worker.run_once()
+    db.refresh(job)
+    assert (job.status, job.attempts) == ("failed", 2)
+
+def test_permanent_failure_is_not_retried(handlers, db):
+    """Test PermanentJobError fails the job on its first attempt"""
+    job = enqueue(db, "test.broken")
+    Worker(database.SessionLocal).run_once()
+    db.refresh(job)
+    assert (job.status, job.attempts) == ("failed", 1)
+    assert job.error == "PermanentJobError: not a spreadsheet"
+
+def test_claims_do_not_overlap_and_stale_jobs_are_requeued(handlers, db):
+    """Test each job is claimed once and jobs of a dead worker go back to the queue"""
+    ids = [enqueue(db, "test.echo").id for _ in range(3)]
+    first = [job_id for job_id, _ in claim(db, "worker-a", 2)]
+    second = [job_id for job_id, _ in claim(db, "worker-b", 5)]
+    assert not set(first) & set(second)
+    assert set(ids) <= set(first) | set(second)
+
+    db.query(Job).filter(Job.id.in_(ids)).update(
+        {"heartbeatAt": datetime.utcnow() - timedelta(hours=1)}, synchronize_session=False
+    )
+    db.commit()
+    assert requeue_stale(db) >= 3
+    assert {j.status for j in db.query(Job).filter(Job.id.in_(ids))} == {"queued"}
+    Worker(database.SessionLocal).run_once()
+
+def test_process_pool(handlers, db):
+    """Test jobs run in spawned pool processes"""
+    job = enqueue(db, "test.echo", {"n": 1})
+    worker = Worker(database.SessionLocal, processes=1, poll_interval=0.1)
+    worker.start_pool()
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            worker.step(db)
+            db.refresh(job)
+            if job.status == "done":
+                break
+    finally:
+        worker.pool.shutdown()
+    assert job.status == "done"
+    assert job.result["echo"] == {"n": 1}
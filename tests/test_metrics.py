@@ -0,0 +1,20 @@
+"""Test Prometheus metrics endpoint"""
+
+def test_metrics_endpoint(client):
+    """Test metrics are exposed in Prometheus text format"""
+    client.get("/ping")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/ping",status="200"}' in body
+    assert "http_request_duration_seconds_bucket" in body
+    assert "bcrypt_queue_depth" in body
+    assert "event_loop_lag_seconds" in body
+
+def test_metrics_use_route_template(client):
+    """Test path parameters are collapsed into the route template"""
+    client.get("/api/cases/12345")
+    body = client.get("/metrics").text
+    assert 'route="/api/cases/{case_id}"' in body
+    assert "/api/cases/12345" not in body
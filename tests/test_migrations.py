@@ -0,0 +1,92 @@
+"""Test the startup schema check and the alembic revisions"""
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+
+from app.database import Base, normalize_url
+from app.migrations import SCHEMA_REVISION, SchemaError, check_schema, current_version, missing_columns
+
+ALEMBIC_DIR = Path(__file__).resolve().parent.parent / "alembic"
+
+# The tables as the Node.js backend left them
+LEGACY_SCHEMA = [
+    'CREATE TABLE "User" (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, "passwordHash" VARCHAR NOT NULL, '
+    'name VARCHAR, role VARCHAR, "createdAt" DATETIME, "updatedAt" DATETIME)',
+    'CREATE TABLE "Client" (id INTEGER PRIMARY KEY, "userId" INTEGER REFERENCES "User"(id), name VARCHAR NOT NULL, '
+    'email VARCHAR, phone VARCHAR, address TEXT, "createdAt" DATETIME, "updatedAt" DATETIME)',
+    'CREATE TABLE "Case" (id INTEGER PRIMARY KEY, "userId" INTEGER REFERENCES "User"(id), '
+    '"clientId" INTEGER REFERENCES "Client"(id), "caseNumber" VARCHAR, title VARCHAR NOT NULL, description TEXT, '
+    'status VARCHAR, "startDate" DATETIME, "endDate" DATETIME, "createdAt" DATETIME, "updatedAt" DATETIME)',
+    'CREATE TABLE "Event" (id INTEGER PRIMARY KEY, "caseId" INTEGER REFERENCES "Case"(id), title VARCHAR NOT NULL, '
+    'description TEXT, "eventDate" DATETIME, "eventType" VARCHAR, "createdAt" DATETIME, "updatedAt" DATETIME)',
+]
+
+def alembic_config():
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    return config
+
+def test_schema_revision_is_the_head():
+    """Test SCHEMA_REVISION names the latest revision"""
+    assert ScriptDirectory.from_config(alembic_config()).get_current_head() == SCHEMA_REVISION
+
+def test_legacy_database_is_refused_until_upgraded(tmp_path, monkeypatch):
+    """Test startup fails on old tables and the revisions bring them up to date"""
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("""INSERT INTO "User" (id, email, "passwordHash") VALUES (1, 'eski@example.com', 'x')"""))
+    with pytest.raises(SchemaError, match="User.syncVersion"):
+        check_schema(engine, Base.metadata)
+
+    monkeypatch.setenv("DATABASE_URL", url)
+    command.upgrade(alembic_config(), "head")
+    with engine.connect() as conn:
+        assert missing_columns(conn, Base.metadata) == []
+        assert conn.execute(text('SELECT "syncVersion" FROM "User"')).scalar() == 0
+        indexes = {index["name"] for index in inspect(conn).get_indexes("Case")}
+        assert {"ix_Case_userId_syncVersion", "ix_Case_userId_caseNumber"} <= indexes
+    assert check_schema(engine, Base.metadata) == SCHEMA_REVISION
+    engine.dispose()
+
+def test_empty_database_is_created_and_stamped(tmp_path, monkeypatch):
+    """Test a fresh database gets every table and the revisions then have nothing to do"""
+    url = f"sqlite:///{tmp_path / 'fresh.db'}"
+    engine = create_engine(url)
+    assert check_schema(engine, Base.metadata) == SCHEMA_REVISION
+    monkeypatch.setenv("DATABASE_URL", url)
+    command.upgrade(alembic_config(), "head")
+    with engine.connect() as conn:
+        assert current_version(conn) == SCHEMA_REVISION
+        assert missing_columns(conn, Base.metadata) == []
+    assert check_schema(engine, Base.metadata) == SCHEMA_REVISION
+    engine.dispose()
+
+def test_pending_uploads_move_into_parts(tmp_path, monkeypatch):
+    """Test an upload stored whole before 0007 is kept as a single part"""
+    url = f"sqlite:///{tmp_path / 'uploads.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE "ImportFile" (id INTEGER PRIMARY KEY, "userId" INTEGER NOT NULL, '
+                          'filename VARCHAR NOT NULL, format VARCHAR(8) NOT NULL, size BIGINT NOT NULL, '
+                          'content BLOB NOT NULL, "rowsDone" INTEGER NOT NULL, state JSON, "createdAt" DATETIME)'))
+        conn.execute(text("""INSERT INTO "ImportFile" VALUES (1, 1, 'liste.csv', 'csv', 3, X'616263', 0, NULL, NULL)"""))
+    monkeypatch.setenv("DATABASE_URL", url)
+    command.upgrade(alembic_config(), "head")
+    with engine.connect() as conn:
+        assert "content" not in {column["name"] for column in inspect(conn).get_columns("ImportFile")}
+        assert conn.execute(text('SELECT "importId", start, data FROM "ImportFilePart"')).all() == [(1, 0, b"abc")]
+    engine.dispose()
+
+def test_provider_urls_are_normalized():
+    """Test postgres:// URLs, as some hosts hand them out, work for the app and alembic alike"""
+    assert normalize_url("postgres://u:p@host/db") == "postgresql://u:p@host/db"
+    assert normalize_url("postgresql+psycopg://u:p@host/db") == "postgresql+psycopg://u:p@host/db"
+    env = (ALEMBIC_DIR / "env.py").read_text()
+    assert "normalize_url(os.getenv(\"DATABASE_URL\"" in env
@@ -0,0 +1,47 @@
+"""Test conflict-of-interest and duplicate client detection"""
+from app.parties import normalize, phonetic, score
+
+def test_turkish_normalization():
+    """Test dotted/dotless i folding and diacritics"""
+    assert normalize("AHMET YILMAZ") == normalize("Ahmet Yılmaz") == "ahmet yilmaz"
+    assert normalize("İSMAİL IŞIK") == "ismail isik"
+    assert normalize("Şükrü Güneş-Öztürk") == "sukru gunes ozturk"
+
+def test_phonetic_codes_match_spelling_variants():
+    """Test common spelling variants share a phonetic code"""
+    assert phonetic("yilmaz") == phonetic("yilmas")
+    assert score("Mehmet Yılmaz", "Mehmed Yilmas") >= 0.9
+    assert score("Mehmet Yılmaz", "Ayşe Demir") < 0.6
+
+def test_conflict_check_finds_existing_client(client, user_headers, make_user_headers):
+    """Test a party matching the user's own client is reported"""
+    existing = client.post("/api/clients/", json={"name": "Ahmet Yılmaz"}, headers=user_headers).json()
+    client.post("/api/clients/", json={"name": "Zeynep Kaya"}, headers=user_headers)
+    client.post("/api/clients/", json={"name": "AHMET YILMAZ"}, headers=make_user_headers())
+
+    response = client.post("/api/clients/conflict-check", json={"name": "AHMET YILMAZ"}, headers=user_headers)
+    assert response.status_code == 200
+    matches = response.json()["matches"]
+    assert [m["client"]["id"] for m in matches] == [existing["id"]]
+    assert matches[0]["score"] == 1.0
+
+def test_conflict_check_follows_renames(client, user_headers):
+    """Test renamed clients are matched under their new name only"""
+    created = client.post("/api/clients/", json={"name": "Ali Veli"}, headers=user_headers).json()
+    client.patch(f"/api/clients/{created['id']}", json={"name": "Hasan Çelik"}, headers=user_headers)
+
+    old = client.post("/api/clients/conflict-check", json={"name": "Ali Veli"}, headers=user_headers).json()
+    new = client.post("/api/clients/conflict-check", json={"name": "Hasan Celik"}, headers=user_headers).json()
+    assert old["matches"] == []
+    assert [m["client"]["id"] for m in new["matches"]] == [created["id"]]
+
+def test_duplicates(client, user_headers):
+    """Test clients with the same normalized or phonetic name are grouped"""
+    ids = [
+        client.post("/api/clients/", json={"name": name}, headers=user_headers).json()["id"]
+        for name in ("Ahmet Yılmaz", "AHMET YILMAZ", "Ahmet Yilmas", "Fatma Demir")
+    ]
+    response = client.get("/api/clients/duplicates", headers=user_headers)
+    assert response.status_code == 200
+    groups = [[c["id"] for c in group] for group in response.json()["groups"]]
+    assert groups == [ids[:3]]
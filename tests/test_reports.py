@@ -0,0 +1,113 @@
+"""Test case summary PDF rendering and caching"""
+import re
+import zlib
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from app import crypto, database, pdf
+from app.jobs import Worker
+from app.reports import load_cases, render_report
+
+def test_pdf_structure_and_turkish_text():
+    """Test Turkish letters use the remapped codes and the xref points at every object"""
+    assert pdf.literal("Şİğı (ç)") == r"(\336\335\360\375 \(\347\))"
+    assert pdf.wrap("Ağır ceza mahkemesi duruşması", "regular", 10, 80) == ["Ağır ceza", "mahkemesi", "duruşması"]
+
+    document = pdf.Document("Özet")
+    document.add_page().text(50, 800, "Şişli 2. Asliye Hukuk Mahkemesi")
+    content = document.render()
+    assert content.startswith(b"%PDF-1.4") and content.endswith(b"%%EOF\n")
+    xref = int(re.search(rb"startxref\n(\d+)", content).group(1))
+    offsets = re.findall(rb"(\d{10}) 00000 n", content[xref:])
+    for number, offset in enumerate(offsets, start=1):
+        assert content[int(offset):].startswith(f"{number} 0 obj".encode())
+    stream = re.search(rb"stream\n(.*)\nendstream", content, re.S).group(1)
+    assert rb"(\336i\376li 2. Asliye Hukuk Mahkemesi) Tj" in zlib.decompress(stream)
+
+def test_reports_load_in_fixed_number_of_queries(client, user_headers, count_statements):
+    """Test loading reports takes two queries however many cases there are"""
+    client_id = client.post("/api/clients/", json={"name": "Rapor Müvekkil"}, headers=user_headers).json()["id"]
+    case_ids = []
+    for i in range(3):
+        case_id = client.post("/api/cases/", json={"title": f"Dava {i}", "clientId": client_id}, headers=user_headers).json()["id"]
+        for day in (1, 2):
+            client.post("/api/events/", json={
+                "title": "Duruşma", "caseId": case_id, "eventDate": f"2026-0{day}-10T10:00:00"
+            }, headers=user_headers)
+        case_ids.append(case_id)
+
+    db = database.SessionLocal()
+    try:
+        with count_statements() as statements:
+            reports = load_cases(db, case_ids)
+            assert [len(r.events) for r in reports] == [2, 2, 2]
+            assert all(r.client.name == "Rapor Müvekkil" for r in reports)
+        assert len(statements) == 2
+        assert render_report(reports[0]).startswith(b"%PDF")
+    finally:
+        db.close()
+
+def test_case_report_is_rendered_once_per_version(client, make_user_headers):
+    """Test a report is rendered by a worker, then served until the case changes"""
+    headers = make_user_headers()
+    client_id = client.post("/api/clients/", json={
+        "name": "Şükrü Ağaoğlu", "email": "sukru@example.com", "phone": "0532 111 22 33"
+    }, headers=headers).json()["id"]
+    case_id = client.post("/api/cases/", json={
+        "title": "İşe iade davası", "clientId": client_id, "caseNumber": "2026/14", "description": "Uzun açıklama " * 200
+    }, headers=headers).json()["id"]
+    for day in range(1, 40):
+        client.post("/api/events/", json={
+            "title": f"Duruşma {day}", "caseId": case_id, "eventDate": (datetime(2026, 1, 1) + timedelta(days=day)).isoformat()
+        }, headers=headers)
+
+    first = client.get(f"/api/reports/cases/{case_id}", headers=headers)
+    assert first.status_code == 202 and first.headers["Location"] == f"/api/jobs/{first.json()['id']}"
+    assert client.get(f"/api/reports/cases/{case_id}", headers=headers).json()["id"] == first.json()["id"]
+    Worker(database.SessionLocal).run_once()
+    assert client.get(f"/api/jobs/{first.json()['id']}", headers=headers).json()["result"] == {"caseId": case_id, "rendered": 1}
+
+    report = client.get(f"/api/reports/cases/{case_id}", headers=headers)
+    assert report.status_code == 200 and report.headers["content-type"] == "application/pdf"
+    assert report.content.count(b"/Type /Page ") > 1
+    cached = client.get(f"/api/reports/cases/{case_id}", headers={**headers, "If-None-Match": report.headers["ETag"]})
+    assert cached.status_code == 304
+    with database.engine.connect() as conn:
+        stored = conn.execute(text('SELECT content FROM "CaseReport" WHERE "caseId" = :id'), {"id": case_id}).scalar()
+    assert stored.startswith(crypto.TOKEN_PREFIX.encode()) and b"%PDF" not in stored
+
+    db = database.SessionLocal()
+    try:
+        crypto.rewrap(db)
+    finally:
+        db.close()
+    assert client.get(f"/api/reports/cases/{case_id}", headers=headers).status_code == 202
+    Worker(database.SessionLocal).run_once()
+    assert client.get(f"/api/reports/cases/{case_id}", headers=headers).content.startswith(b"%PDF")
+
+    client.patch(f"/api/clients/{client_id}", json={"phone": "0533 999 88 77"}, headers=headers)
+    assert client.get(f"/api/reports/cases/{case_id}", headers=headers).status_code == 202
+    assert client.get(f"/api/reports/cases/{case_id}", headers=make_user_headers()).status_code == 404
+
+def test_tomorrows_hearings_are_batch_rendered(client, make_user_headers):
+    """Test the hearing batch renders the cases with a hearing tomorrow only"""
+    headers = make_user_headers()
+    tomorrow = date.today() + timedelta(days=1)
+    client_id = client.post("/api/clients/", json={"name": "Duruşma Müvekkil"}, headers=headers).json()["id"]
+    cases = [
+        client.post("/api/cases/", json={"title": f"Dava {i}", "clientId": client_id}, headers=headers).json()["id"]
+        for i in range(3)
+    ]
+    for case_id, when in zip(cases, (tomorrow, tomorrow, tomorrow + timedelta(days=1))):
+        client.post("/api/events/", json={
+            "title": "Duruşma", "caseId": case_id, "eventType": "hearing", "eventDate": f"{when}T09:30:00"
+        }, headers=headers)
+
+    job = client.post("/api/reports/hearings", headers=headers)
+    assert job.status_code == 202
+    Worker(database.SessionLocal).run_once()
+    result = client.get(f"/api/jobs/{job.json()['id']}", headers=headers).json()["result"]
+    assert result == {"date": tomorrow.isoformat(), "caseIds": cases[:2], "rendered": 2}
+    assert client.get(f"/api/reports/cases/{cases[0]}", headers=headers).status_code == 200
+    assert client.get(f"/api/reports/cases/{cases[2]}", headers=headers).status_code == 202
@@ -0,0 +1,130 @@
+"""Test KVKK erasure jobs"""
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from app import database
+from app.agenda import day_start, local_today
+from app.jobs import Worker
+from app.models import Agenda, IdempotencyKey, ImportFile, ImportFilePart, RetentionJob
+from app.retention import run_job
+
+def create_client_with_data(client, headers):
+    client_id = client.post("/api/clients/", json={
+        "name": "Emre Doğan", "email": "emre@example.com", "phone": "05551112233"
+    }, headers=headers).json()["id"]
+    case_ids = []
+    for title in ("Tapu iptali", "Alacak"):
+        case_id = client.post(
+            "/api/cases/", json={"title": title, "clientId": client_id, "description": "TC 12345678901"},
+            headers=headers
+        ).json()["id"]
+        case_ids.append(case_id)
+        for day in range(1, 4):
+            client.post("/api/events/", json={
+                "title": "Duruşma", "caseId": case_id, "eventDate": f"2026-12-0{day}T10:00:00"
+            }, headers=headers)
+    return client_id, case_ids
+
+def erase(client, headers, client_id):
+    response = client.post("/api/retention-jobs/", json={"clientId": client_id}, headers=headers)
+    assert response.status_code == 202
+    Worker(database.SessionLocal).run_once()
+    return client.get(f"/api/retention-jobs/{response.json()['id']}", headers=headers).json()
+
+def test_erasure_deletes_unretained_data(client, user_headers):
+    """Test a client without invoices is erased entirely, with tombstones"""
+    client_id, case_ids = create_client_with_data(client, user_headers)
+    version = client.get("/api/sync?since=0", headers=user_headers).json()["version"]
+
+    job = erase(client, user_headers, client_id)
+    assert job["status"] == "done"
+    assert job["rowsDeleted"] == 6 + 2 + 1
+    assert job["rowsPseudonymized"] == 0
+
+    assert client.get(f"/api/clients/{client_id}", headers=user_headers).status_code == 404
+    deleted = client.get(f"/api/sync?since={version}", headers=user_headers).json()["deleted"]
+    assert {("case", case_id) for case_id in case_ids} <= {(d["type"], d["id"]) for d in deleted}
+    assert ("client", client_id) in {(d["type"], d["id"]) for d in deleted}
+
+def test_erasure_pseudonymizes_invoiced_data(client, user_headers):
+    """Test invoiced cases and their client are kept without personal data"""
+    client_id, case_ids = create_client_with_data(client, user_headers)
+    client.post("/api/time-entries/", json={
+        "caseId": case_ids[0], "workDate": "2026-08-03", "minutes": 60, "hourlyRate": 1000,
+        "description": "Emre Bey ile görüşme"
+    }, headers=user_headers)
+    client.post("/api/invoices/generate", json={"year": 2026, "month": 8}, headers=user_headers)
+
+    job = erase(client, user_headers, client_id)
+    assert job["status"] == "done"
+    assert job["rowsPseudonymized"] == 3
+
+    erased = client.get(f"/api/clients/{client_id}", headers=user_headers).json()
+    assert erased["name"].startswith("Anonimleştirilmiş")
+    assert erased["email"] is None and erased["phone"] is None
+    cases = {c["id"]: c for c in client.get("/api/cases/", headers=user_headers).json()}
+    assert case_ids[1] not in cases
+    assert cases[case_ids[0]]["description"] is None
+    entries = client.get(f"/api/time-entries/?caseId={case_ids[0]}", headers=user_headers).json()
+    assert entries[0]["description"] is None and entries[0]["amount"] == 1000.0
+
+def test_erasure_resumes_after_interruption(client, user_headers):
+    """Test a job interrupted mid-step continues where it stopped"""
+    client_id, _ = create_client_with_data(client, user_headers)
+    user_id = client.get(f"/api/clients/{client_id}", headers=user_headers).json()["userId"]
+    db = database.SessionLocal()
+    try:
+        job = RetentionJob(userId=user_id, clientId=client_id, status="failed", step="events", lastId=0)
+        db.add(job)
+        db.commit()
+        job = run_job(db, job.id, batch_size=2)
+        assert job.status == "done"
+        assert job.rowsDeleted == 6 + 2 + 1
+    finally:
+        db.close()
+
+def test_erasure_drops_stored_agendas(client, user_headers):
+    """Test agendas copying the client's name are dropped and recomputed without it"""
+    client_id, case_ids = create_client_with_data(client, user_headers)
+    client.post("/api/events/", json={
+        "title": "Arabuluculuk", "caseId": case_ids[0],
+        "eventDate": (day_start(local_today()) + timedelta(hours=23)).isoformat()
+    }, headers=user_headers)
+    agenda = client.get("/api/agenda/today", headers=user_headers).json()
+    assert agenda["today"][0]["clientName"] == "Emre Doğan"
+    user_id = client.get(f"/api/clients/{client_id}", headers=user_headers).json()["userId"]
+
+    assert erase(client, user_headers, client_id)["status"] == "done"
+    db = database.SessionLocal()
+    try:
+        assert db.execute(select(Agenda.id).where(Agenda.userId == user_id)).all() == []
+    finally:
+        db.close()
+    assert client.get("/api/agenda/today", headers=user_headers).json()["today"] == []
+
+def test_erasure_drops_other_copies(client, user_headers):
+    """Test pending import files and stored idempotent responses don't outlive the erasure"""
+    created = client.post(
+        "/api/clients/", json={"name": "Emre Doğan"}, headers={**user_headers, "Idempotency-Key": "client-1"}
+    ).json()
+    db = database.SessionLocal()
+    try:
+        upload = ImportFile(userId=created["userId"], filename="liste.csv", format="csv", size=11)
+        db.add(upload)
+        db.flush()
+        upload_id = upload.id
+        db.add(ImportFilePart(importId=upload_id, start=0, data=b"Emre Do\xc4\x9fan"))
+        db.commit()
+
+        assert erase(client, user_headers, created["id"])["status"] == "done"
+        assert db.execute(select(ImportFile.id).where(ImportFile.userId == created["userId"])).all() == []
+        assert db.execute(select(ImportFilePart.id).where(ImportFilePart.importId == upload_id)).all() == []
+        stored = db.execute(select(IdempotencyKey).where(IdempotencyKey.userId == created["userId"])).scalars().all()
+        assert [(key.key, key.body) for key in stored] == [("client-1", None)]
+    finally:
+        db.close()
+    replay = client.post(
+        "/api/clients/", json={"name": "Emre Doğan"}, headers={**user_headers, "Idempotency-Key": "client-1"}
+    )
+    assert replay.headers["Idempotent-Replayed"] == "true" and "Emre" not in replay.text
@@ -0,0 +1,88 @@
+"""Test scheduling conflict detection"""
+import random
+from datetime import datetime, timedelta
+
+from app.scheduling import IntervalTree
+
+def create_case(client, headers):
+    client_id = client.post("/api/clients/", json={"name": "Elif Şahin"}, headers=headers).json()["id"]
+    return client.post(
+        "/api/cases/", json={"title": "Boşanma", "clientId": client_id}, headers=headers
+    ).json()["id"]
+
+def test_check_conflicts(client, user_headers):
+    """Test overlapping events are reported and adjacent ones are not"""
+    case_id = create_case(client, user_headers)
+    hearing = client.post("/api/events/", json={
+        "title": "Duruşma", "caseId": case_id,
+        "eventDate": "2026-11-02T10:00:00", "endDate": "2026-11-02T11:00:00"
+    }, headers=user_headers).json()
+
+    overlap = client.post("/api/events/check-conflicts", json={
+        "start": "2026-11-02T10:30:00", "end": "2026-11-02T12:00:00"
+    }, headers=user_headers).json()
+    assert [e["id"] for e in overlap["conflicts"]] == [hearing["id"]]
+
+    adjacent = client.post("/api/events/check-conflicts", json={
+        "start": "2026-11-02T11:00:00", "end": "2026-11-02T12:00:00"
+    }, headers=user_headers).json()
+    assert adjacent["conflicts"] == []
+
+def test_create_warns_about_conflicts(client, user_headers):
+    """Test creating a double-booked event returns the clashing ids"""
+    case_id = create_case(client, user_headers)
+    first = client.post("/api/events/", json={
+        "title": "Duruşma", "caseId": case_id, "eventDate": "2026-11-03T09:00:00"
+    }, headers=user_headers).json()
+    assert first["conflicts"] == []
+
+    second = client.post("/api/events/", json={
+        "title": "Müvekkil görüşmesi", "caseId": case_id, "eventDate": "2026-11-03T09:30:00"
+    }, headers=user_headers).json()
+    assert second["conflicts"] == [first["id"]]
+
+def test_conflicts_are_per_user(client, user_headers, make_user_headers):
+    """Test other lawyers' events never conflict"""
+    case_id = create_case(client, user_headers)
+    client.post("/api/events/", json={
+        "title": "Duruşma", "caseId": case_id, "eventDate": "2026-11-04T09:00:00"
+    }, headers=user_headers)
+    response = client.post("/api/events/check-conflicts", json={
+        "start": "2026-11-04T09:00:00"
+    }, headers=make_user_headers())
+    assert response.json()["conflicts"] == []
+
+def test_offset_aware_times_are_compared_in_utc(client, user_headers):
+    """Test event times with a UTC offset are checked against stored ones"""
+    case_id = create_case(client, user_headers)
+    first = client.post("/api/events/", json={
+        "title": "Duruşma", "caseId": case_id, "eventDate": "2026-11-05T07:00:00"
+    }, headers=user_headers).json()
+
+    response = client.post("/api/events/", json={
+        "title": "Bilirkişi incelemesi", "caseId": case_id, "eventDate": "2026-11-05T10:30:00+03:00"
+    }, headers=user_headers)
+    assert response.status_code == 200
+    assert response.json()["conflicts"] == [first["id"]]
+    assert response.json()["eventDate"] == "2026-11-05T07:30:00"
+
+    overlap = client.post("/api/events/check-conflicts", json={
+        "start": "2026-11-05T06:30:00Z", "end": "2026-11-05T07:15:00Z"
+    }, headers=user_headers).json()
+    assert [e["id"] for e in overlap["conflicts"]] == [first["id"]]
+
+def test_interval_tree_matches_brute_force():
+    """Test the interval tree agrees with a linear scan"""
+    rng = random.Random(7)
+    base = datetime(2026, 1, 1)
+    intervals = []
+    for i in range(2000):
+        start = base + timedelta(minutes=rng.randrange(0, 60 * 24 * 90))
+        intervals.append((start, start + timedelta(minutes=rng.randrange(15, 240)), i))
+    tree = IntervalTree(intervals)
+
+    for _ in range(200):
+        start = base + timedelta(minutes=rng.randrange(0, 60 * 24 * 90))
+        end = start + timedelta(minutes=rng.randrange(1, 600))
+        expected = {i for s, e, i in intervals if s < end and start < e}
+        assert set(tree.overlapping(start, end)) == expected
@@ -0,0 +1,104 @@
+"""Test refresh tokens and session rotation"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import database
+from app.auth import SESSION_REUSE_WINDOW_DAYS, hash_refresh_token, prune_sessions, rotate_session
+from app.models import UserSession
+
+def register(client):
+    user_data = {
+        "email": f"session-{uuid.uuid4().hex[:12]}@example.com",
+        "password": "Test1234!"
+    }
+    return client.post("/auth/register", json=user_data).json()
+
+def test_refresh_rotates_token(client):
+    """Test refreshing issues a new pair and retires the old refresh token"""
+    tokens = register(client)
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {data['access_token']}"}
+    assert client.get("/api/cases/", headers=headers).status_code == 200
+
+def test_refresh_does_not_hash_password(client, monkeypatch):
+    """Test refreshing never runs bcrypt"""
+    from app.routers import auth
+    tokens = register(client)
+
+    async def fail_hash(*args):
+        raise AssertionError("password hashed on refresh")
+
+    monkeypatch.setattr(auth, "run_password_hash", fail_hash)
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+
+def test_reused_refresh_token_revokes_family(client):
+    """Test replaying a rotated refresh token kills the whole session"""
+    tokens = register(client)
+    rotated = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    replay = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert replay.status_code == 401
+    response = client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+def test_concurrent_refresh_counts_as_reuse(client):
+    """Test a refresh that read the token before another rotated it loses and revokes the family"""
+    tokens = register(client)
+    db = database.SessionLocal()
+    try:
+        # Loaded (and kept in the identity map) before the other refresh, like a request racing it
+        stale = db.query(UserSession).filter(UserSession.tokenHash == hash_refresh_token(tokens["refresh_token"])).one()
+        rotated = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+        with pytest.raises(HTTPException) as exc:
+            rotate_session(db, tokens["refresh_token"])
+        assert exc.value.status_code == 401
+    finally:
+        db.close()
+    response = client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+def test_logout_ends_refresh_session(client):
+    """Test logout also invalidates the refresh token"""
+    tokens = register(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.post("/auth/logout", headers=headers).status_code == 204
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+def test_unknown_refresh_token(client):
+    """Test an unknown refresh token is rejected"""
+    response = client.post("/auth/refresh", json={"refresh_token": "not-a-token"})
+    assert response.status_code == 401
+
+def test_prune_keeps_sessions_within_the_reuse_window(client):
+    """Test expired sessions and long-retired ones are deleted, recent rotations are kept"""
+    tokens = register(client)
+    rotated = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+    hashes = [hash_refresh_token(t["refresh_token"]) for t in (tokens, rotated)]
+
+    prune_sessions(database.engine)
+    db = database.SessionLocal()
+    try:
+        assert db.query(UserSession).filter(UserSession.tokenHash.in_(hashes)).count() == 2
+    finally:
+        db.close()
+
+    # A replayed token from just inside the window is still recognised
+    prune_sessions(database.engine, datetime.utcnow() + timedelta(days=SESSION_REUSE_WINDOW_DAYS - 1))
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+
+    later = datetime.utcnow() + timedelta(days=SESSION_REUSE_WINDOW_DAYS + 1)
+    assert prune_sessions(database.engine, later) >= 2
+    db = database.SessionLocal()
+    try:
+        assert db.query(UserSession).filter(UserSession.tokenHash.in_(hashes)).count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,82 @@
+"""Test cold start cost and shutdown"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from app.audit import audit_log
+from app.main import app
+
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import app.main
+with TestClient(app.main.app) as client:
+    status = client.get("/ping").status_code
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "elapsed": elapsed,
+    "status": status,
+    "loaded": [name for name in ("passlib", "jose", "bcrypt", "alembic", "cryptography") if name in sys.modules],
+}))
+"""
+
+def start_probe(env=None):
+    return subprocess.run(
+        [sys.executable, "-c", PROBE],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+    )
+
+def run_probe():
+    result = start_probe()
+    result.check_returncode()
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_heavy_modules_are_deferred():
+    """Test auth, migration and encryption libraries are not imported to serve the first request"""
+    report = run_probe()
+    assert report["status"] == 200
+    assert report["loaded"] == []
+
+def test_time_to_first_request():
+    """Test a fresh process answers its first request within budget"""
+    report = run_probe()
+    assert report["elapsed"] < STARTUP_BUDGET_SECONDS
+
+def test_refuses_to_start_without_encryption_keys():
+    """Test the server won't start with client data encryption keys missing"""
+    env = {name: value for name, value in os.environ.items() if name != "BLIND_INDEX_KEY"}
+    result = start_probe(env)
+    assert result.returncode != 0
+    assert "BLIND_INDEX_KEY must be set" in result.stderr
+
+def test_shutdown_waits_for_the_audit_writer(monkeypatch):
+    """Test the queue is drained only after the cancelled writer has stopped"""
+    order = []
+
+    async def run(engine):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            # A batch still being written when the task is cancelled
+            await asyncio.sleep(0.05)
+            order.append("run")
+            raise
+
+    async def flush(engine):
+        order.append("flush")
+
+    monkeypatch.setattr(audit_log, "run", run)
+    monkeypatch.setattr(audit_log, "flush", flush)
+    with TestClient(app):
+        pass
+    assert order == ["run", "flush"]
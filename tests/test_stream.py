@@ -0,0 +1,37 @@
+"""Test change feed"""
+import asyncio
+
+import pytest
+
+from app.pubsub import Subscription
+
+def test_websocket_receives_changes(client, user_headers):
+    """Test a write is pushed to the user's open stream"""
+    token = user_headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/api/stream/ws?token={token}") as websocket:
+        client.post("/api/clients/", json={"name": "Ali Veli"}, headers=user_headers)
+        message = websocket.receive_json()
+    assert message == {"type": "change", "version": 1}
+
+def test_websocket_rejects_bad_token(client):
+    """Test the feed requires a valid token"""
+    from starlette.websockets import WebSocketDisconnect
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/stream/ws?token=invalid") as websocket:
+            websocket.receive_json()
+
+def test_sse_requires_auth(client):
+    """Test the SSE feed rejects anonymous requests"""
+    assert client.get("/api/stream").status_code == 401
+
+def test_slow_consumer_is_told_to_resync():
+    """Test a full buffer drops old messages and asks for a resync"""
+    async def fill():
+        subscription = Subscription(user_id=1, maxsize=2)
+        for version in range(1, 5):
+            subscription.offer({"type": "change", "version": version})
+        return [await subscription.get() for _ in range(2)]
+
+    messages = asyncio.run(fill())
+    assert messages[0] == {"type": "resync", "dropped": 2}
+    assert messages[1] == {"type": "change", "version": 4}
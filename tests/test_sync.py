@@ -0,0 +1,43 @@
+"""Test delta sync endpoint"""
+
+def create_records(client, headers):
+    client_id = client.post("/api/clients/", json={"name": "Ayşe Kaya"}, headers=headers).json()["id"]
+    case_id = client.post(
+        "/api/cases/", json={"title": "Kira Davası", "clientId": client_id}, headers=headers
+    ).json()["id"]
+    event_id = client.post(
+        "/api/events/", json={"title": "Duruşma", "caseId": case_id}, headers=headers
+    ).json()["id"]
+    return client_id, case_id, event_id
+
+def test_full_sync(client, user_headers):
+    """Test since=0 returns every entity type"""
+    client_id, case_id, event_id = create_records(client, user_headers)
+    response = client.get("/api/sync?since=0", headers=user_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 3
+    assert [c["id"] for c in data["clients"]] == [client_id]
+    assert [c["id"] for c in data["cases"]] == [case_id]
+    assert [e["id"] for e in data["events"]] == [event_id]
+    assert data["deleted"] == []
+
+def test_delta_sync_returns_only_changes(client, user_headers):
+    """Test a sync from the last version only returns newer rows"""
+    create_records(client, user_headers)
+    version = client.get("/api/sync", headers=user_headers).json()["version"]
+
+    data = client.get(f"/api/sync?since={version}", headers=user_headers).json()
+    assert data["clients"] == data["cases"] == data["events"] == []
+
+    new_client = client.post("/api/clients/", json={"name": "Mehmet Demir"}, headers=user_headers).json()
+    data = client.get(f"/api/sync?since={version}", headers=user_headers).json()
+    assert [c["id"] for c in data["clients"]] == [new_client["id"]]
+    assert data["cases"] == data["events"] == []
+    assert data["version"] == version + 1
+
+def test_sync_is_per_tenant(client, user_headers, make_user_headers):
+    """Test another user's writes never show up"""
+    create_records(client, user_headers)
+    data = client.get("/api/sync", headers=make_user_headers()).json()
+    assert data["clients"] == data["cases"] == data["events"] == []
@@ -0,0 +1,70 @@
+"""Test verified-token cache and revocation"""
+import time
+from datetime import datetime, timedelta
+
+from app import database, tokens
+from app.models import RevokedToken
+
+def test_cached_token_skips_decode(client, user_headers, monkeypatch):
+    """Test a verified token is served from the cache"""
+    assert client.get("/api/cases/", headers=user_headers).status_code == 200
+
+    def fail_decode(*args):
+        raise AssertionError("token decoded twice")
+
+    monkeypatch.setattr(tokens, "decode", fail_decode)
+    assert client.get("/api/cases/", headers=user_headers).status_code == 200
+
+def test_logout_revokes_token(client, user_headers):
+    """Test a token is rejected after logout"""
+    assert client.post("/auth/logout", headers=user_headers).status_code == 204
+    response = client.get("/api/cases/", headers=user_headers)
+    assert response.status_code == 401
+
+def test_cache_respects_expiry():
+    """Test expired tokens are not served from the cache"""
+    cache = tokens.TokenCache(maxsize=2)
+    cache.put("expired", {"sub": "a", "exp": time.time() - 1})
+    cache.put("valid", {"sub": "b", "exp": time.time() + 60})
+    assert cache.get("expired") is None
+    assert cache.get("valid")["sub"] == "b"
+
+def test_cache_is_bounded():
+    """Test least recently used tokens are evicted"""
+    cache = tokens.TokenCache(maxsize=2)
+    exp = time.time() + 60
+    for name in ("a", "b", "c"):
+        cache.put(name, {"sub": name, "exp": exp})
+    assert len(cache) == 2
+    assert cache.get("a") is None
+
+def test_denylist_prunes_expired_entries():
+    """Test revoked ids are forgotten once their tokens expire"""
+    denylist = tokens.Denylist()
+    denylist.add("live", time.time() + 60)
+    denylist.add("dead", time.time() - 1)
+    assert "live" in denylist
+    assert "dead" not in denylist
+    assert "never-added" not in denylist
+    denylist.prune()
+    assert len(denylist) == 1
+
+def test_denylist_sync_sees_late_lower_ids(monkeypatch):
+    """Test a revocation committed after a higher id is still picked up"""
+    denylist = tokens.Denylist()
+    monkeypatch.setattr(tokens, "denylist", denylist)
+    expires = datetime.utcnow() + timedelta(minutes=5)
+    db = database.SessionLocal()
+    try:
+        db.add(RevokedToken(id=900002, jti="committed-first", expiresAt=expires))
+        db.commit()
+        tokens._load_revoked(database.engine, prune=False)
+        db.add(RevokedToken(id=900001, jti="committed-later", expiresAt=expires))
+        db.commit()
+        tokens._load_revoked(database.engine, prune=False)
+    finally:
+        db.query(RevokedToken).filter(RevokedToken.id.in_([900001, 900002])).delete()
+        db.commit()
+        db.close()
+    assert "committed-first" in denylist
+    assert "committed-later" in denylist
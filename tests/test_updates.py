@@ -0,0 +1,80 @@
+"""Test PATCH/DELETE endpoints and optimistic concurrency"""
+
+def create_case(client, headers):
+    client_id = client.post("/api/clients/", json={"name": "Zeynep Ak"}, headers=headers).json()["id"]
+    return client.post(
+        "/api/cases/", json={"title": "Tapu İptali", "clientId": client_id}, headers=headers
+    ).json()
+
+def test_patch_case(client, user_headers):
+    """Test a partial update changes only the given fields and bumps the version"""
+    case = create_case(client, user_headers)
+    response = client.patch(
+        f"/api/cases/{case['id']}", json={"status": "closed", "version": 1}, headers=user_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "closed"
+    assert data["title"] == "Tapu İptali"
+    assert data["version"] == 2
+
+def test_patch_is_one_statement_on_the_row(client, user_headers, count_statements):
+    """Test ownership check, update and fetch share one UPDATE ... RETURNING"""
+    case = create_case(client, user_headers)
+    with count_statements() as statements:
+        client.patch(f"/api/cases/{case['id']}", json={"title": "Yeni"}, headers=user_headers)
+    case_statements = [s for s in statements if '"Case"' in s]
+    assert len(case_statements) == 1
+    assert case_statements[0].lstrip().upper().startswith("UPDATE")
+
+def test_patch_stale_version_conflicts(client, user_headers):
+    """Test updating from an outdated version returns 409"""
+    case = create_case(client, user_headers)
+    client.patch(f"/api/cases/{case['id']}", json={"title": "A", "version": 1}, headers=user_headers)
+    response = client.patch(
+        f"/api/cases/{case['id']}", json={"title": "B", "version": 1}, headers=user_headers
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"]["version"] == 2
+
+def test_patch_other_users_case(client, user_headers, make_user_headers):
+    """Test another user's case looks missing"""
+    case = create_case(client, user_headers)
+    response = client.patch(f"/api/cases/{case['id']}", json={"title": "X"}, headers=make_user_headers())
+    assert response.status_code == 404
+
+def test_patch_rejects_null_required_field(client, user_headers):
+    """Test required columns can't be cleared"""
+    case = create_case(client, user_headers)
+    response = client.patch(f"/api/cases/{case['id']}", json={"title": None}, headers=user_headers)
+    assert response.status_code == 422
+
+def test_delete_case_removes_events_and_leaves_tombstones(client, user_headers):
+    """Test deleting a case deletes its events and reports both to sync"""
+    case = create_case(client, user_headers)
+    event_id = client.post(
+        "/api/events/", json={"title": "Keşif", "caseId": case["id"]}, headers=user_headers
+    ).json()["id"]
+    version = client.get("/api/sync", headers=user_headers).json()["version"]
+
+    assert client.delete(f"/api/cases/{case['id']}", headers=user_headers).status_code == 204
+    assert client.get(f"/api/cases/{case['id']}", headers=user_headers).status_code == 404
+
+    deleted = client.get(f"/api/sync?since={version}", headers=user_headers).json()["deleted"]
+    assert {(d["type"], d["id"]) for d in deleted} == {("case", case["id"]), ("event", event_id)}
+
+def test_delete_client_with_cases_conflicts(client, user_headers):
+    """Test a client with cases can't be deleted"""
+    case = create_case(client, user_headers)
+    response = client.delete(f"/api/clients/{case['clientId']}", headers=user_headers)
+    assert response.status_code == 409
+
+def test_delete_event_with_stale_version(client, user_headers):
+    """Test deleting with an outdated version returns 409"""
+    case = create_case(client, user_headers)
+    event_id = client.post(
+        "/api/events/", json={"title": "Keşif", "caseId": case["id"]}, headers=user_headers
+    ).json()["id"]
+    assert client.delete(f"/api/events/{event_id}?version=5", headers=user_headers).status_code == 409
+    assert client.delete(f"/api/events/{event_id}?version=1", headers=user_headers).status_code == 204
+    assert client.delete(f"/api/events/{event_id}", headers=user_headers).status_code == 404